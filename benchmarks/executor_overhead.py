@@ -0,0 +1,55 @@
+"""
+Накладные расходы исполнителя на один вызов: построение исполнителя на каждый вызов get_data
+против исполнителя, построенного один раз при создании стратегии
+
+    python -m benchmarks.executor_overhead
+"""
+import asyncio
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Coroutine, Dict
+
+from tenacity import stop_after_attempt
+
+from src.cache_invalidator_strategy.base import HelpUtilsMixin
+
+CALLS = 20000
+EXECUTOR_KWARGS: Dict[str, Any] = {
+    'use_retry': True,
+    'use_rate_limiter': False,
+    'stop': stop_after_attempt(3),
+    'reraise': True,
+}
+
+
+async def perform_request() -> str:
+    return 'data'
+
+
+async def per_call_build(mixin: HelpUtilsMixin, cache_key: str) -> Any:
+    executor = mixin.build_executor(cache_key=cache_key, **EXECUTOR_KWARGS)
+    return await executor(partial(perform_request))
+
+
+async def prebuilt(executor: Callable[..., Coroutine], cache_key: str) -> Any:
+    return await executor(partial(perform_request), cache_key)
+
+
+async def measure(name: str, call: Callable[[str], Coroutine]) -> None:
+    started_at = perf_counter()
+    for i in range(CALLS):
+        await call(f'key:{i}')
+    elapsed = perf_counter() - started_at
+    print(f'{name:<16} {elapsed / CALLS * 1e6:8.1f} us/call')  # noqa: T201
+
+
+async def main() -> None:
+    mixin = HelpUtilsMixin()
+    executor = mixin.build_executor(**EXECUTOR_KWARGS)
+
+    await measure('per call build', partial(per_call_build, mixin))
+    await measure('prebuilt', partial(prebuilt, executor))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,388 @@
+"""
+Нагрузочный тест RequestManager со стратегиями кэширования и ограничителями запросов
+на локальном редисе и интеграторе-заглушке
+
+    python -m benchmarks.load_test --strategy ttl background xfetch --rate-limiter none gcra \\
+        --requests 20000 --concurrency 100 --keys 1000 --zipf 1.1 --latency 0.01 --output results.json
+
+    python -m benchmarks.load_test ... --baseline results.json --tolerance 0.1
+
+Для каждого сценария выводятся пропускная способность, перцентили задержки, число запросов к интегратору
+и команд редиса на один запрос. С --baseline результаты сравниваются с сохраненными через --output,
+при ухудшении больше чем на tolerance команда завершается с кодом 1.
+Команды редиса считаются по total_commands_processed всего сервера, поэтому база редиса
+очищается перед каждым сценарием, а других клиентов у редиса во время теста быть не должно
+"""
+import argparse
+import asyncio
+import json
+import sys
+from time import monotonic, perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+import aioredis
+from aioredis import Redis
+from tenacity import RetryError, retry_if_exception_type, stop_after_attempt
+
+from benchmarks.workload import LATENCY_DISTRIBUTIONS, FakeUpstream, UpstreamError, ZipfKeys, percentile
+from main import RequestManager
+from src.cache_invalidator_strategy.backround_update import BackgroundUpdater
+from src.cache_invalidator_strategy.base import AbstractCacheStrategy
+from src.cache_invalidator_strategy.refresh_scheduler import RefreshScheduler
+from src.cache_invalidator_strategy.ttl_strategy import TTLInvalidator
+from src.cache_invalidator_strategy.xfetch_strategy import XFetchInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.metrics.metrics import MetricsRegistry
+from src.rate_imiter import lua_rate_limiter
+from src.rate_imiter.quota_leasing import QuotaLeasingRateLimiter
+from src.rate_imiter.rate_limiter import RateLimitException, SlidingWindowRateLimiter
+
+STRATEGIES = ('ttl', 'background', 'xfetch')
+RATE_LIMITERS: Dict[str, Optional[Type[SlidingWindowRateLimiter]]] = {
+    'none': None,
+    'sliding_window': SlidingWindowRateLimiter,
+    'lua_sliding_window': lua_rate_limiter.LuaSlidingWindowRateLimiter,
+    'sliding_window_counter': lua_rate_limiter.SlidingWindowCounterRateLimiter,
+    'gcra': lua_rate_limiter.GCRARateLimiter,
+    'quota_leasing': QuotaLeasingRateLimiter,
+}
+# ограничитель запросов есть только в исполнителе BackgroundUpdater
+RATE_LIMITED_STRATEGIES = ('background',)
+
+# метрика, True - чем больше, тем лучше
+REGRESSION_CHECKS: Tuple[Tuple[str, bool], ...] = (
+    ('throughput', True),
+    ('latency_p50', False),
+    ('latency_p99', False),
+    ('latency_p999', False),
+    ('upstream_amplification', False),
+    ('redis_ops_per_request', False),
+)
+
+
+class Scenario:
+    def __init__(
+        self,
+        strategy: str = 'ttl',
+        rate_limiter: str = 'none',
+        requests: int = 10000,
+        warmup: int = 0,
+        concurrency: int = 50,
+        keys: int = 1000,
+        zipf: float = 1.0,
+        latency: float = 0.01,
+        latency_distribution: str = 'constant',
+        error_rate: float = 0.0,
+        empty_rate: float = 0.0,
+        retries: int = 0,
+        cache_ttl: int = 60,
+        soft_ttl: Optional[float] = None,
+        rate_for_second: int = 1000,
+        use_coalescing: bool = False,
+        seed: int = 0,
+    ) -> None:
+        """
+        Параметры одного прогона, при одинаковых параметрах последовательность ключей и ответов интегратора
+        совпадает
+
+        :param warmup: число запросов перед замером, в результатах не учитываются
+        :param keys: число разных ключей, ключи выбираются по закону Ципфа с показателем zipf
+        :param retries: число повторных запросов к интегратору при ошибке
+        :param cache_ttl: время жизни кэша в редисе в секундах
+        :param soft_ttl: время в секундах, после которого BackgroundUpdater обновляет кэш в фоне
+        :param rate_for_second: лимит ограничителя запросов в секунду
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown strategy: {strategy}')
+        if rate_limiter not in RATE_LIMITERS:
+            raise ValueError(f'Unknown rate limiter: {rate_limiter}')
+        if rate_limiter != 'none' and strategy not in RATE_LIMITED_STRATEGIES:
+            raise ValueError(f'Strategy {strategy} does not support rate limiter')
+
+        self.strategy = strategy
+        self.rate_limiter = rate_limiter
+        self.requests = requests
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.keys = keys
+        self.zipf = zipf
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self.retries = retries
+        self.cache_ttl = cache_ttl
+        self.soft_ttl = soft_ttl
+        self.rate_for_second = rate_for_second
+        self.use_coalescing = use_coalescing
+        self.seed = seed
+
+    @property
+    def name(self) -> str:
+        return f'{self.strategy}/{self.rate_limiter}'
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def build_strategy(self, redis_connection: Redis) -> AbstractCacheStrategy:
+        cache_service = BaseCacheControlService(redis_connection=redis_connection, ex=self.cache_ttl)
+        retry_kwargs: Dict[str, Any] = {}
+        if self.retries:
+            retry_kwargs = {
+                'stop': stop_after_attempt(self.retries + 1),
+                'retry': retry_if_exception_type(UpstreamError),
+                'reraise': True,
+            }
+
+        if self.strategy == 'ttl':
+            return TTLInvalidator(cache_service, use_retry=bool(self.retries), **retry_kwargs)
+        if self.strategy == 'xfetch':
+            return XFetchInvalidator(cache_service, use_retry=bool(self.retries), **retry_kwargs)
+
+        rate_limiter = RATE_LIMITERS[self.rate_limiter]
+        limiter_kwargs: Dict[str, Any] = {}
+        if rate_limiter is not None:
+            limiter_kwargs = {'rate_limiter': rate_limiter, 'rate_for_second': self.rate_for_second}
+        return BackgroundUpdater(
+            cache_service,
+            redis_connection,
+            use_retry=bool(self.retries),
+            use_rate_limiter=rate_limiter is not None,
+            refresh_scheduler=RefreshScheduler(),
+            soft_ttl=self.soft_ttl,
+            **retry_kwargs,
+            **limiter_kwargs,
+        )
+
+
+async def _drive(fetch: Any, key_sequence: Sequence[int], concurrency: int) -> Tuple[List[float], int]:
+    latencies: List[float] = []
+    errors = 0
+    position = 0
+
+    async def worker() -> None:
+        nonlocal errors, position
+        while position < len(key_sequence):
+            key = key_sequence[position]
+            position += 1
+            started_at = perf_counter()
+            try:
+                await fetch(key)
+            except (UpstreamError, RetryError, RateLimitException):
+                errors += 1
+            latencies.append(perf_counter() - started_at)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def _drain(strategy: AbstractCacheStrategy, timeout: float = 30.0) -> None:
+    """
+    Дожидается фоновых обновлений кэша, чтобы их запросы к редису и интегратору вошли в результат
+    """
+    refresh_scheduler: Optional[RefreshScheduler] = getattr(strategy, 'refresh_scheduler', None)
+    if refresh_scheduler is None:
+        return
+    deadline = monotonic() + timeout
+    while (refresh_scheduler.in_flight or refresh_scheduler.queue_depth) and monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    await refresh_scheduler.shutdown(timeout=0)
+
+
+async def _commands_processed(redis_connection: Redis) -> int:
+    return int((await redis_connection.info('stats'))['total_commands_processed'])
+
+
+async def run_scenario(redis_connection: Redis, scenario: Scenario) -> Dict[str, Any]:
+    upstream = FakeUpstream(
+        latency=scenario.latency,
+        latency_distribution=scenario.latency_distribution,
+        error_rate=scenario.error_rate,
+        empty_rate=scenario.empty_rate,
+        seed=scenario.seed,
+    )
+    strategy = scenario.build_strategy(redis_connection)
+    registry = MetricsRegistry()
+    request_manager = RequestManager(
+        service_name='load_test',
+        integration=scenario.strategy,
+        integration_method=scenario.rate_limiter,
+        cache_strategy=strategy,
+        use_coalescing=scenario.use_coalescing,
+        metrics_registry=registry,
+    )
+
+    @request_manager
+    async def fetch(key: int) -> Any:
+        return await upstream(key)
+
+    next_key = ZipfKeys(scenario.keys, scenario.zipf, seed=scenario.seed)
+    warmup_sequence = [next_key() for _ in range(scenario.warmup)]
+    key_sequence = [next_key() for _ in range(scenario.requests)]
+
+    if warmup_sequence:
+        await _drive(fetch, warmup_sequence, scenario.concurrency)
+    upstream.calls = upstream.errors = 0
+    request_manager.metrics = registry.get('load_test', 'measured')
+
+    commands_before = await _commands_processed(redis_connection)
+    started_at = perf_counter()
+    latencies, errors = await _drive(fetch, key_sequence, scenario.concurrency)
+    elapsed = perf_counter() - started_at
+    await _drain(strategy)
+    # INFO, выполненный до замера, учитывается в счетчике после замера
+    redis_ops = await _commands_processed(redis_connection) - commands_before - 1
+
+    latencies.sort()
+    requests = len(latencies)
+    metrics = request_manager.metrics
+    return {
+        'scenario': scenario.name,
+        'params': scenario.as_dict(),
+        'requests': requests,
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p99': percentile(latencies, 99),
+        'latency_p999': percentile(latencies, 99.9),
+        'latency_max': latencies[-1] if latencies else 0.0,
+        'upstream_calls': upstream.calls,
+        'upstream_errors': upstream.errors,
+        'upstream_amplification': upstream.calls / requests if requests else 0.0,
+        'redis_ops': redis_ops,
+        'redis_ops_per_request': redis_ops / requests if requests else 0.0,
+        'hits': metrics.hits,
+        'misses': metrics.misses,
+        'stale': metrics.stale,
+        'rate_limited': metrics.rate_limited,
+    }
+
+
+def compare(
+    results: Sequence[Dict[str, Any]],
+    baseline: Sequence[Dict[str, Any]],
+    tolerance: float = 0.1,
+) -> List[str]:
+    """
+    Сравнивает результаты с базовыми по имени сценария, возвращает описания ухудшений больше чем на tolerance.
+    Сценарии, которых нет в базовых результатах, не сравниваются
+    """
+    baseline_by_name = {result['scenario']: result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_by_name.get(result['scenario'])
+        if base is None:
+            continue
+        for metric, higher_is_better in REGRESSION_CHECKS:
+            base_value, value = base.get(metric), result.get(metric)
+            if not base_value or value is None:
+                continue
+            change = (value - base_value) / base_value
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{result['scenario']}: {metric} {base_value:.6g} -> {value:.6g} ({change:+.1%})")
+    return regressions
+
+
+def format_results(results: Sequence[Dict[str, Any]]) -> str:
+    header = (
+        f"{'scenario':<36}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'p999 ms':>10}"
+        f"{'errors':>8}{'upstream/req':>14}{'redis ops/req':>15}"
+    )
+    lines = [header]
+    for result in results:
+        lines.append(
+            f"{result['scenario']:<36}{result['throughput']:>10.0f}"
+            f"{result['latency_p50'] * 1000:>10.2f}{result['latency_p99'] * 1000:>10.2f}"
+            f"{result['latency_p999'] * 1000:>10.2f}{result['errors']:>8}"
+            f"{result['upstream_amplification']:>14.3f}{result['redis_ops_per_request']:>15.2f}"
+        )
+    return '\n'.join(lines)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест RequestManager')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15', help='база очищается перед сценарием')
+    parser.add_argument('--strategy', nargs='+', choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument('--rate-limiter', nargs='+', choices=list(RATE_LIMITERS), default=['none'])
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--warmup', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--zipf', type=float, default=1.0)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='constant')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--empty-rate', type=float, default=0.0)
+    parser.add_argument('--retries', type=int, default=0)
+    parser.add_argument('--cache-ttl', type=int, default=60)
+    parser.add_argument('--soft-ttl', type=float, default=None)
+    parser.add_argument('--rate-for-second', type=int, default=1000)
+    parser.add_argument('--coalescing', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='файл для сохранения результатов в JSON')
+    parser.add_argument('--baseline', help='файл с результатами для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    return parser.parse_args(argv)
+
+
+def build_scenarios(args: argparse.Namespace) -> List[Scenario]:
+    scenarios = []
+    for strategy in args.strategy:
+        for rate_limiter in args.rate_limiter:
+            if rate_limiter != 'none' and strategy not in RATE_LIMITED_STRATEGIES:
+                continue
+            scenarios.append(
+                Scenario(
+                    strategy=strategy,
+                    rate_limiter=rate_limiter,
+                    requests=args.requests,
+                    warmup=args.warmup,
+                    concurrency=args.concurrency,
+                    keys=args.keys,
+                    zipf=args.zipf,
+                    latency=args.latency,
+                    latency_distribution=args.latency_distribution,
+                    error_rate=args.error_rate,
+                    empty_rate=args.empty_rate,
+                    retries=args.retries,
+                    cache_ttl=args.cache_ttl,
+                    soft_ttl=args.soft_ttl,
+                    rate_for_second=args.rate_for_second,
+                    use_coalescing=args.coalescing,
+                    seed=args.seed,
+                )
+            )
+    return scenarios
+
+
+async def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    redis_connection = aioredis.from_url(args.redis_url, decode_responses=True)
+    results = []
+    try:
+        for scenario in build_scenarios(args):
+            await redis_connection.flushdb()
+            results.append(await run_scenario(redis_connection, scenario))
+        await redis_connection.flushdb()
+    finally:
+        await redis_connection.connection_pool.disconnect()
+
+    print(format_results(results))  # noqa: T201
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')  # noqa: T201
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,100 @@
+"""
+Генераторы нагрузки для нагрузочного теста: распределение ключей и интегратор-заглушка
+"""
+import asyncio
+import math
+import random
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Optional, Sequence
+
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class ZipfKeys:
+    def __init__(self, keys_count: int, exponent: float = 1.0, seed: Optional[int] = None) -> None:
+        """
+        Номера ключей по закону Ципфа: вероятность ключа с рангом k пропорциональна 1 / k ** exponent
+
+        :param exponent: 0 - равномерное распределение, чем больше, тем сильнее нагрузка на горячие ключи
+        """
+        if keys_count <= 0:
+            raise ValueError('keys_count must be positive')
+        if exponent < 0:
+            raise ValueError('exponent must not be negative')
+
+        self.keys_count = keys_count
+        self.exponent = exponent
+        self._random = random.Random(seed)  # nosec B311
+        self._cumulative_weights = list(accumulate(1 / rank**exponent for rank in range(1, keys_count + 1)))
+
+    def __call__(self) -> int:
+        point = self._random.random() * self._cumulative_weights[-1]
+        return min(bisect_left(self._cumulative_weights, point), self.keys_count - 1)
+
+
+class FakeUpstream:
+    def __init__(
+        self,
+        latency: float = 0.01,
+        latency_distribution: str = 'constant',
+        error_rate: float = 0.0,
+        empty_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Интегратор с заданным распределением задержек и долей ошибок
+
+        :param latency: средняя задержка ответа в секундах
+        :param latency_distribution: constant, uniform (от 0 до 2 * latency), exponential
+            или lognormal (sigma = 1, тяжелый хвост)
+        :param error_rate: доля запросов, завершающихся UpstreamError
+        :param empty_rate: доля запросов с пустым ответом
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f'Unknown latency distribution: {latency_distribution}')
+
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self._random = random.Random(seed)  # nosec B311
+
+        self.calls = 0
+        self.errors = 0
+
+    def sample_latency(self) -> float:
+        if self.latency <= 0 or self.latency_distribution == 'constant':
+            return max(self.latency, 0.0)
+        if self.latency_distribution == 'uniform':
+            return self._random.uniform(0, 2 * self.latency)
+        if self.latency_distribution == 'exponential':
+            return self._random.expovariate(1 / self.latency)
+        # среднее логнормального распределения exp(mu + sigma ** 2 / 2)
+        return self._random.lognormvariate(math.log(self.latency) - 0.5, 1.0)
+
+    async def __call__(self, key: int) -> str:
+        self.calls += 1
+        latency = self.sample_latency()
+        failed = self._random.random() < self.error_rate
+        empty = self._random.random() < self.empty_rate
+        await asyncio.sleep(latency)
+        if failed:
+            self.errors += 1
+            raise UpstreamError(key)
+        return '' if empty else f'value:{key}'
+
+
+def percentile(sorted_values: Sequence[float], rank: float) -> float:
+    """
+    Перцентиль по ближайшему рангу, значения должны быть отсортированы
+    """
+    if not sorted_values:
+        return 0.0
+    # округление убирает ошибку float, например 99.9 / 100 * 1000 = 999.0000000000001
+    index = max(math.ceil(round(rank / 100 * len(sorted_values), 9)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
@@ -2,9 +2,15 @@ from __future__ import annotations
 
 import inspect
 from functools import partial
-from typing import Any, Callable
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from src.cache_invalidator_strategy.base import AbstractCacheStrategy
+from src.cache_namespace.cache_namespace import CacheNamespace
+from src.hot_keys.hot_keys import HotKeyTracker
+from src.metrics.metrics import DEFAULT_REGISTRY, MetricsRegistry, request_metrics
+from src.request_coalescer.request_coalescer import RequestCoalescer
+from src.sync_pool.sync_pool import DEFAULT_SYNC_POOL, SyncCallPool, is_coroutine_callable
 
 
 def build_cache_key(
@@ -33,6 +39,98 @@ def build_cache_key(
     return ':'.join(list_of_sections)
 
 
+def compile_cache_key_builder(
+    func: Callable,
+    service_name: str,
+    integration: Optional[str] = None,
+    integration_method: Optional[str] = None,
+    service_version: Optional[str] = None,
+    digest_threshold: Optional[int] = None,
+) -> Callable[..., str]:
+    """
+    Строит функцию ключа кэша для конкретной функции: разбор аргументов по сигнатуре
+    выполняется один раз, а не при каждом вызове. Секции аргументов идут в порядке inspect.getcallargs
+    для позиционного вызова, поэтому ключ совпадает с ключом build_cache_key и не зависит от того,
+    переданы аргументы позиционно или по имени
+
+    :param digest_threshold: если ключ длиннее, часть ключа с аргументами заменяется хэшем blake2b,
+        префикс из названия сервиса, версии и интеграции остается читаемым
+    """
+    static_key_sections = [service_name]
+    for section in (service_version, integration, integration_method):
+        if section:
+            static_key_sections += [section]
+    prefix = ':'.join(static_key_sections)
+
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return partial(
+            build_cache_key,
+            func,
+            service_name,
+            integration=integration,
+            integration_method=integration_method,
+            service_version=service_version,
+        )
+
+    namespace: Dict[str, Any] = {}
+    bound_sections: List[str] = []
+    if inspect.ismethod(func):
+        namespace['__key_builder_self'] = func.__self__
+        self_name = next(iter(inspect.signature(func.__func__).parameters))
+        bound_sections = [f'{self_name}={{__key_builder_self}}']
+
+    params_source: List[str] = []
+    key_sections: List[str] = []
+    keyword_only_sections: List[str] = []
+    previous_kind = None
+    for i, parameter in enumerate(signature.parameters.values()):
+        if previous_kind == parameter.POSITIONAL_ONLY and parameter.kind != parameter.POSITIONAL_ONLY:
+            params_source.append('/')
+        if parameter.kind == parameter.KEYWORD_ONLY and previous_kind not in (
+            parameter.KEYWORD_ONLY,
+            parameter.VAR_POSITIONAL,
+        ):
+            params_source.append('*')
+        previous_kind = parameter.kind
+
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            params_source.append(f'*{parameter.name}')
+        elif parameter.kind == parameter.VAR_KEYWORD:
+            params_source.append(f'**{parameter.name}')
+        elif parameter.default is not parameter.empty:
+            namespace[f'__key_builder_default_{i}'] = parameter.default
+            params_source.append(f'{parameter.name}=__key_builder_default_{i}')
+        else:
+            params_source.append(parameter.name)
+
+        # getcallargs заводит словарь **kwargs сразу после *args, до keyword-only аргументов
+        if parameter.kind == parameter.KEYWORD_ONLY:
+            keyword_only_sections.append(f'{parameter.name}={{{parameter.name}}}')
+        else:
+            key_sections.append(f'{parameter.name}={{{parameter.name}}}')
+    if previous_kind == inspect.Parameter.POSITIONAL_ONLY:
+        params_source.append('/')
+
+    args_template = ':'.join(bound_sections + key_sections + keyword_only_sections)
+    source = f"def build_args_key({', '.join(params_source)}):\n    return f'{args_template}'\n"
+    # исходный код собирается только из имен параметров сигнатуры
+    exec(source, namespace)  # nosec B102
+    build_args_key = namespace['build_args_key']
+
+    def key_builder(*func_call_args: Any, **func_call_kwargs: Any) -> str:
+        args_key = build_args_key(*func_call_args, **func_call_kwargs)
+        if not args_key:
+            return prefix
+        key = f'{prefix}:{args_key}'
+        if digest_threshold is not None and len(key) > digest_threshold:
+            return f'{prefix}:{blake2b(args_key.encode(), digest_size=16).hexdigest()}'
+        return key
+
+    return key_builder
+
+
 class RequestManager:
     def __init__(
         self,
@@ -42,13 +140,48 @@ class RequestManager:
         integration: str = None,
         integration_method: str = None,
         cache_key_factory: Callable = None,
+        use_coalescing: bool = False,
+        cache_key_digest_threshold: Optional[int] = None,
+        cache_namespace: Optional[CacheNamespace] = None,
+        cache_tags: Optional[Callable[..., Iterable[str]]] = None,
+        metrics_registry: Optional[MetricsRegistry] = None,
+        sync_pool: Optional[SyncCallPool] = None,
+        hot_key_tracker: Optional[HotKeyTracker] = None,
     ) -> None:
+        """
+        :param use_coalescing: конкурентные вызовы с одинаковым ключом кэша ожидают один общий запрос
+        :param cache_key_digest_threshold: ключи кэша длиннее этого значения хэшируются
+        :param cache_namespace: в ключ кэша добавляются поколения сервиса, версии, интеграции и метода
+        :param cache_tags: принимает аргументы вызова и возвращает теги ключа кэша, нужен cache_namespace
+        :param metrics_registry: реестр метрик, по умолчанию DEFAULT_REGISTRY
+        :param sync_pool: пул, в котором выполняются синхронные функции, по умолчанию DEFAULT_SYNC_POOL
+        :param hot_key_tracker: считает частоту ключей кэша и хранит вызовы самых частых для CacheWarmer
+        """
+        if cache_tags is not None and cache_namespace is None:
+            raise ValueError('cache_tags requires cache_namespace')
+
         self.cache_strategy = cache_strategy
         self.cache_key_factory = cache_key_factory
         self.service_name = service_name
         self.service_version = service_version
         self.integration = integration
         self.integration_method = integration_method
+        self.request_coalescer = RequestCoalescer() if use_coalescing else None
+        self.cache_key_digest_threshold = cache_key_digest_threshold
+        self._cache_key_builders: Dict[Callable, Callable[..., str]] = {}
+        self.cache_namespace = cache_namespace
+        self.cache_tags = cache_tags
+        self.sync_pool = sync_pool if sync_pool is not None else DEFAULT_SYNC_POOL
+        self.hot_key_tracker = hot_key_tracker
+        self.metrics = (metrics_registry if metrics_registry is not None else DEFAULT_REGISTRY).get(
+            service_name, integration, integration_method
+        )
+
+        static_key_sections = [
+            section for section in (service_name, service_version, integration, integration_method) if section
+        ]
+        self._key_prefix = ':'.join(static_key_sections)
+        self._namespace_scopes = [':'.join(static_key_sections[: i + 1]) for i in range(len(static_key_sections))]
 
     def build_cache_key(
         self,
@@ -66,22 +199,59 @@ class RequestManager:
                 service_version=self.service_version,
                 **func_call_kwargs,
             )
-        return build_cache_key(
-            func,
-            self.service_name,
-            *func_call_args,
-            integration=self.integration,
-            integration_method=self.integration_method,
-            service_version=self.service_version,
-            **func_call_kwargs,
-        )
+
+        return self._get_cache_key_builder(func)(*func_call_args, **func_call_kwargs)
+
+    def _get_cache_key_builder(self, func: Callable) -> Callable[..., str]:
+        key_builder = self._cache_key_builders.get(func)
+        if key_builder is None:
+            key_builder = self._cache_key_builders[func] = compile_cache_key_builder(
+                func,
+                self.service_name,
+                integration=self.integration,
+                integration_method=self.integration_method,
+                service_version=self.service_version,
+                digest_threshold=self.cache_key_digest_threshold,
+            )
+        return key_builder
+
+    async def _run_sync(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        result = await self.sync_pool.run(func, *args, **kwargs)
+        # обертки без async def, которые возвращают корутину, дожидаются ее в event loop
+        if inspect.isawaitable(result):
+            return await result
+        return result
 
     def __call__(self, func: Callable) -> Callable:
+        if self.cache_key_factory is None:
+            self._get_cache_key_builder(func)  # сигнатура разбирается при декорировании
+
+        # блокирующие функции выполняются в пуле, дальше они не отличаются от асинхронных
+        upstream_func: Callable = func
+        if not is_coroutine_callable(func):
+            upstream_func = partial(self._run_sync, func)
+
         async def wrapped(*args: Any, **kwargs: Any) -> Any:
-            cache_key = self.build_cache_key(func, *args, **kwargs)
+            metrics_token = request_metrics.set(self.metrics)
+            try:
+                cache_key = self.build_cache_key(func, *args, **kwargs)
+                if self.cache_namespace is not None:
+                    cache_key = await self.cache_namespace.apply(self._namespace_scopes, self._key_prefix, cache_key)
+                    if self.cache_tags is not None:
+                        await self.cache_namespace.tag(cache_key, self.cache_tags(*args, **kwargs))
+
+                wrapped_func = partial(upstream_func, *args, **kwargs)
+                if self.hot_key_tracker is not None:
+                    self.hot_key_tracker.record(cache_key, wrapped_func)
 
-            wrapped_func = partial(func, *args, **kwargs)
+                if self.request_coalescer is not None:
+                    return await self.request_coalescer.run(
+                        cache_key,
+                        partial(self.cache_strategy.get_data, wrapped_func, cache_key=cache_key),
+                    )
 
-            return await self.cache_strategy.get_data(wrapped_func, cache_key=cache_key)
+                return await self.cache_strategy.get_data(wrapped_func, cache_key=cache_key)
+            finally:
+                request_metrics.reset(metrics_token)
 
         return wrapped
@@ -0,0 +1,304 @@
+import abc
+import asyncio
+from abc import abstractmethod
+from datetime import timedelta
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple, Union
+
+from aioredis import Redis
+from aioredis.client import Pipeline
+
+# ключи, которые строятся из ключа кэша добавлением суффикса: ограничители, аренда, xfetch
+DERIVED_KEY_SUFFIXES = (
+    ':rate_limiter:adaptive',
+    ':rate_limiter:counter',
+    ':rate_limiter:quota',
+    ':rate_limiter:gcra',
+    ':rate_limiter:lua',
+    ':rate_limiter',
+    ':xfetch_delta',
+    ':lease:fencing',
+    ':lease',
+)
+
+Command = Tuple[str, Tuple[Any, ...], Dict[str, Any]]
+# группа ключей, аргументы команды для группы и позиции ключей группы в исходной команде
+CommandPart = Tuple[Hashable, Tuple[Any, ...], List[int]]
+
+
+def hash_tag(key: str) -> Optional[str]:
+    """
+    Хэш-тег ключа по правилам Redis Cluster: содержимое первых фигурных скобок, если оно не пустое
+    """
+    start = key.find('{')
+    if start == -1:
+        return None
+    end = key.find('}', start + 1)
+    if end == -1 or end == start + 1:
+        return None
+    return key[start + 1 : end]
+
+
+def base_key(key: str, derived_key_suffixes: Sequence[str] = DERIVED_KEY_SUFFIXES) -> str:
+    """
+    Ключ кэша, из которого построен производный ключ, или сам ключ
+    """
+    for suffix in derived_key_suffixes:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            return key[: -len(suffix)]
+    return key
+
+
+class BufferedPipeline:
+    """
+    Конвейер бэкенда: команды накапливаются и выполняются бэкендом при вызове execute
+    """
+
+    def __init__(self, backend: 'AbstractBackend', transaction: bool = True) -> None:
+        self.backend = backend
+        self.transaction = transaction
+        self._commands: List[Command] = []
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def _queue(self, command: str, *args: Any, **kwargs: Any) -> 'BufferedPipeline':
+        self._commands.append((command, args, kwargs))
+        return self
+
+    def get(self, name: str) -> 'BufferedPipeline':
+        return self._queue('get', name)
+
+    def set(self, name: str, value: Any, **kwargs: Any) -> 'BufferedPipeline':
+        return self._queue('set', name, value, **kwargs)
+
+    def delete(self, *names: str) -> 'BufferedPipeline':
+        return self._queue('delete', *names)
+
+    def pttl(self, name: str) -> 'BufferedPipeline':
+        return self._queue('pttl', name)
+
+    def expire(self, name: str, time: Union[int, timedelta]) -> 'BufferedPipeline':
+        return self._queue('expire', name, time)
+
+    def mget(self, keys: Union[str, Sequence[str]], *args: str) -> 'BufferedPipeline':
+        return self._queue('mget', _list_keys(keys, args))
+
+    def incr(self, name: str, amount: int = 1) -> 'BufferedPipeline':
+        return self._queue('incr', name, amount)
+
+    def sadd(self, name: str, *values: Any) -> 'BufferedPipeline':
+        return self._queue('sadd', name, *values)
+
+    def smembers(self, name: str) -> 'BufferedPipeline':
+        return self._queue('smembers', name)
+
+    def zadd(self, name: str, mapping: Dict[Any, float]) -> 'BufferedPipeline':
+        return self._queue('zadd', name, mapping)
+
+    def zrem(self, name: str, *values: Any) -> 'BufferedPipeline':
+        return self._queue('zrem', name, *values)
+
+    def zcount(self, name: str, min: Any, max: Any) -> 'BufferedPipeline':
+        return self._queue('zcount', name, min, max)
+
+    def zlexcount(self, name: str, min: str, max: str) -> 'BufferedPipeline':
+        return self._queue('zlexcount', name, min, max)
+
+    def zremrangebylex(self, name: str, min: str, max: str) -> 'BufferedPipeline':
+        return self._queue('zremrangebylex', name, min, max)
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        """
+        :param raise_on_error: как в aioredis, если False, ошибки команд возвращаются в списке ответов
+        """
+        commands, self._commands = self._commands, []
+        return await self.backend.execute_pipeline(commands, self.transaction, raise_on_error)
+
+
+class AbstractBackend(abc.ABC):
+    """
+    Хранилище с подмножеством команд aioredis.Redis, которые использует библиотека.
+    Все команды проходят через execute_command, конвейер - через execute_pipeline
+    """
+
+    @abstractmethod
+    async def execute_command(self, command: str, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    async def execute_pipeline(
+        self, commands: List[Command], transaction: bool, raise_on_error: bool = True
+    ) -> List[Any]:
+        pass
+
+    def pipeline(self, transaction: bool = True) -> BufferedPipeline:
+        return BufferedPipeline(self, transaction)
+
+    async def get(self, name: str) -> Any:
+        return await self.execute_command('get', name)
+
+    async def set(self, name: str, value: Any, **kwargs: Any) -> Any:
+        """
+        :param kwargs: ex, px, nx, xx, keepttl как у aioredis
+        """
+        return await self.execute_command('set', name, value, **kwargs)
+
+    async def delete(self, *names: str) -> int:
+        return await self.execute_command('delete', *names)
+
+    async def pttl(self, name: str) -> int:
+        return await self.execute_command('pttl', name)
+
+    async def expire(self, name: str, time: Union[int, timedelta]) -> bool:
+        return await self.execute_command('expire', name, time)
+
+    async def mget(self, keys: Union[str, Sequence[str]], *args: str) -> List[Any]:
+        return await self.execute_command('mget', _list_keys(keys, args))
+
+    async def incr(self, name: str, amount: int = 1) -> int:
+        return await self.execute_command('incr', name, amount)
+
+    async def sadd(self, name: str, *values: Any) -> int:
+        return await self.execute_command('sadd', name, *values)
+
+    async def smembers(self, name: str) -> Set[Any]:
+        return await self.execute_command('smembers', name)
+
+    async def zadd(self, name: str, mapping: Dict[Any, float]) -> int:
+        return await self.execute_command('zadd', name, mapping)
+
+    async def zrem(self, name: str, *values: Any) -> int:
+        return await self.execute_command('zrem', name, *values)
+
+    async def zcount(self, name: str, min: Any, max: Any) -> int:
+        return await self.execute_command('zcount', name, min, max)
+
+    async def zlexcount(self, name: str, min: str, max: str) -> int:
+        return await self.execute_command('zlexcount', name, min, max)
+
+    async def zremrangebylex(self, name: str, min: str, max: str) -> int:
+        return await self.execute_command('zremrangebylex', name, min, max)
+
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args: Any) -> Any:
+        return await self.execute_command('evalsha', sha, numkeys, *keys_and_args)
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> Any:
+        return await self.execute_command('eval', script, numkeys, *keys_and_args)
+
+
+Backend = Union[Redis, AbstractBackend]
+BackendPipeline = Union[Pipeline, BufferedPipeline]
+
+
+class KeyRoutingBackend(AbstractBackend):
+    """
+    Бэкенд, который распределяет команды по группам ключей (слотам или узлам).
+    Команды с ключами из разных групп (mget, delete) разбиваются на команды по группам,
+    ответы собираются в порядке исходных ключей. Ключи Lua скрипта должны попадать в одну группу
+    """
+
+    @abstractmethod
+    def _map_key(self, key: str) -> str:
+        """
+        Ключ, под которым значение хранится в редисе
+        """
+
+    @abstractmethod
+    def _group(self, key: str) -> Hashable:
+        pass
+
+    @abstractmethod
+    def _client(self, group: Hashable) -> Any:
+        pass
+
+    @abstractmethod
+    def _client_pipeline(self, client: Any, transaction: bool) -> Any:
+        pass
+
+    async def execute_command(self, command: str, *args: Any, **kwargs: Any) -> Any:
+        parts = self._split(command, args)
+        if len(parts) == 1:
+            group, part_args, _ = parts[0]
+            result = await getattr(self._client(group), command)(*part_args, **kwargs)
+            return self._merge(command, parts, [result]) if command == 'mget' else result
+
+        results = await asyncio.gather(
+            *(getattr(self._client(group), command)(*part_args, **kwargs) for group, part_args, _ in parts)
+        )
+        return self._merge(command, parts, list(results))
+
+    async def execute_pipeline(
+        self, commands: List[Command], transaction: bool, raise_on_error: bool = True
+    ) -> List[Any]:
+        pipelines: Dict[int, Tuple[Any, List[Tuple[int, int]]]] = {}
+        split_commands: List[Tuple[str, List[CommandPart]]] = []
+        for index, (command, args, kwargs) in enumerate(commands):
+            parts = self._split(command, args)
+            split_commands.append((command, parts))
+            for part_index, (group, part_args, _) in enumerate(parts):
+                client = self._client(group)
+                if id(client) not in pipelines:
+                    pipelines[id(client)] = (self._client_pipeline(client, transaction), [])
+                pipeline, positions = pipelines[id(client)]
+                getattr(pipeline, command)(*part_args, **kwargs)
+                positions.append((index, part_index))
+
+        executed = await asyncio.gather(
+            *(pipeline.execute(raise_on_error=raise_on_error) for pipeline, _ in pipelines.values())
+        )
+        part_results: List[List[Any]] = [[None] * len(parts) for _, parts in split_commands]
+        for (_, positions), results in zip(pipelines.values(), executed):
+            for (index, part_index), result in zip(positions, results):
+                part_results[index][part_index] = result
+
+        return [
+            self._merge(command, parts, part_results[index])
+            if len(parts) > 1 or command == 'mget'
+            else part_results[index][0]
+            for index, (command, parts) in enumerate(split_commands)
+        ]
+
+    def _split(self, command: str, args: Tuple[Any, ...]) -> List[CommandPart]:
+        if command in ('mget', 'delete'):
+            keys = [self._map_key(key) for key in (args[0] if command == 'mget' else args)]
+            groups: Dict[Hashable, List[int]] = {}
+            for position, key in enumerate(keys):
+                groups.setdefault(self._group(key), []).append(position)
+            return [
+                (
+                    group,
+                    ([keys[i] for i in positions],) if command == 'mget' else tuple(keys[i] for i in positions),
+                    positions,
+                )
+                for group, positions in groups.items()
+            ]
+
+        if command in ('eval', 'evalsha'):
+            numkeys = args[1]
+            keys = [self._map_key(key) for key in args[2 : 2 + numkeys]]
+            script_groups = {self._group(key) for key in keys}
+            if len(script_groups) > 1:
+                raise ValueError('Lua script keys must belong to one slot or node')
+            group = script_groups.pop() if script_groups else self._group('')
+            return [(group, (args[0], numkeys, *keys, *args[2 + numkeys :]), list(range(numkeys)))]
+
+        key = self._map_key(args[0])
+        return [(self._group(key), (key, *args[1:]), [0])]
+
+    @staticmethod
+    def _merge(command: str, parts: List[CommandPart], results: List[Any]) -> Any:
+        # ошибка части команды, возвращенная конвейером, - ошибка всей команды
+        for result in results:
+            if isinstance(result, Exception):
+                return result
+        if command == 'delete':
+            return sum(results)
+        merged: List[Any] = [None] * sum(len(positions) for _, _, positions in parts)
+        for (_, _, positions), values in zip(parts, results):
+            for position, value in zip(positions, values):
+                merged[position] = value
+        return merged
+
+
+def _list_keys(keys: Union[str, Sequence[str]], args: Tuple[str, ...]) -> List[str]:
+    return [keys, *args] if isinstance(keys, str) else [*keys, *args]
@@ -0,0 +1,69 @@
+from typing import Any, Hashable, Sequence, Tuple, Type
+
+from aioredis.exceptions import NoScriptError
+
+from src.backend.backend import DERIVED_KEY_SUFFIXES, KeyRoutingBackend, base_key, hash_tag
+
+CLUSTER_SLOTS = 16384
+
+
+def crc16(data: bytes) -> int:
+    """
+    CRC16-CCITT (XMODEM), которым Redis Cluster распределяет ключи по слотам
+    """
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+    return crc
+
+
+def key_slot(key: str) -> int:
+    tag = hash_tag(key)
+    return crc16((key if tag is None else tag).encode()) % CLUSTER_SLOTS
+
+
+class RedisClusterBackend(KeyRoutingBackend):
+    def __init__(
+        self,
+        cluster_client: Any,
+        derived_key_suffixes: Sequence[str] = DERIVED_KEY_SUFFIXES,
+        no_script_errors: Tuple[Type[BaseException], ...] = (),
+    ) -> None:
+        """
+        Бэкенд поверх клиента Redis Cluster с интерфейсом aioredis, например redis.asyncio.RedisCluster
+
+        Ключ кэша хранится с хэш-тегом {ключ}, производные ключи (ограничители, аренда, xfetch) -
+        с хэш-тегом своего ключа кэша, поэтому ключи ограничителя и Lua скрипты всегда в одном слоте
+        с ключом кэша. Ключи, в которых уже есть фигурные скобки, не меняются.
+        mget и delete разбиваются по слотам, конвейер выполняется без MULTI,
+        транзакции между узлами кластер не поддерживает
+
+        :param no_script_errors: исключения клиента об отсутствии скрипта, например
+            redis.exceptions.NoScriptError, поднимаются как NoScriptError aioredis для LuaScript
+        """
+        self.cluster_client = cluster_client
+        self.derived_key_suffixes = tuple(derived_key_suffixes)
+        self.no_script_errors = tuple(no_script_errors)
+
+    def _map_key(self, key: str) -> str:
+        if '{' in key or '}' in key:
+            return key
+        base = base_key(key, self.derived_key_suffixes)
+        return f'{{{base}}}{key[len(base):]}'
+
+    def _group(self, key: str) -> Hashable:
+        return key_slot(key)
+
+    def _client(self, group: Hashable) -> Any:
+        return self.cluster_client
+
+    def _client_pipeline(self, client: Any, transaction: bool) -> Any:
+        return client.pipeline(transaction=False)
+
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args: Any) -> Any:
+        try:
+            return await super().evalsha(sha, numkeys, *keys_and_args)
+        except self.no_script_errors as exc:
+            raise NoScriptError(str(exc)) from exc
@@ -0,0 +1,375 @@
+import hashlib
+from datetime import timedelta
+from time import monotonic, time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from aioredis.exceptions import NoScriptError, ResponseError
+
+from src.backend.backend import AbstractBackend, Command
+from src.lua_script.lua_script import SCRIPTS
+
+WRONG_TYPE = 'WRONGTYPE Operation against a key holding the wrong kind of value'
+
+
+class SortedSet(Dict[bytes, float]):
+    pass
+
+
+class Hash(Dict[bytes, bytes]):
+    pass
+
+
+class InMemoryBackend(AbstractBackend):
+    def __init__(self, decode_responses: bool = True) -> None:
+        """
+        Хранилище в памяти процесса с семантикой команд редиса, для одного процесса и тестов.
+        Строки хранятся как bytes и возвращаются str при decode_responses, как в aioredis.
+        Вместо Lua скриптов выполняются их Python аналоги, зарегистрированные LuaScript.python_equivalent,
+        скрипты без аналога завершаются ResponseError
+        """
+        self.decode_responses = decode_responses
+        self._data: Dict[str, Any] = {}
+        self._expires_at: Dict[str, float] = {}
+        self._commands: Dict[str, Callable[..., Any]] = {
+            'get': self._get,
+            'set': self._set,
+            'delete': self._delete,
+            'pttl': self._pttl,
+            'expire': self._expire,
+            'pexpire': self._pexpire,
+            'exists': self._exists,
+            'mget': self._mget,
+            'incr': self._incr,
+            'hget': self._hget,
+            'hset': self._hset,
+            'hincrby': self._hincrby,
+            'hdel': self._hdel,
+            'sadd': self._sadd,
+            'smembers': self._smembers,
+            'zadd': self._zadd,
+            'zrem': self._zrem,
+            'zcard': self._zcard,
+            'zcount': self._zcount,
+            'zremrangebyscore': self._zremrangebyscore,
+            'zlexcount': self._zlexcount,
+            'zremrangebylex': self._zremrangebylex,
+            'time': self._time,
+            'eval': self._eval,
+            'evalsha': self._evalsha,
+        }
+
+    def __len__(self) -> int:
+        return sum(self._live(key) is not None for key in list(self._data))
+
+    async def execute_command(self, command: str, *args: Any, **kwargs: Any) -> Any:
+        return self._commands[command](*args, **kwargs)
+
+    async def execute_pipeline(
+        self, commands: List[Command], transaction: bool, raise_on_error: bool = True
+    ) -> List[Any]:
+        # команды выполняются без переключения event loop, поэтому конвейер атомарен
+        results: List[Any] = []
+        for command, args, kwargs in commands:
+            try:
+                results.append(self._commands[command](*args, **kwargs))
+            except ResponseError as exc:
+                # как в редисе, ошибка команды не останавливает остальные команды конвейера
+                results.append(exc)
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, ResponseError):
+                    raise result
+        return results
+
+    def flushall(self) -> None:
+        self._data.clear()
+        self._expires_at.clear()
+
+    def _live(self, key: str) -> Any:
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= monotonic():
+            del self._expires_at[key]
+            self._data.pop(key, None)
+        return self._data.get(key)
+
+    def _typed(self, key: str, kind: type) -> Any:
+        value = self._live(key)
+        if value is not None and not isinstance(value, kind):
+            raise ResponseError(WRONG_TYPE)
+        return value
+
+    def _response(self, value: Optional[bytes]) -> Any:
+        if value is None or not self.decode_responses:
+            return value
+        return value.decode()
+
+    def _get(self, name: str) -> Any:
+        return self._response(self._typed(name, bytes))
+
+    def _set(
+        self,
+        name: str,
+        value: Any,
+        ex: Union[None, int, timedelta] = None,
+        px: Union[None, int, timedelta] = None,
+        nx: bool = False,
+        xx: bool = False,
+        keepttl: bool = False,
+    ) -> Optional[bool]:
+        exists = self._live(name) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+
+        self._data[name] = _encode(value)
+        ttl = _seconds(ex) if ex is not None else _seconds(px, 1000) if px is not None else None
+        if ttl is not None:
+            self._expires_at[name] = monotonic() + ttl
+        elif not keepttl:
+            self._expires_at.pop(name, None)
+        return True
+
+    def _delete(self, *names: str) -> int:
+        deleted = 0
+        for name in names:
+            if self._live(name) is not None:
+                del self._data[name]
+                self._expires_at.pop(name, None)
+                deleted += 1
+        return deleted
+
+    def _pttl(self, name: str) -> int:
+        if self._live(name) is None:
+            return -2
+        expires_at = self._expires_at.get(name)
+        if expires_at is None:
+            return -1
+        return max(int((expires_at - monotonic()) * 1000), 0)
+
+    def _expire(self, name: str, time: Union[int, timedelta]) -> bool:
+        if self._live(name) is None:
+            return False
+        self._expires_at[name] = monotonic() + _seconds(time)
+        return True
+
+    def _pexpire(self, name: str, time: Union[int, timedelta]) -> bool:
+        if self._live(name) is None:
+            return False
+        self._expires_at[name] = monotonic() + _seconds(time, 1000)
+        return True
+
+    def _exists(self, *names: str) -> int:
+        return sum(self._live(name) is not None for name in names)
+
+    def _mget(self, keys: List[str]) -> List[Any]:
+        values = (self._live(key) for key in keys)
+        return [self._response(value) if isinstance(value, bytes) else None for value in values]
+
+    def _incr(self, name: str, amount: int = 1) -> int:
+        value = self._typed(name, bytes)
+        try:
+            result = int(value or 0) + amount
+        except ValueError:
+            raise ResponseError('value is not an integer or out of range')
+        # INCR сохраняет срок жизни ключа
+        self._data[name] = _encode(result)
+        return result
+
+    def _hash(self, name: str, create: bool = False) -> Hash:
+        fields = self._typed(name, Hash)
+        if fields is None:
+            fields = Hash()
+            if create:
+                self._data[name] = fields
+        return fields
+
+    def _hget(self, name: str, key: Any) -> Any:
+        return self._response(self._hash(name).get(_encode(key)))
+
+    def _hset(self, name: str, key: Any = None, value: Any = None, mapping: Optional[Dict[Any, Any]] = None) -> int:
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        fields = self._hash(name, create=True)
+        added = 0
+        for field, field_value in items.items():
+            encoded = _encode(field)
+            added += encoded not in fields
+            fields[encoded] = _encode(field_value)
+        return added
+
+    def _hincrby(self, name: str, key: Any, amount: int = 1) -> int:
+        fields = self._hash(name, create=True)
+        encoded = _encode(key)
+        try:
+            result = int(fields.get(encoded, 0)) + amount
+        except ValueError:
+            raise ResponseError('hash value is not an integer')
+        fields[encoded] = _encode(result)
+        return result
+
+    def _hdel(self, name: str, *keys: Any) -> int:
+        fields = self._hash(name)
+        deleted = sum(fields.pop(_encode(key), None) is not None for key in keys)
+        if not fields and deleted:
+            self._delete(name)
+        return deleted
+
+    def _sadd(self, name: str, *values: Any) -> int:
+        members: Optional[Set[bytes]] = self._typed(name, set)
+        if members is None:
+            members = self._data[name] = set()
+        added = {_encode(value) for value in values} - members
+        members.update(added)
+        return len(added)
+
+    def _smembers(self, name: str) -> Set[Any]:
+        return {self._response(member) for member in self._typed(name, set) or ()}
+
+    def _zset(self, name: str) -> SortedSet:
+        return self._typed(name, SortedSet) or SortedSet()
+
+    def _zadd(self, name: str, mapping: Dict[Any, float]) -> int:
+        members = self._typed(name, SortedSet)
+        if members is None:
+            members = self._data[name] = SortedSet()
+        added = 0
+        for member, score in mapping.items():
+            encoded = _encode(member)
+            added += encoded not in members
+            members[encoded] = float(score)
+        return added
+
+    def _remove_members(self, name: str, removed: List[bytes]) -> int:
+        members = self._zset(name)
+        for member in removed:
+            del members[member]
+        if not members and removed:
+            self._delete(name)
+        return len(removed)
+
+    def _zrem(self, name: str, *values: Any) -> int:
+        members = self._zset(name)
+        return self._remove_members(name, [member for member in map(_encode, values) if member in members])
+
+    def _zcard(self, name: str) -> int:
+        return len(self._zset(name))
+
+    def _score_members(self, name: str, min: Any, max: Any) -> List[bytes]:
+        low, high = _score_bound(min), _score_bound(max)
+        return [member for member, score in self._zset(name).items() if _above(score, low) and _below(score, high)]
+
+    def _zcount(self, name: str, min: Any, max: Any) -> int:
+        return len(self._score_members(name, min, max))
+
+    def _zremrangebyscore(self, name: str, min: Any, max: Any) -> int:
+        return self._remove_members(name, self._score_members(name, min, max))
+
+    def _lex_members(self, name: str, min: str, max: str) -> List[bytes]:
+        low, high = _lex_bound(min), _lex_bound(max)
+        return [member for member in self._zset(name) if _above(member, low) and _below(member, high)]
+
+    def _zlexcount(self, name: str, min: str, max: str) -> int:
+        return len(self._lex_members(name, min, max))
+
+    def _zremrangebylex(self, name: str, min: str, max: str) -> int:
+        return self._remove_members(name, self._lex_members(name, min, max))
+
+    @staticmethod
+    def _time() -> Tuple[int, int]:
+        now = time()
+        return int(now), int(now % 1 * 1000000)
+
+    def _eval(self, script: str, numkeys: int, *keys_and_args: Any) -> Any:
+        sha = hashlib.sha1(script.encode()).hexdigest()  # nosec B324
+        registered = SCRIPTS.get(sha)
+        if registered is None or registered.python is None:
+            raise ResponseError(f'InMemoryBackend has no Python equivalent of script {sha}')
+        return self._evalsha(sha, numkeys, *keys_and_args)
+
+    def _evalsha(self, sha: str, numkeys: int, *keys_and_args: Any) -> Any:
+        registered = SCRIPTS.get(sha)
+        if registered is None or registered.python is None:
+            raise NoScriptError('NOSCRIPT No matching script. Please use EVAL.')
+        keys = list(keys_and_args[:numkeys])
+        args = [_encode(arg) for arg in keys_and_args[numkeys:]]
+        return self._script_reply(registered.python(self._script_call, keys, args))
+
+    def _script_call(self, command: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Аналог redis.call: строки ответа всегда bytes, как строки Lua
+        """
+        return _raw(self._commands[command](*args, **kwargs))
+
+    def _script_reply(self, value: Any) -> Any:
+        """
+        Ответ скрипта по правилам преобразования значений Lua в ответы редиса
+        """
+        if value is None or value is False:
+            return None
+        if value is True:
+            return 1
+        if isinstance(value, float):
+            return int(value)
+        if isinstance(value, (list, tuple)):
+            return [self._script_reply(item) for item in value]
+        if isinstance(value, int):
+            return value
+        return self._response(_encode(value))
+
+
+Bound = Tuple[Any, bool]
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+def _raw(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, (set, list, tuple)):
+        return type(value)(_raw(item) for item in value)
+    return value
+
+
+def _seconds(value: Union[int, float, timedelta], per_second: int = 1) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else value / per_second
+
+
+def _score_bound(value: Any) -> Bound:
+    """
+    Граница диапазона оценок: число, '-inf', '+inf' или '(число' для строгой границы
+    """
+    if isinstance(value, (int, float)):
+        return float(value), True
+    text = value.decode() if isinstance(value, bytes) else str(value)
+    if text.startswith('('):
+        return float(text[1:]), False
+    return float(text), True
+
+
+def _lex_bound(value: str) -> Bound:
+    """
+    Граница лексикографического диапазона: '-', '+', '[значение' или '(значение'.
+    None вместо значения означает бесконечность
+    """
+    if value in ('-', '+'):
+        return None, value == '-'
+    return _encode(value[1:]), value.startswith('[')
+
+
+def _above(value: Any, bound: Bound) -> bool:
+    limit, inclusive = bound
+    if limit is None:
+        # '-' ниже всех значений, '+' выше всех
+        return inclusive
+    return value >= limit if inclusive else value > limit
+
+
+def _below(value: Any, bound: Bound) -> bool:
+    limit, inclusive = bound
+    if limit is None:
+        return not inclusive
+    return value <= limit if inclusive else value < limit
@@ -0,0 +1,61 @@
+from bisect import bisect
+from hashlib import blake2b
+from typing import Any, Dict, Hashable, List, Mapping, Sequence
+
+from aioredis import Redis
+
+from src.backend.backend import DERIVED_KEY_SUFFIXES, KeyRoutingBackend, base_key, hash_tag
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class ShardedBackend(KeyRoutingBackend):
+    def __init__(
+        self,
+        nodes: Mapping[str, Redis],
+        replicas: int = 100,
+        derived_key_suffixes: Sequence[str] = DERIVED_KEY_SUFFIXES,
+    ) -> None:
+        """
+        Ключи распределяются по независимым узлам редиса консистентным хэшированием:
+        каждый узел занимает replicas точек на кольце, ключ хранится на узле первой точки после хэша ключа.
+        При добавлении или удалении узла переезжает только доля ключей этого узла
+
+        Узел выбирается по хэш-тегу ключа, если он есть, иначе по ключу кэша, поэтому производные ключи
+        (ограничители, аренда, xfetch) хранятся на узле своего ключа кэша.
+        Команды с ключами разных узлов разбиваются по узлам, конвейер выполняется на узлах параллельно,
+        транзакция конвейера действует только в пределах узла
+
+        :param nodes: название узла и подключение, положение узла на кольце зависит только от названия
+        """
+        if not nodes:
+            raise ValueError('at least one node is required')
+        if replicas <= 0:
+            raise ValueError('replicas must be positive')
+
+        self.nodes: Dict[str, Redis] = dict(nodes)
+        self.replicas = replicas
+        self.derived_key_suffixes = tuple(derived_key_suffixes)
+
+        ring = sorted((ring_hash(f'{name}#{replica}'), name) for name in self.nodes for replica in range(replicas))
+        self._points: List[int] = [point for point, _ in ring]
+        self._names: List[str] = [name for _, name in ring]
+
+    def node_for(self, key: str) -> str:
+        tag = hash_tag(key)
+        route = tag if tag is not None else base_key(key, self.derived_key_suffixes)
+        return self._names[bisect(self._points, ring_hash(route)) % len(self._points)]
+
+    def _map_key(self, key: str) -> str:
+        return key
+
+    def _group(self, key: str) -> Hashable:
+        return self.node_for(key)
+
+    def _client(self, group: Hashable) -> Any:
+        return self.nodes[str(group)]
+
+    def _client_pipeline(self, client: Any, transaction: bool) -> Any:
+        return client.pipeline(transaction=transaction)
@@ -0,0 +1,80 @@
+import asyncio
+from collections import deque
+from typing import Deque, Optional
+
+
+class BoundedSemaphore:
+    def __init__(self, limit: int, max_queue_size: int) -> None:
+        """
+        Семафор с ограниченной очередью ожидающих, места передаются ожидающим по очереди
+
+        Семафор привязывается к event loop первого вызова try_acquire, при смене event loop
+        занятые места и очередь сбрасываются: ожидающие из другого event loop уже не продолжатся
+
+        :param limit: число мест
+        :param max_queue_size: максимальное число ожидающих
+        """
+        self.limit = limit
+        self.max_queue_size = max_queue_size
+
+        self._running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def queue_full(self) -> bool:
+        return len(self._waiters) >= self.max_queue_size
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def try_acquire(self) -> bool:
+        """
+        Занимает место, если есть свободное
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._running = 0
+            self._waiters.clear()
+
+        if self._running < self.limit:
+            self._running += 1
+            return True
+        return False
+
+    async def wait(self, timeout: Optional[float] = None) -> None:
+        """
+        Ожидает в очереди освободившееся место, вызывается после неудачного try_acquire
+
+        :param timeout: сколько секунд ждать, по истечении поднимается asyncio.TimeoutError
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if waiter.done() and not waiter.cancelled():
+                # место уже передано этому вызову, передаем его следующему
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        # место освободившегося вызова передается первому ожидающему, счетчик не меняется
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
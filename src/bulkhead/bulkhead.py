@@ -0,0 +1,219 @@
+import abc
+import asyncio
+from abc import abstractmethod
+from time import monotonic, perf_counter
+from typing import Any, Awaitable, Callable, List, NoReturn, Optional
+from uuid import uuid4
+
+from aioredis.exceptions import ConnectionError, TimeoutError
+
+from src.backend.backend import Backend
+from src.bounded_semaphore.bounded_semaphore import BoundedSemaphore
+from src.exceptions.exceptions import BulkheadFullError
+from src.lua_script.lua_script import LuaScript
+from src.metrics.metrics import request_metrics
+
+# время берется из редиса: часы процессов могут расходиться, а аренды сравниваются между процессами.
+# TIME недетерминирована, поэтому до Redis 5 запись после нее требует репликации эффектов скрипта
+ACQUIRE_SCRIPT = LuaScript(
+    """
+redis.replicate_commands()
+local time = redis.call('time')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call('zremrangebyscore', KEYS[1], '-inf', now)
+if redis.call('zcard', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('zadd', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+redis.call('pexpire', KEYS[1], ARGV[2])
+return 1
+"""
+)
+
+
+@ACQUIRE_SCRIPT.python_equivalent
+def _acquire_slot(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    now = _now_ms(call)
+    call('zremrangebyscore', keys[0], '-inf', now)
+    if call('zcard', keys[0]) >= int(args[0]):
+        return 0
+    call('zadd', keys[0], {args[2]: now + int(args[1])})
+    call('pexpire', keys[0], int(args[1]))
+    return 1
+
+
+HOLDERS_SCRIPT = LuaScript(
+    """
+local time = redis.call('time')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+return redis.call('zcount', KEYS[1], '(' .. now, '+inf')
+"""
+)
+
+
+@HOLDERS_SCRIPT.python_equivalent
+def _count_holders(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    return call('zcount', keys[0], f'({_now_ms(call)}', '+inf')
+
+
+def _now_ms(call: Callable[..., Any]) -> int:
+    seconds, microseconds = call('time')
+    return int(seconds) * 1000 + int(microseconds) // 1000
+
+
+class AbstractBulkhead(abc.ABC):
+    """
+    Ограничивает число одновременных запросов к интегратору. Один экземпляр используется всеми стратегиями
+    интеграции, запросы сверх лимита ожидают в очереди не дольше queue_timeout секунд
+    """
+
+    max_concurrent: int
+    max_queue_size: int
+    queue_timeout: Optional[float]
+
+    @abstractmethod
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        pass
+
+    def _reject(self, message: str) -> NoReturn:
+        request_metrics.get().bulkhead_rejections += 1
+        raise BulkheadFullError(message)
+
+
+class LocalBulkhead(AbstractBulkhead):
+    def __init__(
+        self, max_concurrent: int = 10, max_queue_size: int = 100, queue_timeout: Optional[float] = 1.0
+    ) -> None:
+        """
+        Семафор в памяти процесса с ограниченной очередью ожидающих
+
+        :param max_queue_size: при переполнении очереди запрос сразу завершается BulkheadFullError
+        :param queue_timeout: сколько секунд ждать места, None - без ограничения
+        """
+        if max_concurrent <= 0:
+            raise ValueError('max_concurrent must be positive')
+
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+
+        self._semaphore = BoundedSemaphore(max_concurrent, max_queue_size)
+
+    @property
+    def running(self) -> int:
+        return self._semaphore.running
+
+    @property
+    def queue_depth(self) -> int:
+        return self._semaphore.queue_depth
+
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        await self._acquire()
+        try:
+            return await func()
+        finally:
+            self._semaphore.release()
+
+    async def _acquire(self) -> None:
+        metrics = request_metrics.get()
+        if self._semaphore.try_acquire():
+            metrics.bulkhead_wait.observe(0.0)
+            return
+
+        if self._semaphore.queue_full:
+            self._reject(f'Bulkhead queue is full, queued calls: {self._semaphore.queue_depth}')
+
+        queued_at = perf_counter()
+        try:
+            await self._semaphore.wait(self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject(f'Bulkhead queue timeout: {self.queue_timeout}')
+        finally:
+            metrics.bulkhead_wait.observe(perf_counter() - queued_at)
+
+
+class RedisBulkhead(AbstractBulkhead):
+    def __init__(
+        self,
+        redis_connection: Backend,
+        name: str,
+        max_concurrent: int = 10,
+        max_queue_size: int = 100,
+        queue_timeout: Optional[float] = 1.0,
+        lease_ttl: float = 30.0,
+        poll_interval: float = 0.05,
+        key_prefix: str = 'bulkhead',
+    ) -> None:
+        """
+        Распределенный семафор: ограничивает число одновременных запросов к интеграции во всех процессах
+
+        Держатели хранятся в упорядоченном множестве с оценкой - временем истечения аренды,
+        место занимается атомарно Lua скриптом. Аренда процесса, упавшего во время запроса,
+        освобождается через lease_ttl секунд, поэтому lease_ttl должен быть больше самого долгого запроса.
+        Ожидающие опрашивают семафор раз в poll_interval секунд
+
+        :param name: название интеграции, часть ключа в редисе
+        :param max_queue_size: максимальное число ожидающих в процессе
+        """
+        if max_concurrent <= 0:
+            raise ValueError('max_concurrent must be positive')
+
+        self.redis_connection = redis_connection
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.redis_key = f'{key_prefix}:{name}'
+
+        self._waiting = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    async def holders(self) -> int:
+        return int(await HOLDERS_SCRIPT(self.redis_connection, keys=[self.redis_key], args=[]))
+
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        holder = uuid4().hex
+        await self._acquire(holder)
+        try:
+            return await func()
+        finally:
+            await self._release(holder)
+
+    async def _try_acquire(self, holder: str) -> bool:
+        args = [self.max_concurrent, max(int(self.lease_ttl * 1000), 1), holder]
+        return bool(await ACQUIRE_SCRIPT(self.redis_connection, keys=[self.redis_key], args=args))
+
+    async def _acquire(self, holder: str) -> None:
+        metrics = request_metrics.get()
+        if await self._try_acquire(holder):
+            metrics.bulkhead_wait.observe(0.0)
+            return
+
+        if self._waiting >= self.max_queue_size:
+            self._reject(f'Bulkhead {self.name} queue is full, queued calls: {self._waiting}')
+
+        queued_at = perf_counter()
+        deadline = monotonic() + self.queue_timeout if self.queue_timeout is not None else None
+        self._waiting += 1
+        try:
+            while True:
+                if deadline is not None and monotonic() >= deadline:
+                    self._reject(f'Bulkhead {self.name} queue timeout: {self.queue_timeout}')
+                await asyncio.sleep(self.poll_interval)
+                if await self._try_acquire(holder):
+                    return
+        finally:
+            self._waiting -= 1
+            metrics.bulkhead_wait.observe(perf_counter() - queued_at)
+
+    async def _release(self, holder: str) -> None:
+        try:
+            await self.redis_connection.zrem(self.redis_key, holder)
+        except (ConnectionError, TimeoutError, OSError):
+            # аренда освободится по истечении lease_ttl
+            pass
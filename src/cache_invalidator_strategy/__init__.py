@@ -1,4 +1,5 @@
 from src.cache_invalidator_strategy.backround_update import BackgroundUpdater
 from src.cache_invalidator_strategy.ttl_strategy import TTLInvalidator
+from src.cache_invalidator_strategy.xfetch_strategy import XFetchInvalidator
 
-__all__ = ['TTLInvalidator', 'BackgroundUpdater']
+__all__ = ['TTLInvalidator', 'BackgroundUpdater', 'XFetchInvalidator']
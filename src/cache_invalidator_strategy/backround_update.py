@@ -1,96 +1,205 @@
-import asyncio
 import functools
-import threading
-from asyncio import AbstractEventLoop
-from typing import TYPE_CHECKING, Any, Callable, Coroutine
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, Optional
 
 from tenacity import RetryError
 
 from src.cache_invalidator_strategy.base import AbstractCacheStrategy, HelpUtilsMixin
-from src.cache_manager.cache_manager import BaseCacheControlService
-from src.exceptions.exceptions import InvalidCacheError
+from src.cache_invalidator_strategy.refresh_scheduler import RefreshScheduler
+from src.cache_manager.cache_manager import AbstractCacheService, Guard
+from src.cache_manager.envelope import MISSING, CacheEnvelope, EmptyResult, unwrap
+from src.circuit_breaker.circuit_breaker import CircuitBreaker
+from src.exceptions.exceptions import CircuitOpenError, InvalidCacheError
+from src.lease_lock.lease_lock import CacheLease
+from src.metrics.metrics import request_metrics
 from src.rate_imiter.rate_limiter import RateLimitException
+from src.request_hedger.request_hedger import RequestHedger
 
 if TYPE_CHECKING:
     pass
-from aioredis import Redis
+from src.backend.backend import Backend
 
 
 class BackgroundUpdater(AbstractCacheStrategy, HelpUtilsMixin):
     def __init__(
         self,
-        cache_service: BaseCacheControlService,
-        redis_connection: Redis,
+        cache_service: AbstractCacheService,
+        redis_connection: Backend,
         use_retry: bool = False,
         use_rate_limiter: bool = False,
         use_cache: bool = True,
+        cache_lease: Optional[CacheLease] = None,
+        refresh_scheduler: Optional[RefreshScheduler] = None,
+        soft_ttl: Optional[float] = None,
+        hard_ttl: Optional[float] = None,
+        negative_cache_ttl: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        serve_stale_on_failure: bool = False,
+        request_hedger: Optional[RequestHedger] = None,
         **kwargs: Any,
     ) -> None:
+        """
+        :param cache_lease: кэш заполняет и обновляет только процесс, получивший аренду,
+            остальные отдают устаревшие данные либо ждут заполнения кэша
+        :param refresh_scheduler: планировщик фоновых задач обновления кэша
+        :param soft_ttl: время в секундах, после которого кэш обновляется в фоне,
+            если не задано, кэш обновляется при каждом обращении
+        :param hard_ttl: время в секундах, после которого кэш считается отсутствующим,
+            срок жизни ключа в редисе задается в cache_service и не должен быть меньше
+        :param negative_cache_ttl: время в секундах, на которое кэшируются пустые ответы интегратора,
+            если не задано, пустые ответы не кэшируются
+        :param circuit_breaker: выключатель запросов к интегратору, пока он открыт, фоновые обновления
+            не запускаются
+        :param serve_stale_on_failure: если интегратор недоступен или выключатель открыт, отдается кэш
+            с истекшим hard_ttl, пока ключ не удален из редиса
+        :param request_hedger: дублирующие запросы к интегратору при отсутствии кэша,
+            фоновые обновления не дублируются
+        """
+        if soft_ttl is not None and hard_ttl is not None and soft_ttl > hard_ttl:
+            raise ValueError('soft_ttl must not be greater than hard_ttl')
+
         self.redis_connection = redis_connection
         self.cache_service = cache_service
         self.use_retry = use_retry
         self.use_rate_limiter = use_rate_limiter
         self.use_cache = use_cache
+        self.cache_lease = cache_lease
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.negative_cache_ttl = negative_cache_ttl
+        self.circuit_breaker = circuit_breaker
+        self.serve_stale_on_failure = serve_stale_on_failure
+        self.request_hedger = request_hedger
+        self.refresh_scheduler = refresh_scheduler if refresh_scheduler is not None else RefreshScheduler()
         self.kwargs = kwargs
-
-    async def run_background_coro(self, coro: Coroutine) -> None:
-        def background_task(loop: AbstractEventLoop, _coro: Coroutine) -> None:
-            future = asyncio.run_coroutine_threadsafe(_coro, loop=loop)
-            future.result()
-
-        target = functools.partial(
-            background_task,
-            loop=asyncio.get_running_loop(),
-            _coro=coro,
+        self.executor = self.build_executor(
+            use_retry=use_retry,
+            use_rate_limiter=use_rate_limiter,
+            redis_connection=redis_connection,
+            circuit_breaker=circuit_breaker,
+            request_hedger=request_hedger,
+            **kwargs,
+        )
+        # при отсутствии кэша, все равно следует отдать результат
+        self.executor_without_rate_limit = (
+            self.build_executor(
+                use_retry=use_retry,
+                use_rate_limiter=False,
+                circuit_breaker=circuit_breaker,
+                request_hedger=request_hedger,
+                **kwargs,
+            )
+            if use_rate_limiter
+            else self.executor
+        )
+        # фоновое обновление не задерживает ответ, дублировать его незачем,
+        # адаптивный ограничитель отклоняет его раньше запросов пользователей
+        self.refresh_executor = (
+            self.build_executor(
+                use_retry=use_retry,
+                use_rate_limiter=use_rate_limiter,
+                redis_connection=redis_connection,
+                circuit_breaker=circuit_breaker,
+                background=True,
+                **kwargs,
+            )
+            if request_hedger is not None or use_rate_limiter
+            else self.executor
+        )
+        self.stale_fallback_exceptions = (
+            self._stale_fallback_exceptions(circuit_breaker) if serve_stale_on_failure else ()
         )
-        threading.Thread(target=target).start()
+
+    def run_background_coro(self, cache_key: str, coro_factory: Callable[[], Coroutine]) -> None:
+        self.refresh_scheduler.schedule(cache_key, coro_factory)
 
     async def get_data(self, wrapped_func: functools.partial, cache_key: str) -> Any:
-        executor = self.build_executor(
-            use_retry=self.use_retry,
-            use_rate_limiter=self.use_rate_limiter,
-            cache_key=cache_key,
-            redis_connection=self.redis_connection,
-            **self.kwargs,
-        )
+        cache = await self._read_raw_cache(cache_key)
+        metrics = request_metrics.get()
+
+        expired = MISSING
+        if isinstance(cache, CacheEnvelope) and cache.is_expired():
+            expired, cache = cache, MISSING
+
+        if cache is not MISSING:
+            # пустые ответы не обновляются в фоне, они живут negative_cache_ttl
+            # значения без метаданных, записанные ранее, считаются устаревшими
+            if not isinstance(cache, (CacheEnvelope, EmptyResult)) or (
+                isinstance(cache, CacheEnvelope) and cache.is_stale()
+            ):
+                metrics.stale += 1
+                if self.circuit_breaker is None or not self.circuit_breaker.is_open:
+                    self.run_background_coro(cache_key, functools.partial(self._update_cache, wrapped_func, cache_key))
+            else:
+                metrics.hits += 1
+            return unwrap(cache)
+        metrics.misses += 1
 
         try:
-            result = await self.cache_service.get_cache(cache_key)
+            if self.cache_lease is not None:
+                return unwrap(
+                    await self.cache_lease.fill(
+                        cache_key,
+                        fetch=functools.partial(self._fetch, wrapped_func, cache_key),
+                        store=functools.partial(self._store, cache_key),
+                        read=functools.partial(self._read_cache, cache_key),
+                    )
+                )
+
+            result = await self._fetch(wrapped_func, cache_key)
+        except self.stale_fallback_exceptions:
+            if expired is MISSING:
+                raise
+            metrics.stale_fallbacks += 1
+            return unwrap(expired)
+
+        # первая запись не проходит через планировщик, там ее могли бы отбросить или принять за обновление ключа
+        await self._store(cache_key, result)
+        return result
+
+    async def _read_raw_cache(self, cache_key: str) -> Any:
+        """
+        Возвращает MISSING, если кэша нет или он не прошел валидацию
+        """
+        try:
+            cache = await self.cache_service.get_cache(cache_key)
         except InvalidCacheError:
-            result = None  # todo sentinel
+            return MISSING
+        return MISSING if cache is None else cache
 
-        if result:
-            await self.run_background_coro(self._update_cache(executor, wrapped_func, cache_key))
-            return result
+    async def _read_cache(self, cache_key: str) -> Any:
+        """
+        Возвращает MISSING, если кэша нет, он не прошел валидацию или истек его жесткий срок жизни
+        """
+        cache = await self._read_raw_cache(cache_key)
+        if isinstance(cache, CacheEnvelope) and cache.is_expired():
+            return MISSING
+        return cache
 
+    def _pack(self, data: Any) -> Any:
+        if self.soft_ttl is None:
+            return data
+        return CacheEnvelope(data, soft_ttl=self.soft_ttl, hard_ttl=self.hard_ttl)
+
+    async def _fetch(self, wrapped_func: functools.partial, cache_key: str) -> Any:
         try:
-            result = await executor(wrapped_func)
+            return await self.executor(wrapped_func, cache_key)
         except RateLimitException:
-            executor_without_rate_limit = self.build_executor(
-                redis_connection=self.redis_connection,
-                cache_key=cache_key,
-                use_retry=self.use_retry,
-                rate_limiter=None,
-                **self.kwargs,
-            )  # при отсутствии кэша, все равно следует отдать результат
-            result = await executor_without_rate_limit(wrapped_func)
-            if result:
-                await self.run_background_coro(self.cache_service.set_cache(redis_key=cache_key, data=result))
-                return result
-        if result:
-            await self.run_background_coro(self.cache_service.set_cache(redis_key=cache_key, data=result))
-            return result
+            return await self.executor_without_rate_limit(wrapped_func, cache_key)
 
-        return result
+    async def _store(self, cache_key: str, result: Any, guard: Optional[Guard] = None) -> None:
+        if result:
+            await self.cache_service.set_cache(redis_key=cache_key, data=self._pack(result), guard=guard)
+        elif self.negative_cache_ttl is not None and EmptyResult.supports(result):
+            await self.cache_service.set_cache(cache_key, EmptyResult(result), ttl=self.negative_cache_ttl, guard=guard)
 
-    async def _update_cache(
-        self,
-        executor: Callable[[functools.partial], Coroutine],
-        wrapped_func: functools.partial,
-        cache_key: str,
-    ) -> Any:
+    async def _update_cache(self, wrapped_func: functools.partial, cache_key: str) -> Any:
+        fetch = functools.partial(self.refresh_executor, wrapped_func, cache_key)
+        store = functools.partial(self._store, cache_key)
         try:
-            data = await executor(wrapped_func)
-        except (RateLimitException, RetryError):  # todo непонятно как тут можно убрать связанность
+            if self.cache_lease is not None:
+                # пока кэш обновляет другой процесс, отдаются текущие данные
+                await self.cache_lease.refresh(cache_key, fetch=fetch, store=store)
+            else:
+                await store(await fetch())
+        except (RateLimitException, RetryError, CircuitOpenError):  # todo непонятно как тут можно убрать связанность
             return
-        await self.cache_service.set_cache(redis_key=cache_key, data=data)
@@ -2,11 +2,17 @@ import functools
 import inspect
 from abc import ABC, abstractmethod
 from functools import partial
-from typing import Any, Callable, Coroutine, Dict, Type, Union
+from time import perf_counter
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple, Type, Union
 
-from tenacity import AsyncRetrying, retry
+from tenacity import AsyncRetrying, RetryCallState, retry
 
+from src.bulkhead.bulkhead import AbstractBulkhead
+from src.circuit_breaker.circuit_breaker import CircuitBreaker
+from src.exceptions.exceptions import CircuitOpenError
+from src.metrics.metrics import request_metrics
 from src.rate_imiter.rate_limiter import SlidingWindowRateLimiter
+from src.request_hedger.request_hedger import RequestHedger
 
 
 def dummy_decorator(*args: Any, **kwargs: Any) -> Callable:
@@ -31,8 +37,12 @@ class HelpUtilsMixin:
         self,
         use_retry: bool,
         use_rate_limiter: bool,
+        rate_limiter: Type[SlidingWindowRateLimiter] = SlidingWindowRateLimiter,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        request_hedger: Optional[RequestHedger] = None,
+        bulkhead: Optional[AbstractBulkhead] = None,
         **kwargs: Any,
-    ) -> Callable[[functools.partial], Coroutine]:
+    ) -> Callable[..., Coroutine]:
         """
         Вспомогательная функция фабрика, которая даст возможность запускать оборачиваемые функции в 4 кейсах:
         1) Запуск с лимитом запросов в n-ый промежуток времени и с ретраями
@@ -40,6 +50,9 @@ class HelpUtilsMixin:
         3) Запуск с лимитами, но без ретраев
         4) Оставит всё, как есть
 
+        Исполнитель строится один раз на конфигурацию стратегии: ключ ограничителя передается
+        вторым аргументом при вызове executor(func, cache_key), время запроса определяется при каждом вызове
+
 
         :param use_retry:
         :param use_rate_limiter:
@@ -57,28 +70,81 @@ class HelpUtilsMixin:
         :param retry_error_callback:
 
         Параметры для ограничителя запросов
-        :param cache_key:
+        :param rate_limiter: класс ограничителя запросов
+        :param cache_key: ключ по умолчанию, если он не передан при вызове
         :param rate_for_second:
         :param rate_for_minute:
         :param rate_for_hour:
         :param rate_for_day:
         :param redis_connection
+        :param adaptive_limit: доля лимитов для AdaptiveRateLimiter
+        :param background: исполнитель фоновых обновлений, AdaptiveRateLimiter отклоняет их раньше
+
+        :param circuit_breaker: выключатель, оборачивает ретраи и ограничитель, пока он открыт,
+            исполнитель сразу поднимает CircuitOpenError
+        :param request_hedger: дублирующие запросы, каждая попытка ретраера дублируется,
+            дублирующий запрос проходит через ограничитель
+        :param bulkhead: ограничитель одновременных запросов, LocalBulkhead - в процессе,
+            RedisBulkhead - во всех процессах, занимает место на время ограничителя запросов и запроса
         """
 
         request_retryer: Callable = retry if use_retry else dummy_decorator  # type: ignore
-        rate_limiter: Union[Type[SlidingWindowRateLimiter], Callable] = (
-            SlidingWindowRateLimiter if use_rate_limiter else dummy_decorator
+        request_limiter: Optional[SlidingWindowRateLimiter] = (
+            rate_limiter(**self._build_init_args(_class=rate_limiter, **kwargs)) if use_rate_limiter else None
         )
-
-        retryer_args = self._build_init_args(_class=AsyncRetrying, **kwargs) if use_rate_limiter else {}
-        rate_limiter_args = self._build_init_args(_class=SlidingWindowRateLimiter, **kwargs) if use_rate_limiter else {}
+        retryer_args = self._build_init_args(_class=AsyncRetrying, **kwargs) if use_retry else {}
+        if use_retry:
+            retryer_args['before_sleep'] = self._count_retry(retryer_args.get('before_sleep'))
+
+        async def call_upstream(func: functools.partial, cache_key: Optional[str] = None) -> Any:
+            if request_limiter is None:
+                call = partial(self._call_upstream, func)
+            else:
+                call = partial(request_limiter.run, partial(self._call_upstream, func), cache_key)
+            if bulkhead is None:
+                return await call()
+            return await bulkhead.run(call)
 
         @request_retryer(**retryer_args)
-        @rate_limiter(**rate_limiter_args)
-        async def executor(func: functools.partial) -> Any:
+        async def executor(func: functools.partial, cache_key: Optional[str] = None) -> Any:
+            if request_hedger is None:
+                return await call_upstream(func, cache_key)
+            return await request_hedger.run(partial(call_upstream, func, cache_key))
+
+        if circuit_breaker is None:
+            return executor
+
+        async def guarded_executor(func: functools.partial, cache_key: Optional[str] = None) -> Any:
+            return await circuit_breaker.call(partial(executor, func, cache_key))
+
+        return guarded_executor
+
+    @staticmethod
+    def _stale_fallback_exceptions(circuit_breaker: Optional[CircuitBreaker]) -> Tuple[Type[BaseException], ...]:
+        """
+        Ошибки исполнителя, при которых отдается последний известный кэш
+        """
+        if circuit_breaker is None:
+            return ()
+        return (CircuitOpenError,) + circuit_breaker.failure_exceptions
+
+    @staticmethod
+    async def _call_upstream(func: functools.partial) -> Any:
+        started_at = perf_counter()
+        try:
             return await func()
+        finally:
+            request_metrics.get().upstream_latency.observe(perf_counter() - started_at)
 
-        return executor
+    @staticmethod
+    def _count_retry(before_sleep: Optional[Callable[[RetryCallState], Any]]) -> Callable[[RetryCallState], Any]:
+        def count_retry(retry_state: RetryCallState) -> Any:
+            request_metrics.get().retries += 1
+            if before_sleep is not None:
+                return before_sleep(retry_state)
+            return None
+
+        return count_retry
 
     @staticmethod
     def _build_init_args(
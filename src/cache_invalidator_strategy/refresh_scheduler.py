@@ -0,0 +1,123 @@
+import asyncio
+import functools
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+OVERFLOW_DROP_NEW = 'drop_new'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+
+
+class RefreshScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        max_queue_size: int = 1000,
+        overflow_policy: str = OVERFLOW_DROP_NEW,
+    ) -> None:
+        """
+        Планировщик фоновых задач обновления кэша на asyncio
+
+        Задачи с одинаковым ключом, которые уже ожидают в очереди или выполняются, повторно не ставятся
+
+        :param max_concurrency: максимальное число одновременно выполняемых задач
+        :param max_queue_size: максимальное число задач, ожидающих выполнения
+        :param overflow_policy: что делать при переполненной очереди:
+            drop_new - отбросить новую задачу, drop_oldest - вытеснить самую старую из ожидающих
+        """
+        if overflow_policy not in (OVERFLOW_DROP_NEW, OVERFLOW_DROP_OLDEST):
+            raise ValueError(f'Unknown overflow policy: {overflow_policy}')
+        if max_concurrency <= 0:
+            raise ValueError('max_concurrency must be positive')
+
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+
+        self.dropped = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+        self._closed = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: 'OrderedDict[str, Callable[[], Coroutine]]' = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def schedule(self, key: str, coro_factory: Callable[[], Coroutine]) -> bool:
+        """
+        Ставит задачу в очередь, возвращает False, если задача отброшена или уже запланирована
+        """
+        if self._closed:
+            self.dropped += 1
+            return False
+
+        self._bind_loop()
+
+        if key in self._pending or key in self._in_flight:
+            self.deduplicated += 1
+            return False
+
+        if len(self._in_flight) < self.max_concurrency:
+            self._start(key, coro_factory)
+            return True
+
+        if len(self._pending) >= self.max_queue_size:
+            self.dropped += 1
+            if self.overflow_policy == OVERFLOW_DROP_NEW or not self._pending:
+                return False
+            self._pending.popitem(last=False)
+
+        self._pending[key] = coro_factory
+        return True
+
+    async def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Перестает принимать задачи и дожидается выполнения уже запланированных,
+        по истечении timeout незавершенные задачи отменяются
+        """
+        self._closed = True
+        deadline = monotonic() + timeout if timeout is not None else None
+
+        while self._in_flight:
+            remaining = deadline - monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            await asyncio.wait(list(self._in_flight.values()), timeout=remaining)
+
+        self.dropped += len(self._pending)
+        self._pending.clear()
+        futures = list(self._in_flight.values())
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # задачи, созданные в другом event loop, в текущем уже не выполнятся
+            self._loop = loop
+            self._pending.clear()
+            self._in_flight.clear()
+
+    def _start(self, key: str, coro_factory: Callable[[], Coroutine]) -> None:
+        future = asyncio.ensure_future(coro_factory())
+        self._in_flight[key] = future
+        future.add_done_callback(functools.partial(self._on_done, key))
+
+    def _on_done(self, key: str, future: 'asyncio.Future[Any]') -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled() and future.exception() is not None:
+            self.failed += 1
+
+        if self._pending and not future.get_loop().is_closed():
+            next_key, next_coro_factory = self._pending.popitem(last=False)
+            self._start(next_key, next_coro_factory)
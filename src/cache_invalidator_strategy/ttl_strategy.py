@@ -1,37 +1,98 @@
 from functools import partial
-from typing import Any
+from typing import Any, Optional
 
 from src.cache_invalidator_strategy.base import AbstractCacheStrategy, HelpUtilsMixin
-from src.cache_manager.cache_manager import BaseCacheControlService
+from src.cache_manager.cache_manager import AbstractCacheService, Guard
+from src.cache_manager.envelope import MISSING, EmptyResult, unwrap
+from src.cache_manager.local_cache import LocalCache
+from src.circuit_breaker.circuit_breaker import CircuitBreaker
+from src.lease_lock.lease_lock import CacheLease
+from src.metrics.metrics import request_metrics
+from src.request_hedger.request_hedger import RequestHedger
 
 
 class TTLInvalidator(AbstractCacheStrategy, HelpUtilsMixin):
     def __init__(
         self,
-        cache_service: BaseCacheControlService,
+        cache_service: AbstractCacheService,
         use_retry: bool = False,
+        cache_lease: Optional[CacheLease] = None,
+        negative_cache_ttl: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        stale_cache: Optional[LocalCache] = None,
+        request_hedger: Optional[RequestHedger] = None,
         **kwargs: Any,
     ) -> None:
+        """
+        :param cache_lease: при отсутствии кэша интегратор запрашивает только процесс, получивший аренду
+        :param negative_cache_ttl: время в секундах, на которое кэшируются пустые ответы интегратора,
+            если не задано, пустые ответы не кэшируются
+        :param circuit_breaker: выключатель запросов к интегратору
+        :param stale_cache: последние известные значения в памяти процесса, отдаются, если кэш в редисе
+            истек, а интегратор недоступен или выключатель открыт
+        :param request_hedger: дублирующие запросы к интегратору при отсутствии кэша
+        """
         self.use_retry = use_retry
         self.cache_service = cache_service
+        self.cache_lease = cache_lease
+        self.negative_cache_ttl = negative_cache_ttl
+        self.circuit_breaker = circuit_breaker
+        self.stale_cache = stale_cache
+        self.request_hedger = request_hedger
         self.kwargs = kwargs
+        self.executor = self.build_executor(
+            use_retry=use_retry,
+            use_rate_limiter=False,
+            circuit_breaker=circuit_breaker,
+            request_hedger=request_hedger,
+            **kwargs,
+        )
+        self.stale_fallback_exceptions = self._stale_fallback_exceptions(circuit_breaker)
 
     async def get_data(
         self,
         wrapped_func: partial,
         cache_key: str,
     ) -> Any:
-        executor = self.build_executor(
-            cache_key=cache_key,
-            use_retry=self.use_retry,
-            use_rate_limiter=False,
-            **self.kwargs,
-        )
-        cache = await self.cache_service.get_cache(cache_key)
-        if cache:
-            return cache
-        result = await executor(wrapped_func)
-        if result:
-            await self.cache_service.set_cache(cache_key, result)
+        cache = await self._read_cache(cache_key)
+        if cache is not MISSING:
+            request_metrics.get().hits += 1
+            if self.stale_cache is not None:
+                self.stale_cache.set(cache_key, cache)
+            return unwrap(cache)
+        request_metrics.get().misses += 1
+
+        try:
+            if self.cache_lease is not None:
+                return unwrap(
+                    await self.cache_lease.fill(
+                        cache_key,
+                        fetch=partial(self.executor, wrapped_func, cache_key),
+                        store=partial(self._store, cache_key),
+                        read=partial(self._read_cache, cache_key),
+                    )
+                )
+
+            result = await self.executor(wrapped_func, cache_key)
+        except self.stale_fallback_exceptions:
+            stale = self.stale_cache.get(cache_key) if self.stale_cache is not None else None
+            if stale is None:
+                raise
+            request_metrics.get().stale_fallbacks += 1
+            return unwrap(stale)
+
+        await self._store(cache_key, result)
 
         return result
+
+    async def _read_cache(self, cache_key: str) -> Any:
+        cache = await self.cache_service.get_cache(cache_key)
+        return MISSING if cache is None else cache
+
+    async def _store(self, cache_key: str, result: Any, guard: Optional[Guard] = None) -> None:
+        if result:
+            await self.cache_service.set_cache(cache_key, result, guard=guard)
+            if self.stale_cache is not None:
+                self.stale_cache.set(cache_key, result)
+        elif self.negative_cache_ttl is not None and EmptyResult.supports(result):
+            await self.cache_service.set_cache(cache_key, EmptyResult(result), ttl=self.negative_cache_ttl, guard=guard)
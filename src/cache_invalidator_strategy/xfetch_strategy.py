@@ -0,0 +1,107 @@
+import math
+import random
+from functools import partial
+from time import monotonic
+from typing import Any, Optional
+
+from src.cache_invalidator_strategy.base import AbstractCacheStrategy, HelpUtilsMixin
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.cache_manager.local_cache import LocalCache
+from src.circuit_breaker.circuit_breaker import CircuitBreaker
+from src.exceptions.exceptions import InvalidCacheError
+from src.metrics.metrics import request_metrics
+from src.request_hedger.request_hedger import RequestHedger
+
+
+class XFetchInvalidator(AbstractCacheStrategy, HelpUtilsMixin):
+    def __init__(
+        self,
+        cache_service: BaseCacheControlService,
+        use_retry: bool = False,
+        beta: float = 1.0,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        stale_cache: Optional[LocalCache] = None,
+        request_hedger: Optional[RequestHedger] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Вероятностное досрочное обновление кэша (XFetch)
+
+        Вместе с кэшем читаются оставшееся время жизни ключа и длительность последнего запроса к интегратору.
+        Чем ближе истечение кэша и чем дольше запрос, тем выше вероятность обновить кэш досрочно,
+        поэтому обновления горячих ключей распределяются во времени без блокировок.
+        Время жизни кэша должно быть задано в cache_service через ex или px
+
+        :param beta: больше 1 - обновлять раньше, меньше 1 - позже
+        :param circuit_breaker: выключатель запросов к интегратору
+        :param stale_cache: последние известные значения в памяти процесса, отдаются, если интегратор
+            недоступен или выключатель открыт
+        :param request_hedger: дублирующие запросы к интегратору при отсутствии кэша
+        """
+        if beta <= 0:
+            raise ValueError('beta must be positive')
+
+        self.use_retry = use_retry
+        self.cache_service = cache_service
+        self.beta = beta
+        self.circuit_breaker = circuit_breaker
+        self.stale_cache = stale_cache
+        self.request_hedger = request_hedger
+        self.kwargs = kwargs
+        self.executor = self.build_executor(
+            use_retry=use_retry,
+            use_rate_limiter=False,
+            circuit_breaker=circuit_breaker,
+            request_hedger=request_hedger,
+            **kwargs,
+        )
+        self.stale_fallback_exceptions = self._stale_fallback_exceptions(circuit_breaker)
+
+    @staticmethod
+    def _delta_key(cache_key: str) -> str:
+        return cache_key + ':xfetch_delta'
+
+    def _should_recompute(self, ttl: Optional[float], delta: Optional[str]) -> bool:
+        if ttl is None or delta is None:
+            return False
+        # 1 - random() лежит в (0, 1], логарифм всегда определен
+        return -float(delta) * self.beta * math.log(1.0 - random.random()) >= ttl  # nosec B311
+
+    async def get_data(
+        self,
+        wrapped_func: partial,
+        cache_key: str,
+    ) -> Any:
+        delta_key = self._delta_key(cache_key)
+
+        try:
+            cache, ttl, delta = await self.cache_service.get_cache_with_meta(cache_key, delta_key)
+        except InvalidCacheError:
+            cache, ttl, delta = None, None, None
+
+        if cache is not None and self.stale_cache is not None:
+            self.stale_cache.set(cache_key, cache)
+        if cache is not None and not self._should_recompute(ttl, delta):
+            request_metrics.get().hits += 1
+            return cache
+        request_metrics.get().misses += 1
+
+        started_at = monotonic()
+        try:
+            result = await self.executor(wrapped_func, cache_key)
+        except self.stale_fallback_exceptions:
+            # при досрочном обновлении кэш еще жив и отдается он
+            stale = cache
+            if stale is None and self.stale_cache is not None:
+                stale = self.stale_cache.get(cache_key)
+            if stale is None:
+                raise
+            request_metrics.get().stale_fallbacks += 1
+            return stale
+
+        if result:
+            await self.cache_service.set_cache_with_meta(cache_key, result, delta_key, monotonic() - started_at)
+            if self.stale_cache is not None:
+                self.stale_cache.set(cache_key, result)
+
+        return result
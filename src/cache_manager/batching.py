@@ -0,0 +1,170 @@
+import asyncio
+import functools
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from src.cache_manager.cache_manager import AbstractCacheService, BaseCacheControlService, Guard
+from src.exceptions.exceptions import InvalidCacheError
+from src.metrics.metrics import request_metrics
+
+# чтения подряд идущих запросов, отправляются одним MGET
+PendingGets = Dict[str, List[asyncio.Future]]
+PendingSet = Tuple[str, Any, Optional[float], asyncio.Future]
+
+
+class BatchingCacheService(AbstractCacheService):
+    def __init__(
+        self,
+        cache_service: BaseCacheControlService,
+        batch_window: float = 0.0,
+        max_batch_size: int = 100,
+    ) -> None:
+        """
+        Собирает чтения и записи кэша, сделанные в одной итерации event loop
+        или в течение batch_window секунд, и отправляет их одним пайплайном с MGET
+
+        Команды пайплайна идут в порядке запросов: подряд идущие чтения объединяются в один MGET,
+        поэтому чтение после записи того же ключа видит записанное значение
+
+        :param cache_service: сервис кэша в редисе, выполняет преобразование и проверку кэша
+        :param batch_window: сколько секунд копить запросы, 0 - до следующей итерации event loop
+        :param max_batch_size: при достижении этого числа запросов пачка отправляется сразу
+        """
+        self.cache_service = cache_service
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+
+        self._batch: List[Union[PendingGets, PendingSet]] = []
+        self._batch_size = 0
+        self._flush_handle: Optional[asyncio.Handle] = None
+
+    @property
+    def redis_connection(self) -> Any:
+        return self.cache_service.redis_connection
+
+    async def get_cache(self, redis_key: str) -> Optional[str]:
+        future = asyncio.get_running_loop().create_future()
+        last = self._batch[-1] if self._batch else None
+        if isinstance(last, dict):
+            gets = last
+        else:
+            gets = {}
+            self._batch.append(gets)
+        if redis_key not in gets:
+            gets[redis_key] = []
+            self._batch_size += 1
+        gets[redis_key].append(future)
+        self._schedule_flush()
+        return await future
+
+    async def set_cache(
+        self, redis_key: str, data: Any, ttl: Optional[float] = None, guard: Optional[Guard] = None
+    ) -> Optional[str]:
+        if guard is not None:
+            # запись с проверкой выполняется скриптом и не попадает в пачку
+            return await self.cache_service.set_cache(redis_key, data, ttl=ttl, guard=guard)
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((redis_key, data, ttl, future))
+        self._batch_size += 1
+        self._schedule_flush()
+        return await future
+
+    def _schedule_flush(self) -> None:
+        if self._batch_size >= self.max_batch_size:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            if self.batch_window > 0:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._batch = self._batch, []
+        self._batch_size = 0
+
+        futures: List[asyncio.Future] = []
+        for item in batch:
+            if isinstance(item, dict):
+                futures.extend(future for item_futures in item.values() for future in item_futures)
+            else:
+                futures.append(item[3])
+        task = asyncio.ensure_future(self._execute(batch))
+        task.add_done_callback(functools.partial(self._resolve_unhandled, futures))
+
+    async def _execute(self, batch: List[Union[PendingGets, PendingSet]]) -> None:
+        pipeline = self.redis_connection.pipeline(transaction=False)
+        queued: List[Union[PendingGets, Tuple[str, asyncio.Future]]] = []
+        for item in batch:
+            if isinstance(item, dict):
+                pipeline.mget(list(item))
+                queued.append(item)
+                continue
+
+            redis_key, data, ttl, future = item
+            try:
+                pipeline.set(redis_key, self.cache_service.dump_cache(data), **self.cache_service.set_kwargs(ttl))
+            except InvalidCacheError as exc:
+                self._resolve(future, exception=exc)
+                continue
+            queued.append((redis_key, future))
+
+        if not queued:
+            return
+
+        # ошибка команды достается только ожидающим ее ответа
+        started_at = perf_counter()
+        results = await pipeline.execute(raise_on_error=False)
+        request_metrics.get().redis_latency.observe(perf_counter() - started_at)
+
+        for queued_item, result in zip(queued, results):
+            if isinstance(queued_item, dict):
+                self._route_gets(queued_item, result)
+                continue
+
+            redis_key, future = queued_item
+            if isinstance(result, Exception):
+                self._resolve(future, exception=result)
+                continue
+            if result:
+                self.cache_service.publish_invalidation(redis_key)
+            self._resolve(future, result=result)
+
+    def _route_gets(self, gets: PendingGets, values: Any) -> None:
+        if isinstance(values, Exception):
+            for futures in gets.values():
+                for future in futures:
+                    self._resolve(future, exception=values)
+            return
+
+        for (redis_key, futures), raw in zip(gets.items(), values):
+            try:
+                cache = self.cache_service.load_cache(raw)
+            except InvalidCacheError as exc:
+                for future in futures:
+                    self._resolve(future, exception=exc)
+                continue
+            for future in futures:
+                self._resolve(future, result=cache)
+
+    def _resolve_unhandled(self, futures: List[asyncio.Future], task: asyncio.Future) -> None:
+        """
+        Если пачка не выполнилась из-за ошибки, ошибку получают все, кто еще ждет ответа
+        """
+        exception = asyncio.CancelledError() if task.cancelled() else task.exception()
+        if exception is None:
+            return
+        for future in futures:
+            self._resolve(future, exception=exception)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
@@ -1,10 +1,41 @@
 import abc
 from abc import abstractmethod
-from typing import Any, Callable, List, Optional
-
-from aioredis import Redis
+from datetime import timedelta
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from src.backend.backend import Backend
+from src.cache_manager.codecs import ValueCodec
+from src.cache_manager.envelope import CacheEnvelope, EmptyResult, unwrap
+from src.cache_manager.invalidation_bus import InvalidationBus
+from src.cache_manager.local_cache import LocalCache
 from src.exceptions.exceptions import InvalidCacheError
+from src.lua_script.lua_script import LuaScript
+from src.metrics.metrics import request_metrics
+
+# guard - ключ и значение, при которых разрешена запись, например ключ аренды и fencing токен
+Guard = Tuple[str, Any]
+
+GUARDED_SET_SCRIPT = LuaScript(
+    """
+if redis.call('get', KEYS[2]) ~= ARGV[1] then
+    return false
+end
+return redis.call('set', KEYS[1], unpack(ARGV, 2))
+"""
+)
+
+
+@GUARDED_SET_SCRIPT.python_equivalent
+def _guarded_set(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    if call('get', keys[1]) != args[0]:
+        return None
+    set_kwargs: Dict[str, Any] = {}
+    options = iter(args[2:])
+    for option in options:
+        name = option.decode().lower()
+        set_kwargs[name] = int(next(options)) if name in ('ex', 'px') else True
+    return 'OK' if call('set', keys[0], args[1], **set_kwargs) else None
 
 
 class AbstractCacheService(abc.ABC):
@@ -13,38 +44,191 @@ class AbstractCacheService(abc.ABC):
         pass
 
     @abstractmethod
-    async def set_cache(self, redis_key: str, data: Any) -> Optional[str]:
-        pass
+    async def set_cache(
+        self, redis_key: str, data: Any, ttl: Optional[float] = None, guard: Optional[Guard] = None
+    ) -> Optional[str]:
+        """
+        :param ttl: время жизни в секундах вместо заданного в сервисе
+        :param guard: кэш записывается, только если ключ guard хранит значение guard,
+            проверка и запись выполняются атомарно
+        """
 
 
 class BaseCacheControlService(AbstractCacheService):
     def __init__(
         self,
-        redis_connection: Redis,
+        redis_connection: Backend,
+        value_codec: Optional[ValueCodec] = None,
+        invalidation_bus: Optional[InvalidationBus] = None,
         **kwargs: Any,
     ) -> None:
         """
 
+        :param value_codec: кодек и сжатие значений, если не задан, значения пишутся в редис как есть
+        :param invalidation_bus: рассылает записанные и удаленные ключи процессам с локальным кэшем
         :param ex: Set the specified expire time, in seconds,
         :param px: Set the specified expire time, in milliseconds,
         :param nx: Only set the key if it does not already exist,
         :param xx: Only set the key if it already exist,
         :param keepttl: Retain the time to live associated with the key,
+
+        Значения, переданные как CacheEnvelope, сохраняются вместе с метаданными
+        и возвращаются из get_cache также в виде CacheEnvelope.
+        EmptyResult сохраняется и возвращается без валидации и кодека
         """
         self.redis_connection = redis_connection
+        self.value_codec = value_codec
+        self.invalidation_bus = invalidation_bus
         self.kwargs = kwargs
 
     async def get_cache(self, redis_key: str) -> Optional[str]:
-        return await self.redis_connection.get(redis_key)
+        started_at = perf_counter()
+        raw = await self.redis_connection.get(redis_key)
+        request_metrics.get().redis_latency.observe(perf_counter() - started_at)
+        return self.load_cache(raw)
+
+    async def set_cache(
+        self, redis_key: str, data: Any, ttl: Optional[float] = None, guard: Optional[Guard] = None
+    ) -> Optional[str]:
+        raw = self.dump_cache(data)
+        started_at = perf_counter()
+        if guard is None:
+            result = await self.redis_connection.set(redis_key, raw, **self.set_kwargs(ttl))
+        else:
+            guard_key, guard_value = guard
+            result = await GUARDED_SET_SCRIPT(
+                self.redis_connection,
+                keys=[redis_key, guard_key],
+                args=[guard_value, raw, *_set_options(self.set_kwargs(ttl))],
+            )
+        request_metrics.get().redis_latency.observe(perf_counter() - started_at)
+        if result:
+            self.publish_invalidation(redis_key)
+        return result
+
+    async def delete_cache(self, redis_key: str) -> int:
+        result = await self.redis_connection.delete(redis_key)
+        self.publish_invalidation(redis_key)
+        return result
+
+    def publish_invalidation(self, redis_key: str) -> None:
+        """
+        Сообщает другим процессам, что кэш ключа изменился, если задана шина инвалидации
+        """
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.publish(redis_key)
+
+    def set_kwargs(self, ttl: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Аргументы SET, время жизни из ttl заменяет заданное в сервисе
+        """
+        if ttl is None:
+            return self.kwargs
+        kwargs = {key: value for key, value in self.kwargs.items() if key not in ('ex', 'px', 'keepttl')}
+        kwargs['px'] = max(1, int(ttl * 1000))
+        return kwargs
+
+    def load_cache(self, raw: Any) -> Any:
+        """
+        Преобразует значение, полученное из редиса, в кэш и проверяет его
+        """
+        empty_result = EmptyResult.loads(raw)
+        if isinstance(empty_result, EmptyResult):
+            return empty_result
+
+        cache = CacheEnvelope.loads(raw)
+        if self.value_codec is not None:
+            if isinstance(cache, CacheEnvelope):
+                cache.value = self.value_codec.decode(cache.value)
+            else:
+                cache = self.value_codec.decode(cache)
+        return self._validate_cache(cache)
+
+    def dump_cache(self, data: Any) -> Any:
+        """
+        Проверяет кэш и преобразует его в значение для записи в редис
+        """
+        if isinstance(data, EmptyResult):
+            return data.dumps()
+
+        self._validate_data(data)
+        if self.value_codec is not None:
+            if isinstance(data, CacheEnvelope):
+                return CacheEnvelope(
+                    self.value_codec.encode(data.value),
+                    soft_ttl=data.soft_ttl,
+                    hard_ttl=data.hard_ttl,
+                    written_at=data.written_at,
+                ).dumps()
+            return self.value_codec.encode(data)
+        return data.dumps() if isinstance(data, CacheEnvelope) else data
+
+    async def get_cache_with_ttl(self, redis_key: str) -> Tuple[Any, Optional[float]]:
+        """
+        Одним пайплайном получает кэш и оставшееся время жизни ключа в секундах
+        """
+        pipeline = self.redis_connection.pipeline()
+        pipeline.get(redis_key)
+        pipeline.pttl(redis_key)
+        started_at = perf_counter()
+        result, pttl = await pipeline.execute()
+        request_metrics.get().redis_latency.observe(perf_counter() - started_at)
+
+        return self.load_cache(result), pttl / 1000 if pttl >= 0 else None
+
+    async def get_cache_with_meta(self, redis_key: str, meta_key: str) -> Tuple[Any, Optional[float], Any]:
+        """
+        Одним пайплайном получает кэш, оставшееся время жизни ключа в секундах
+        и служебное значение, сохраненное рядом с кэшем
+        """
+        pipeline = self.redis_connection.pipeline()
+        pipeline.get(redis_key)
+        pipeline.pttl(redis_key)
+        pipeline.get(meta_key)
+        started_at = perf_counter()
+        result, pttl, meta = await pipeline.execute()
+        request_metrics.get().redis_latency.observe(perf_counter() - started_at)
+
+        return self.load_cache(result), pttl / 1000 if pttl >= 0 else None, meta
+
+    async def set_cache_with_meta(
+        self, redis_key: str, data: Any, meta_key: str, meta: Any, ttl: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        :param ttl: время жизни кэша и служебного значения в секундах вместо заданного в сервисе
+        """
+        set_kwargs = self.set_kwargs(ttl)
+        pipeline = self.redis_connection.pipeline()
+        pipeline.set(redis_key, self.dump_cache(data), **set_kwargs)
+        pipeline.set(meta_key, meta, **set_kwargs)
+        result, _ = await pipeline.execute()
+        if result:
+            self.publish_invalidation(redis_key)
+
+        return result
+
+    def _validate_cache(self, result: Any) -> Any:
+        return result
 
-    async def set_cache(self, redis_key: str, data: Any) -> Optional[str]:
-        return await self.redis_connection.set(redis_key, data, **self.kwargs)
+    def _validate_data(self, data: Any) -> None:
+        pass
+
+    @property
+    def ttl(self) -> Optional[float]:
+        """
+        Время жизни кэша в секундах, если оно задано через ex или px
+        """
+        if (ex := self.kwargs.get('ex')) is not None:
+            return ex.total_seconds() if isinstance(ex, timedelta) else float(ex)
+        if (px := self.kwargs.get('px')) is not None:
+            return px.total_seconds() if isinstance(px, timedelta) else px / 1000
+        return None
 
 
 class CacheControlService(BaseCacheControlService):
     def __init__(
         self,
-        redis_connection: Redis,
+        redis_connection: Backend,
         cache_validators: Optional[List[Callable]] = None,
         cache_filters: Optional[List[Callable]] = None,
         **kwargs: Any,
@@ -52,20 +236,120 @@ class CacheControlService(BaseCacheControlService):
         super().__init__(redis_connection=redis_connection, **kwargs)
         self.cache_validators = cache_validators
         self.preset_cache_filters = cache_filters
-        self.kwargs = kwargs
 
-    async def get_cache(self, redis_key: str) -> Optional[str]:
-        result: Optional[Any] = await self.redis_connection.get(redis_key)
-        if self.cache_validators and not all([validator(result) for validator in self.cache_validators]):
+    def _validate_cache(self, result: Any) -> Any:
+        if self.cache_validators and not all([validator(unwrap(result)) for validator in self.cache_validators]):
+            request_metrics.get().validator_rejections += 1
             raise InvalidCacheError(result)
 
         return result
 
-    async def set_cache(self, redis_key: str, data: str) -> Optional[str]:
+    def _validate_data(self, data: Any) -> None:
         """
-        Используется для сохранения кэша
+        Используется перед сохранением кэша
         В качестве кэша могут служить json ответов либо xml тела документов
         """
-        if self.preset_cache_filters and not all([_filter(data) for _filter in self.preset_cache_filters]):
+        if self.preset_cache_filters and not all([_filter(unwrap(data)) for _filter in self.preset_cache_filters]):
+            request_metrics.get().filter_rejections += 1
             raise InvalidCacheError
-        return await self.redis_connection.set(redis_key, data, **self.kwargs)
+
+
+class TwoTierCacheService(AbstractCacheService):
+    def __init__(
+        self,
+        cache_service: BaseCacheControlService,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        local_ttl: float = 1.0,
+        invalidation_bus: Optional[InvalidationBus] = None,
+    ) -> None:
+        """
+        Кэш в памяти процесса (L1) перед кэшем в редисе
+
+        Время жизни записи в L1 не превышает время жизни кэша в редисе.
+        В L1 попадают только значения, прошедшие валидацию сервиса кэша
+
+        :param cache_service: сервис кэша в редисе
+        :param max_entries: максимальное число записей в L1
+        :param max_bytes: максимальный суммарный размер значений в L1
+        :param local_ttl: время жизни записи в L1 в секундах
+        :param invalidation_bus: рассылает записанные и удаленные ключи другим процессам
+            и удаляет из L1 ключи, измененные другими процессами, по умолчанию шина сервиса кэша
+        """
+        self.cache_service = cache_service
+        redis_ttl = cache_service.ttl
+        self.local_cache = LocalCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl=min(local_ttl, redis_ttl) if redis_ttl is not None else local_ttl,
+        )
+        self.invalidation_bus = invalidation_bus if invalidation_bus is not None else cache_service.invalidation_bus
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.register(self.local_cache)
+
+    @property
+    def redis_connection(self) -> Backend:
+        return self.cache_service.redis_connection
+
+    @property
+    def hit_rate(self) -> float:
+        return self.local_cache.hit_rate
+
+    async def get_cache(self, redis_key: str) -> Optional[str]:
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.start()
+
+        result = self.local_cache.get(redis_key)
+        if result is not None:
+            return result
+
+        result, redis_ttl = await self.cache_service.get_cache_with_ttl(redis_key)
+        self.local_cache.set(redis_key, result, ttl=self._local_ttl(redis_ttl))
+        return result
+
+    async def set_cache(
+        self, redis_key: str, data: Any, ttl: Optional[float] = None, guard: Optional[Guard] = None
+    ) -> Optional[str]:
+        result = await self.cache_service.set_cache(redis_key, data, ttl=ttl, guard=guard)
+        if not result:
+            # SET с nx, xx или guard не записал значение, в редисе осталось прежнее
+            self.local_cache.delete(redis_key)
+            return result
+        self.local_cache.set(redis_key, data, ttl=self._local_ttl(ttl))
+        self._publish(redis_key)
+        return result
+
+    async def delete_cache(self, redis_key: str) -> int:
+        result = await self.cache_service.delete_cache(redis_key)
+        self.local_cache.delete(redis_key)
+        self._publish(redis_key)
+        return result
+
+    def _publish(self, redis_key: str) -> None:
+        # сервис кэша с той же шиной уже разослал ключ
+        if self.invalidation_bus is not None and self.invalidation_bus is not self.cache_service.invalidation_bus:
+            self.invalidation_bus.publish(redis_key)
+
+    def _local_ttl(self, redis_ttl: Optional[float]) -> Optional[float]:
+        """
+        Время жизни записи в L1, не больше оставшегося времени жизни кэша в редисе
+        """
+        local_ttl = self.local_cache.ttl
+        if redis_ttl is not None and (local_ttl is None or redis_ttl < local_ttl):
+            return redis_ttl
+        return local_ttl
+
+
+def _set_options(kwargs: Dict[str, Any]) -> List[Any]:
+    """
+    Аргументы SET из ex, px, nx, xx, keepttl в виде аргументов команды
+    """
+    options: List[Any] = []
+    if (ex := kwargs.get('ex')) is not None:
+        options += ['EX', int(ex.total_seconds()) if isinstance(ex, timedelta) else ex]
+    if (px := kwargs.get('px')) is not None:
+        options += ['PX', int(px.total_seconds() * 1000) if isinstance(px, timedelta) else px]
+    for flag in ('nx', 'xx', 'keepttl'):
+        if kwargs.get(flag):
+            options.append(flag.upper())
+    return options
@@ -0,0 +1,220 @@
+import abc
+import json
+import lzma
+import pickle  # nosec B403
+import zlib
+from abc import abstractmethod
+from time import perf_counter
+from typing import Any, Dict, Optional, Type
+
+from src.exceptions.exceptions import InvalidCacheError
+
+# байты 0xF5-0xFF не встречаются в UTF-8, поэтому значения с заголовком не спутать
+# со строками, записанными без кодека
+PLAIN_HEADER = b'\xf5'
+ZLIB_HEADER = b'\xf6'
+LZMA_HEADER = b'\xf7'
+
+
+class Codec(abc.ABC):
+    """
+    Преобразует значение кэша в байты и обратно
+    """
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        pass
+
+
+class RawCodec(Codec):
+    """
+    Байты сохраняются как есть, строки - в UTF-8
+    """
+
+    def encode(self, value: Any) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return data
+
+
+class StrCodec(RawCodec):
+    def decode(self, data: bytes) -> Any:
+        return data.decode()
+
+
+class JsonCodec(Codec):
+    def encode(self, value: Any) -> bytes:
+        try:
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+        except (TypeError, ValueError) as exc:
+            raise InvalidCacheError(value) from exc
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class PickleCodec(Codec):
+    """
+    Подходит только для кэша, который пишут доверенные процессы
+    """
+
+    def __init__(self, protocol: int = pickle.HIGHEST_PROTOCOL) -> None:
+        self.protocol = protocol
+
+    def encode(self, value: Any) -> bytes:
+        try:
+            return pickle.dumps(value, protocol=self.protocol)
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            raise InvalidCacheError(value) from exc
+
+    def decode(self, data: bytes) -> Any:
+        return pickle.loads(data)  # nosec B301
+
+
+class Compressor(abc.ABC):
+    header: bytes
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class ZlibCompressor(Compressor):
+    header = ZLIB_HEADER
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class LzmaCompressor(Compressor):
+    """
+    Сжимает сильнее zlib, но заметно медленнее
+    """
+
+    header = LZMA_HEADER
+
+    def __init__(self, preset: int = 6) -> None:
+        self.preset = preset
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self.preset)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lzma.decompress(data)
+
+
+DECOMPRESSORS: Dict[bytes, Type[Compressor]] = {
+    ZLIB_HEADER: ZlibCompressor,
+    LZMA_HEADER: LzmaCompressor,
+}
+
+
+class ValueCodec:
+    def __init__(
+        self,
+        codec: Optional[Codec] = None,
+        compressor: Optional[Compressor] = None,
+        compress_threshold: int = 1024,
+    ) -> None:
+        """
+        Кодирует значение кэша и сжимает его, если оно больше compress_threshold байт.
+        Первый байт значения указывает, сжато ли оно и каким алгоритмом, поэтому читаются
+        значения, записанные с другим алгоритмом сжатия или без сжатия.
+        Значения без заголовка, записанные без кодека, возвращаются строкой или байтами, как есть
+
+        Значения хранятся в бинарном виде, соединение с редисом должно быть создано с decode_responses=False
+
+        :param codec: кодек значения, по умолчанию JsonCodec
+        :param compressor: алгоритм сжатия, если не задан, значения не сжимаются
+        :param compress_threshold: минимальный размер закодированного значения в байтах для сжатия
+        """
+        self.codec = codec if codec is not None else JsonCodec()
+        self.compressor = compressor
+        self.compress_threshold = compress_threshold
+        self._decompressors: Dict[bytes, Compressor] = {}
+        if compressor is not None:
+            self._decompressors[compressor.header] = compressor
+
+        self.encoded_bytes = 0
+        self.stored_bytes = 0
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+        self.encoded = 0
+        self.decoded = 0
+
+    @property
+    def compression_ratio(self) -> float:
+        """
+        Во сколько раз записанные значения меньше закодированных
+        """
+        return self.encoded_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+    @property
+    def avg_encode_time(self) -> float:
+        return self.encode_time / self.encoded if self.encoded else 0.0
+
+    @property
+    def avg_decode_time(self) -> float:
+        return self.decode_time / self.decoded if self.decoded else 0.0
+
+    def encode(self, value: Any) -> bytes:
+        started_at = perf_counter()
+        data = self.codec.encode(value)
+        if self.compressor is not None and len(data) >= self.compress_threshold:
+            stored = self.compressor.header + self.compressor.compress(data)
+        else:
+            stored = PLAIN_HEADER + data
+
+        self.encode_time += perf_counter() - started_at
+        self.encoded += 1
+        self.encoded_bytes += len(data)
+        self.stored_bytes += len(stored)
+        return stored
+
+    def decode(self, raw: Any) -> Any:
+        if not isinstance(raw, bytes) or not raw:
+            return raw
+
+        header, data = raw[:1], raw[1:]
+        if header != PLAIN_HEADER and header not in DECOMPRESSORS:
+            return self._decode_legacy(raw)
+
+        started_at = perf_counter()
+        try:
+            if header != PLAIN_HEADER:
+                data = self._get_decompressor(header).decompress(data)
+            value = self.codec.decode(data)
+        except (ValueError, TypeError, EOFError, pickle.UnpicklingError, zlib.error, lzma.LZMAError) as exc:
+            raise InvalidCacheError(raw) from exc
+
+        self.decode_time += perf_counter() - started_at
+        self.decoded += 1
+        return value
+
+    def _get_decompressor(self, header: bytes) -> Compressor:
+        decompressor = self._decompressors.get(header)
+        if decompressor is None:
+            decompressor = self._decompressors[header] = DECOMPRESSORS[header]()
+        return decompressor
+
+    @staticmethod
+    def _decode_legacy(raw: bytes) -> Any:
+        try:
+            return raw.decode()
+        except UnicodeDecodeError:
+            return raw
@@ -0,0 +1,152 @@
+import sys
+from time import time
+from typing import Any, Callable, Dict, Optional, Union
+
+ENVELOPE_PREFIX = '\x1ecache_envelope:'
+ENVELOPE_SEPARATOR = '\x1e'
+EMPTY_RESULT_PREFIX = '\x1eempty_result:'
+
+EMPTY_VALUES: Dict[str, Callable[[], Any]] = {
+    'NoneType': lambda: None,
+    'str': str,
+    'bytes': bytes,
+    'list': list,
+    'tuple': tuple,
+    'dict': dict,
+    'int': int,
+    'float': float,
+    'bool': bool,
+}
+
+
+class _Missing:
+    """
+    Отсутствие кэша, в отличие от закэшированного пустого значения
+    """
+
+    def __repr__(self) -> str:
+        return 'MISSING'
+
+    def __bool__(self) -> bool:
+        return False
+
+
+MISSING: Any = _Missing()
+
+
+class CacheEnvelope:
+    """
+    Значение кэша вместе с метаданными: временем записи, мягким и жестким сроком жизни
+
+    После мягкого срока жизни значение считается устаревшим, но еще может быть отдано,
+    после жесткого срока жизни значение считается отсутствующим
+    """
+
+    __slots__ = ('value', 'written_at', 'soft_ttl', 'hard_ttl')
+
+    def __init__(
+        self,
+        value: Any,
+        soft_ttl: float,
+        hard_ttl: Optional[float] = None,
+        written_at: Optional[float] = None,
+    ) -> None:
+        self.value = value
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.written_at = written_at if written_at is not None else time()
+
+    def __repr__(self) -> str:
+        return (
+            f'CacheEnvelope(value={self.value!r}, soft_ttl={self.soft_ttl}, '
+            f'hard_ttl={self.hard_ttl}, written_at={self.written_at})'
+        )
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self.value)
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time()) - self.written_at
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return self.age(now) >= self.soft_ttl
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return self.hard_ttl is not None and self.age(now) >= self.hard_ttl
+
+    def dumps(self) -> Union[str, bytes]:
+        hard_ttl = '' if self.hard_ttl is None else repr(self.hard_ttl)
+        header = f'{ENVELOPE_PREFIX}{self.written_at!r}:{self.soft_ttl!r}:{hard_ttl}{ENVELOPE_SEPARATOR}'
+        if isinstance(self.value, bytes):
+            return header.encode() + self.value
+        return header + (self.value if isinstance(self.value, str) else str(self.value))
+
+    @classmethod
+    def loads(cls, raw: Any) -> Any:
+        """
+        Возвращает CacheEnvelope, если значение было записано с метаданными, иначе само значение
+        """
+        if isinstance(raw, bytes):
+            if not raw.startswith(ENVELOPE_PREFIX.encode()):
+                return raw
+            raw_header, _, raw_value = raw[len(ENVELOPE_PREFIX) :].partition(ENVELOPE_SEPARATOR.encode())
+            return cls._from_header(raw_header.decode(), raw_value)
+
+        if isinstance(raw, str) and raw.startswith(ENVELOPE_PREFIX):
+            header, _, value = raw[len(ENVELOPE_PREFIX) :].partition(ENVELOPE_SEPARATOR)
+            return cls._from_header(header, value)
+
+        return raw
+
+    @classmethod
+    def _from_header(cls, header: str, value: Union[str, bytes]) -> 'CacheEnvelope':
+        written_at, soft_ttl, hard_ttl = header.split(':')
+        return cls(
+            value,
+            soft_ttl=float(soft_ttl),
+            hard_ttl=float(hard_ttl) if hard_ttl else None,
+            written_at=float(written_at),
+        )
+
+
+class EmptyResult:
+    """
+    Закэшированный пустой ответ интегратора: None, пустая строка, список, словарь, ноль и т.п.
+
+    В редисе хранится только тип значения, при чтении восстанавливается пустое значение этого типа
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f'EmptyResult(value={self.value!r})'
+
+    @staticmethod
+    def supports(value: Any) -> bool:
+        return not value and type(value).__name__ in EMPTY_VALUES
+
+    def dumps(self) -> str:
+        return EMPTY_RESULT_PREFIX + type(self.value).__name__
+
+    @classmethod
+    def loads(cls, raw: Any) -> Any:
+        """
+        Возвращает EmptyResult, если значение было записано как пустой ответ, иначе само значение
+        """
+        if isinstance(raw, bytes) and raw.startswith(EMPTY_RESULT_PREFIX.encode()):
+            type_name = raw[len(EMPTY_RESULT_PREFIX) :].decode()
+        elif isinstance(raw, str) and raw.startswith(EMPTY_RESULT_PREFIX):
+            type_name = raw[len(EMPTY_RESULT_PREFIX) :]
+        else:
+            return raw
+
+        if type_name not in EMPTY_VALUES:
+            return raw
+        return cls(EMPTY_VALUES[type_name]())
+
+
+def unwrap(cache: Any) -> Any:
+    return cache.value if isinstance(cache, (CacheEnvelope, EmptyResult)) else cache
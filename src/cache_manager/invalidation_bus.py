@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+from typing import Any, List, Optional
+from uuid import uuid4
+
+from aioredis import Redis
+from aioredis.exceptions import ConnectionError, TimeoutError
+
+from src.cache_manager.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    def __init__(
+        self,
+        redis_connection: Redis,
+        channel: str = 'cache_invalidation',
+        max_batch_size: int = 100,
+        reconnect_interval: float = 1.0,
+    ) -> None:
+        """
+        Рассылка ключей измененного кэша между процессами через pub/sub редиса
+
+        Ключи, записанные или удаленные в одной итерации event loop, отправляются одним сообщением.
+        Каждый процесс запускает одну задачу-подписчика, которая удаляет полученные ключи из локальных кэшей.
+        Сообщения, отправленные во время разрыва соединения, теряются, поэтому при разрыве
+        и при каждой (пере)подписке локальные кэши очищаются полностью
+
+        :param channel: канал pub/sub
+        :param max_batch_size: при достижении этого числа ключей сообщение отправляется сразу
+        :param reconnect_interval: пауза перед повторным подключением в секундах
+        """
+        self.redis_connection = redis_connection
+        self.channel = channel
+        self.max_batch_size = max_batch_size
+        self.reconnect_interval = reconnect_interval
+        self.node_id = uuid4().hex
+
+        self.published = 0
+        self.received = 0
+        self.reconnects = 0
+        self.malformed = 0
+
+        self._local_caches: List[LocalCache] = []
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._listener: Optional[asyncio.Task] = None
+        # событие привязано к event loop, поэтому создается при запуске подписчика
+        self._subscribed: Optional[asyncio.Event] = None
+
+    def register(self, local_cache: LocalCache) -> None:
+        self._local_caches.append(local_cache)
+
+    def start(self) -> None:
+        """
+        Запускает задачу-подписчика, если она еще не запущена в текущем event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._listener is not None and not self._listener.done() and self._listener.get_loop() is loop:
+            return
+        self._subscribed = asyncio.Event()
+        self._listener = loop.create_task(self._listen(self._subscribed))
+
+    async def wait_subscribed(self) -> None:
+        self.start()
+        if self._subscribed is not None:
+            await self._subscribed.wait()
+
+    async def stop(self) -> None:
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        await asyncio.gather(self._listener, return_exceptions=True)
+        self._listener = None
+
+    def publish(self, redis_key: str) -> None:
+        self.start()
+        self._pending.append(redis_key)
+        if len(self._pending) >= self.max_batch_size:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+
+    def invalidate(self, redis_key: str) -> None:
+        """
+        Удаляет ключ из локальных кэшей процесса и рассылает его другим процессам
+        """
+        for local_cache in self._local_caches:
+            local_cache.delete(redis_key)
+        self.publish(redis_key)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        keys, self._pending = self._pending, []
+        if not keys:
+            return
+
+        self.published += 1
+        task = asyncio.ensure_future(
+            self.redis_connection.publish(self.channel, json.dumps([self.node_id, list(dict.fromkeys(keys))]))
+        )
+        task.add_done_callback(self._on_published)
+
+    @staticmethod
+    def _on_published(task: asyncio.Future) -> None:
+        # потерянное сообщение ограничено временем жизни записи в локальном кэше
+        if not task.cancelled():
+            task.exception()
+
+    def _evict(self, data: Any) -> None:
+        node_id, keys = json.loads(data)
+        if node_id == self.node_id:
+            return
+        self.received += 1
+        for local_cache in self._local_caches:
+            for key in keys:
+                local_cache.delete(key)
+
+    def _receive(self, data: Any) -> None:
+        try:
+            self._evict(data)
+        except (ValueError, TypeError):
+            # неизвестно, какие ключи изменены, поэтому локальные кэши очищаются полностью
+            self.malformed += 1
+            logger.warning('Malformed cache invalidation message in channel %s: %r', self.channel, data)
+            self._clear()
+
+    def _clear(self) -> None:
+        for local_cache in self._local_caches:
+            local_cache.clear()
+
+    async def _listen(self, subscribed: asyncio.Event) -> None:
+        while True:
+            pubsub = self.redis_connection.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    if message['type'] == 'subscribe':
+                        # до подписки сообщения не доставлялись
+                        self._clear()
+                        subscribed.set()
+                    elif message['type'] == 'message':
+                        self._receive(message['data'])
+            except (ConnectionError, TimeoutError, OSError):
+                self.reconnects += 1
+                subscribed.clear()
+                self._clear()
+            finally:
+                await pubsub.reset()
+            await asyncio.sleep(self.reconnect_interval)
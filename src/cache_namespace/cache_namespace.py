@@ -0,0 +1,120 @@
+from typing import Iterable, List, Optional, Sequence
+
+from src.backend.backend import Backend
+from src.cache_manager.invalidation_bus import InvalidationBus
+from src.cache_manager.local_cache import LocalCache
+
+# ключей в одной команде DEL при удалении тега
+DELETE_CHUNK_SIZE = 500
+
+
+class CacheNamespace:
+    def __init__(
+        self,
+        redis_connection: Backend,
+        local_ttl: float = 1.0,
+        tag_ttl: float = 86400,
+        max_entries: int = 1024,
+        key_prefix: str = 'cache_namespace',
+        invalidation_bus: Optional[InvalidationBus] = None,
+    ) -> None:
+        """
+        Пространства имен кэша со счетчиками поколений и тегами
+
+        Для каждого уровня ключа (сервис, версия, интеграция, метод) в редисе хранится счетчик поколения,
+        номера поколений встраиваются в ключ кэша. Увеличение счетчика за O(1) делает недоступными
+        все ключи уровня, старые ключи удаляются редисом по истечении их времени жизни,
+        поэтому время жизни кэша должно быть задано в сервисе кэша.
+        Поколения читаются из локального кэша, изменения из других процессов видны через local_ttl секунд
+
+        Теги позволяют удалить группу ключей (например, все ключи пациента) одной командой
+
+        :param local_ttl: время жизни поколения в локальном кэше в секундах
+        :param tag_ttl: время жизни множества ключей тега в секундах, не меньше времени жизни кэша
+        :param max_entries: максимальное число поколений и записанных тегов в памяти процесса
+        :param key_prefix: префикс служебных ключей в редисе
+        :param invalidation_bus: шина TwoTierCacheService, удаленные по тегу ключи удаляются из L1
+            этого и других процессов
+        """
+        self.redis_connection = redis_connection
+        self.invalidation_bus = invalidation_bus
+        self.tag_ttl = tag_ttl
+        self.key_prefix = key_prefix
+        self._generations = LocalCache(max_entries=max_entries, ttl=local_ttl)
+        # повторная запись ключа в тег нужна только для продления времени жизни тега
+        self._tagged = LocalCache(max_entries=max_entries, ttl=tag_ttl / 2)
+
+    def _generation_key(self, scope: str) -> str:
+        return f'{self.key_prefix}:generation:{scope}'
+
+    def _tag_key(self, tag: str) -> str:
+        return f'{self.key_prefix}:tag:{tag}'
+
+    async def generations(self, scopes: Sequence[str]) -> List[int]:
+        """
+        Номера поколений уровней, отсутствующие в локальном кэше читаются одним MGET
+        """
+        result = [self._generations.get(scope) for scope in scopes]
+        missed = [i for i, generation in enumerate(result) if generation is None]
+        if missed:
+            values = await self.redis_connection.mget([self._generation_key(scopes[i]) for i in missed])
+            for i, value in zip(missed, values):
+                result[i] = int(value) if value is not None else 0
+                self._generations.set(scopes[i], result[i])
+        return result  # type: ignore[return-value]
+
+    async def apply(self, scopes: Sequence[str], prefix: str, cache_key: str) -> str:
+        """
+        Встраивает номера поколений в ключ кэша сразу после читаемого префикса
+        """
+        generation = 'g' + '.'.join(str(generation) for generation in await self.generations(scopes))
+        if cache_key.startswith(prefix):
+            return f'{prefix}:{generation}{cache_key[len(prefix):]}'
+        return f'{generation}:{cache_key}'
+
+    async def bump(self, *sections: str) -> int:
+        """
+        Инвалидирует все ключи уровня, например bump('lk_simi', '1.0') - все ключи версии 1.0 сервиса lk_simi
+        """
+        scope = ':'.join(sections)
+        generation = await self.redis_connection.incr(self._generation_key(scope))
+        self._generations.delete(scope)
+        return int(generation)
+
+    async def tag(self, cache_key: str, tags: Iterable[str]) -> None:
+        pipeline = None
+        for tag in tags:
+            tagged_key = f'{tag}\x1e{cache_key}'
+            if self._tagged.get(tagged_key):
+                continue
+            if pipeline is None:
+                pipeline = self.redis_connection.pipeline(transaction=False)
+            tag_key = self._tag_key(tag)
+            pipeline.sadd(tag_key, cache_key)
+            pipeline.expire(tag_key, int(self.tag_ttl))
+            self._tagged.set(tagged_key, True)
+
+        if pipeline is not None:
+            await pipeline.execute()
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """
+        Удаляет все ключи тега, возвращает их число
+
+        Множество ключей тега читается и удаляется одной транзакцией, сами ключи удаляются через бэкенд,
+        который распределяет их по слотам или узлам, поэтому ключи тега могут храниться на разных узлах
+        """
+        self._tagged.clear()
+        tag_key = self._tag_key(tag)
+        pipeline = self.redis_connection.pipeline(transaction=True)
+        pipeline.smembers(tag_key)
+        pipeline.delete(tag_key)
+        members, _ = await pipeline.execute()
+
+        cache_keys = [member.decode() if isinstance(member, bytes) else member for member in members]
+        for i in range(0, len(cache_keys), DELETE_CHUNK_SIZE):
+            await self.redis_connection.delete(*cache_keys[i : i + DELETE_CHUNK_SIZE])
+        if self.invalidation_bus is not None:
+            for cache_key in cache_keys:
+                self.invalidation_bus.invalidate(cache_key)
+        return len(cache_keys)
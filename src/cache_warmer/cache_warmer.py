@@ -0,0 +1,129 @@
+import asyncio
+import functools
+from typing import Any, Callable, Optional
+
+from aioredis.exceptions import ConnectionError, TimeoutError
+from tenacity import RetryError
+
+from src.backend.backend import Backend
+from src.cache_invalidator_strategy.base import HelpUtilsMixin
+from src.cache_invalidator_strategy.refresh_scheduler import RefreshScheduler
+from src.cache_manager.cache_manager import AbstractCacheService
+from src.exceptions.exceptions import CircuitOpenError
+from src.hot_keys.hot_keys import HotKeyTracker
+from src.metrics.metrics import RequestMetrics, request_metrics
+from src.rate_imiter.rate_limiter import RateLimitException
+
+
+class CacheWarmer(HelpUtilsMixin):
+    def __init__(
+        self,
+        hot_key_tracker: HotKeyTracker,
+        cache_service: AbstractCacheService,
+        redis_connection: Backend,
+        warm_ahead: float = 5.0,
+        interval: float = 1.0,
+        min_count: int = 2,
+        refresh_scheduler: Optional[RefreshScheduler] = None,
+        use_retry: bool = False,
+        use_rate_limiter: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Обновляет кэш самых частых ключей до истечения срока жизни, чтобы запросы к ним не попадали
+        на отсутствие кэша. Предназначен для TTLInvalidator: значения записываются через cache_service как есть
+
+        Раз в interval секунд проверяется срок жизни ключей из hot_key_tracker, ключи, которым осталось жить
+        не больше warm_ahead секунд, обновляются повтором последнего вызова в refresh_scheduler.
+        Запросы идут через исполнитель с ретраями и ограничителем интеграции, как у стратегий, ограничитель
+        строится с background=True. Если лимит исчерпан, ключ не обновляется и истекает как обычно
+
+        :param min_count: ключи с меньшей оценкой частоты не обновляются
+        :param kwargs: параметры ретраера, ограничителя запросов, circuit_breaker и bulkhead
+        """
+        if interval >= warm_ahead:
+            raise ValueError('interval must be less than warm_ahead')
+
+        self.hot_key_tracker = hot_key_tracker
+        self.cache_service = cache_service
+        self.redis_connection = redis_connection
+        self.warm_ahead = warm_ahead
+        self.interval = interval
+        self.min_count = min_count
+        self.refresh_scheduler = refresh_scheduler if refresh_scheduler is not None else RefreshScheduler()
+        self.executor = self.build_executor(
+            use_retry=use_retry,
+            use_rate_limiter=use_rate_limiter,
+            redis_connection=redis_connection,
+            background=True,
+            **kwargs,
+        )
+
+        self.warmed = 0
+        self.skipped = 0
+
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """
+        Запускает задачу прогрева, если она еще не запущена в текущем event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def warm_once(self) -> int:
+        """
+        Ставит в очередь обновление ключей, которые скоро истекут, возвращает число запланированных ключей
+        """
+        hot_keys = [cache_key for cache_key, _ in self.hot_key_tracker.hot_keys(self.min_count)]
+        if not hot_keys:
+            return 0
+
+        pipeline = self.redis_connection.pipeline()
+        for cache_key in hot_keys:
+            pipeline.pttl(cache_key)
+        ttls = await pipeline.execute()
+
+        scheduled = 0
+        for cache_key, ttl_ms in zip(hot_keys, ttls):
+            # отрицательный срок - ключа нет или он бессрочный, отсутствующий ключ заполнит запрос пользователя
+            if ttl_ms < 0 or ttl_ms > self.warm_ahead * 1000:
+                continue
+            stored_call = self.hot_key_tracker.get_call(cache_key)
+            if stored_call is None:
+                continue
+            call, metrics = stored_call
+            if self.refresh_scheduler.schedule(cache_key, functools.partial(self._warm, call, cache_key, metrics)):
+                scheduled += 1
+        return scheduled
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm_once()
+            except (ConnectionError, TimeoutError, OSError):
+                # редис недоступен, следующая попытка через interval
+                pass
+            await asyncio.sleep(self.interval)
+
+    async def _warm(self, call: Callable, cache_key: str, metrics: RequestMetrics) -> None:
+        metrics_token = request_metrics.set(metrics)
+        try:
+            result = await self.executor(call, cache_key)
+            if result:
+                await self.cache_service.set_cache(cache_key, result)
+                self.warmed += 1
+                metrics.warmups += 1
+        except (RateLimitException, RetryError, CircuitOpenError):
+            self.skipped += 1
+        finally:
+            request_metrics.reset(metrics_token)
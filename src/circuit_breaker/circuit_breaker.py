@@ -0,0 +1,223 @@
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, NoReturn, Optional, Tuple, Type
+
+from aioredis.exceptions import ConnectionError, TimeoutError
+
+from src.backend.backend import Backend
+from src.exceptions.exceptions import BulkheadFullError, CircuitOpenError, PoolSaturatedError
+from src.metrics.metrics import request_metrics
+from src.rate_imiter.rate_limiter import RateLimitException
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+OUTCOME_SUCCESS = 0
+OUTCOME_FAILURE = 1
+OUTCOME_SLOW = 2
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str = 'default',
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration: Optional[float] = None,
+        slow_call_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+        excluded_exceptions: Tuple[Type[BaseException], ...] = (
+            RateLimitException,
+            PoolSaturatedError,
+            BulkheadFullError,
+        ),
+        redis_connection: Optional[Backend] = None,
+        sync_interval: float = 1.0,
+        key_prefix: str = 'circuit_breaker',
+    ) -> None:
+        """
+        Автоматический выключатель запросов к интегратору
+
+        По последним window_size вызовам считаются доли ошибок и медленных вызовов. Если одна из них
+        достигла порога, выключатель открывается и open_timeout секунд вызовы сразу завершаются
+        CircuitOpenError. Затем выключатель пропускает half_open_probes пробных вызовов:
+        если все успешны - закрывается, при первой ошибке открывается снова.
+        Один экземпляр используется всеми стратегиями интеграции, состояние общее в процессе
+
+        :param name: название интеграции, часть ключа в редисе
+        :param slow_call_duration: вызовы дольше этого значения в секундах считаются медленными
+        :param minimum_calls: доли не считаются, пока в окне меньше вызовов
+        :param failure_exceptions: исключения, которые считаются ошибкой интегратора
+        :param excluded_exceptions: исключения, которые не считаются ни ошибкой, ни успехом
+        :param redis_connection: если задан, открытие выключателя видно другим процессам
+            через ключ в редисе, процессы проверяют его не чаще раза в sync_interval секунд
+        """
+        if not 0 < failure_rate_threshold <= 1 or not 0 < slow_call_rate_threshold <= 1:
+            raise ValueError('rate thresholds must be in (0, 1]')
+        if minimum_calls <= 0 or window_size < minimum_calls:
+            raise ValueError('minimum_calls must be positive and not greater than window_size')
+        if half_open_probes <= 0:
+            raise ValueError('half_open_probes must be positive')
+
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_timeout = open_timeout
+        self.half_open_probes = half_open_probes
+        self.failure_exceptions = tuple(failure_exceptions)
+        self.excluded_exceptions = tuple(excluded_exceptions)
+        self.redis_connection = redis_connection
+        self.sync_interval = sync_interval
+        self.redis_key = f'{key_prefix}:{name}'
+
+        self.state = CIRCUIT_CLOSED
+        self.opened = 0
+        self.rejected = 0
+
+        self._outcomes: Deque[int] = deque(maxlen=window_size)
+        self._failures = 0
+        self._slow_calls = 0
+        self._open_until = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._synced_at = float('-inf')
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Вызовы сейчас отклоняются без обращения к интегратору
+        """
+        return self.state == CIRCUIT_OPEN and monotonic() < self._open_until
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        await self._sync()
+        probe = self._acquire()
+        started_at = monotonic()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            self._release(probe)
+            raise
+        except self.excluded_exceptions:
+            self._release(probe)
+            raise
+        except self.failure_exceptions:
+            await self._record(OUTCOME_FAILURE, probe)
+            raise
+
+        slow = self.slow_call_duration is not None and monotonic() - started_at > self.slow_call_duration
+        await self._record(OUTCOME_SLOW if slow else OUTCOME_SUCCESS, probe)
+        return result
+
+    def _acquire(self) -> bool:
+        """
+        Возвращает True, если вызов пробный
+        """
+        if self.state == CIRCUIT_OPEN:
+            if monotonic() < self._open_until:
+                self._reject()
+            self.state = CIRCUIT_HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+
+        if self.state == CIRCUIT_HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self._reject()
+            self._probes += 1
+            return True
+        return False
+
+    def _release(self, probe: bool) -> None:
+        if probe and self.state == CIRCUIT_HALF_OPEN:
+            self._probes -= 1
+
+    def _reject(self) -> NoReturn:
+        self.rejected += 1
+        request_metrics.get().circuit_rejections += 1
+        raise CircuitOpenError(f'Circuit breaker {self.name} is open')
+
+    async def _record(self, outcome: int, probe: bool) -> None:
+        if probe:
+            # вызов мог начаться до повторного открытия другим пробным вызовом
+            if self.state != CIRCUIT_HALF_OPEN:
+                return
+            if outcome != OUTCOME_SUCCESS:
+                await self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                await self._close()
+            return
+
+        if self.state != CIRCUIT_CLOSED:
+            return
+
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._count(self._outcomes[0], -1)
+        self._outcomes.append(outcome)
+        self._count(outcome, 1)
+
+        calls = len(self._outcomes)
+        if calls >= self.minimum_calls and (
+            self._failures / calls >= self.failure_rate_threshold
+            or self._slow_calls / calls >= self.slow_call_rate_threshold
+        ):
+            await self._open()
+
+    def _count(self, outcome: int, delta: int) -> None:
+        if outcome == OUTCOME_FAILURE:
+            self._failures += delta
+        elif outcome == OUTCOME_SLOW:
+            self._slow_calls += delta
+
+    def _reset_window(self) -> None:
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow_calls = 0
+
+    async def _open(self) -> None:
+        self.state = CIRCUIT_OPEN
+        self._open_until = monotonic() + self.open_timeout
+        self.opened += 1
+        self._reset_window()
+        if self.redis_connection is not None:
+            try:
+                await self.redis_connection.set(self.redis_key, 1, px=max(int(self.open_timeout * 1000), 1))
+            except (ConnectionError, TimeoutError, OSError):
+                pass
+
+    async def _close(self) -> None:
+        self.state = CIRCUIT_CLOSED
+        self._reset_window()
+        if self.redis_connection is not None:
+            try:
+                await self.redis_connection.delete(self.redis_key)
+            except (ConnectionError, TimeoutError, OSError):
+                pass
+
+    async def _sync(self) -> None:
+        """
+        Открывает выключатель, если его открыл другой процесс. Недоступность редиса не мешает вызовам
+        """
+        if self.redis_connection is None or self.state != CIRCUIT_CLOSED:
+            return
+        now = monotonic()
+        if now < self._synced_at + self.sync_interval:
+            return
+        self._synced_at = now
+
+        try:
+            remaining_ms = await self.redis_connection.pttl(self.redis_key)
+        except (ConnectionError, TimeoutError, OSError):
+            return
+        if remaining_ms > 0 and self.state == CIRCUIT_CLOSED:
+            self.state = CIRCUIT_OPEN
+            self._open_until = monotonic() + remaining_ms / 1000
+            self._reset_window()
@@ -3,3 +3,19 @@ from __future__ import annotations
 
 class InvalidCacheError(Exception):
     pass
+
+
+class LeaseWaitTimeoutError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+class BulkheadFullError(Exception):
+    pass
@@ -0,0 +1,124 @@
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.metrics.metrics import RequestMetrics, request_metrics
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 4) -> None:
+        """
+        Оценка частоты ключей в памяти фиксированного размера width * depth счетчиков.
+        Оценка не бывает меньше настоящей частоты, переоценка растет с числом ключей на width
+
+        Индексы строк получаются из одного hash() ключа двойным хэшированием,
+        hash() строк случаен для каждого процесса, поэтому оценки разных процессов не совпадают
+        """
+        if width <= 0 or depth <= 0:
+            raise ValueError('width and depth must be positive')
+
+        self.width = width
+        self.depth = depth
+        self._rows: List[List[int]] = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key: str) -> List[int]:
+        key_hash = hash(key) & 0xFFFFFFFFFFFFFFFF
+        first, second = key_hash & 0xFFFFFFFF, (key_hash >> 32) | 1
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, key: str) -> int:
+        """
+        Увеличивает счетчики ключа и возвращает новую оценку его частоты
+        """
+        estimate = None
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += 1
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate or 0
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def halve(self) -> None:
+        for row in self._rows:
+            for index, count in enumerate(row):
+                if count:
+                    row[index] = count >> 1
+
+
+class HotKeyTracker:
+    def __init__(self, top_k: int = 100, width: int = 2048, depth: int = 4, decay_interval: int = 100000) -> None:
+        """
+        Самые частые ключи кэша: частоты считаются CountMinSketch, top_k ключей с наибольшей оценкой
+        хранятся в куче вместе с последним вызовом, поэтому память не зависит от числа ключей
+
+        :param decay_interval: через каждые decay_interval обращений все частоты делятся пополам,
+            ключи, к которым перестали обращаться, вытесняются новыми
+        """
+        if top_k <= 0:
+            raise ValueError('top_k must be positive')
+
+        self.top_k = top_k
+        self.decay_interval = decay_interval
+        self.sketch = CountMinSketch(width, depth)
+
+        self._records = 0
+        self._counts: Dict[str, int] = {}
+        self._calls: Dict[str, Tuple[Callable, RequestMetrics]] = {}
+        # в куче остаются устаревшие оценки, актуальна только совпадающая с _counts
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def record(self, cache_key: str, call: Callable) -> None:
+        """
+        :param call: функция без аргументов, которая повторяет запрос к интегратору
+        """
+        self._records += 1
+        if self._records % self.decay_interval == 0:
+            self._decay()
+
+        count = self.sketch.add(cache_key)
+        if cache_key not in self._counts and len(self._counts) >= self.top_k:
+            min_count, min_key = self._peek_min()
+            if count <= min_count:
+                return
+            heapq.heappop(self._heap)
+            del self._counts[min_key]
+            del self._calls[min_key]
+
+        self._counts[cache_key] = count
+        self._calls[cache_key] = (call, request_metrics.get())
+        heapq.heappush(self._heap, (count, cache_key))
+        if len(self._heap) > 4 * self.top_k:
+            self._rebuild_heap()
+
+    def hot_keys(self, min_count: int = 1) -> List[Tuple[str, int]]:
+        """
+        Ключи и оценки их частоты по убыванию частоты
+        """
+        return sorted(
+            ((cache_key, count) for cache_key, count in self._counts.items() if count >= min_count),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def get_call(self, cache_key: str) -> Optional[Tuple[Callable, RequestMetrics]]:
+        return self._calls.get(cache_key)
+
+    def _peek_min(self) -> Tuple[int, str]:
+        while True:
+            count, cache_key = self._heap[0]
+            if self._counts.get(cache_key) == count:
+                return count, cache_key
+            heapq.heappop(self._heap)
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(count, cache_key) for cache_key, count in self._counts.items()]
+        heapq.heapify(self._heap)
+
+    def _decay(self) -> None:
+        self.sketch.halve()
+        self._counts = {cache_key: count >> 1 for cache_key, count in self._counts.items()}
+        self._rebuild_heap()
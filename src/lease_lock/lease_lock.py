@@ -0,0 +1,174 @@
+import asyncio
+from time import monotonic
+from typing import Any, Awaitable, Callable, List, Optional
+
+from src.backend.backend import Backend
+from src.exceptions.exceptions import LeaseWaitTimeoutError
+from src.lua_script.lua_script import LuaScript
+
+LEASE_FALLBACK_UPSTREAM = 'upstream'
+LEASE_FALLBACK_RAISE = 'raise'
+
+FENCING_TOKEN_MIN_TTL_MS = 60000
+
+ACQUIRE_SCRIPT = LuaScript(
+    """
+if redis.call('exists', KEYS[1]) == 1 then
+    return false
+end
+local token = redis.call('incr', KEYS[2])
+redis.call('pexpire', KEYS[2], ARGV[2])
+redis.call('set', KEYS[1], token, 'NX', 'PX', ARGV[1])
+return token
+"""
+)
+
+
+@ACQUIRE_SCRIPT.python_equivalent
+def _acquire_lease(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    if call('exists', keys[0]) == 1:
+        return None
+    token = call('incr', keys[1])
+    call('pexpire', keys[1], int(args[1]))
+    call('set', keys[0], token, nx=True, px=int(args[0]))
+    return token
+
+
+RELEASE_SCRIPT = LuaScript(
+    """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+)
+
+
+@RELEASE_SCRIPT.python_equivalent
+def _release_lease(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    if call('get', keys[0]) == args[0]:
+        return call('delete', keys[0])
+    return 0
+
+
+class CacheLease:
+    def __init__(
+        self,
+        redis_connection: Backend,
+        lease_ttl: float = 5.0,
+        wait_timeout: float = 1.0,
+        poll_interval: float = 0.05,
+        fallback: str = LEASE_FALLBACK_UPSTREAM,
+    ) -> None:
+        """
+        Распределенная блокировка заполнения кэша между процессами
+
+        Первый процесс, не нашедший кэш, берет аренду (SET NX PX) с монотонным fencing токеном
+        и заполняет кэш, остальные ограниченное время опрашивают кэш
+
+        :param lease_ttl: время жизни аренды в секундах
+        :param wait_timeout: сколько секунд ждать появления кэша, если аренда занята
+        :param poll_interval: интервал опроса кэша в секундах
+        :param fallback: поведение, если кэш так и не появился:
+            upstream - сходить в интегратор самостоятельно, raise - поднять LeaseWaitTimeoutError
+        """
+        if fallback not in (LEASE_FALLBACK_UPSTREAM, LEASE_FALLBACK_RAISE):
+            raise ValueError(f'Unknown lease fallback: {fallback}')
+
+        self.redis_connection = redis_connection
+        self.lease_ttl_ms = int(lease_ttl * 1000)
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.fallback = fallback
+
+    @staticmethod
+    def _lease_key(cache_key: str) -> str:
+        return cache_key + ':lease'
+
+    @staticmethod
+    def _fencing_key(cache_key: str) -> str:
+        return cache_key + ':lease:fencing'
+
+    async def acquire(self, cache_key: str) -> Optional[int]:
+        """
+        Возвращает fencing токен, если аренда получена, иначе None
+        """
+        token = await ACQUIRE_SCRIPT(
+            self.redis_connection,
+            keys=[self._lease_key(cache_key), self._fencing_key(cache_key)],
+            args=[self.lease_ttl_ms, max(self.lease_ttl_ms * 10, FENCING_TOKEN_MIN_TTL_MS)],
+        )
+        return int(token) if token is not None else None
+
+    async def is_owner(self, cache_key: str, token: int) -> bool:
+        current_token = await self.redis_connection.get(self._lease_key(cache_key))
+        return current_token is not None and int(current_token) == token
+
+    async def release(self, cache_key: str, token: int) -> None:
+        await RELEASE_SCRIPT(self.redis_connection, keys=[self._lease_key(cache_key)], args=[token])
+
+    async def wait_for_cache(self, read: Callable[[], Awaitable[Any]]) -> Any:
+        deadline = monotonic() + self.wait_timeout
+        while True:
+            cache = await read()
+            if cache:
+                return cache
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+    async def fill(
+        self,
+        cache_key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        store: Callable[..., Awaitable[Any]],
+        read: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        :param fetch: запрос к интегратору
+        :param store: запись результата в кэш, владелец аренды передает guard - ключ аренды и fencing токен,
+            с ним запись выполняется, только если аренда еще принадлежит процессу
+        :param read: чтение кэша, должно вернуть пустое значение, если кэша нет
+        """
+        token = await self.acquire(cache_key)
+        if token is None:
+            cache = await self.wait_for_cache(read)
+            if cache:
+                return cache
+            if self.fallback == LEASE_FALLBACK_RAISE:
+                raise LeaseWaitTimeoutError(cache_key)
+            result = await fetch()
+            await store(result)
+            return result
+
+        return await self._fill_under_lease(cache_key, token, fetch, store)
+
+    async def refresh(
+        self,
+        cache_key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        store: Callable[..., Awaitable[Any]],
+    ) -> None:
+        """
+        Обновляет кэш, только если удалось получить аренду
+        """
+        token = await self.acquire(cache_key)
+        if token is not None:
+            await self._fill_under_lease(cache_key, token, fetch, store)
+
+    async def _fill_under_lease(
+        self,
+        cache_key: str,
+        token: int,
+        fetch: Callable[[], Awaitable[Any]],
+        store: Callable[..., Awaitable[Any]],
+    ) -> Any:
+        try:
+            result = await fetch()
+            # процесс, потерявший аренду за время запроса, не должен перезаписать более свежий кэш,
+            # поэтому владение арендой проверяется в том же скрипте, что и запись
+            await store(result, guard=(self._lease_key(cache_key), token))
+            return result
+        finally:
+            await self.release(cache_key, token)
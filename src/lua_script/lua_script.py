@@ -0,0 +1,43 @@
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from aioredis.exceptions import NoScriptError
+
+from src.backend.backend import Backend
+
+# Python аналог скрипта: call(command, *args) - аналог redis.call, ключи и аргументы скрипта в виде bytes
+PythonEquivalent = Callable[[Callable[..., Any], List[str], List[bytes]], Any]
+
+# скрипты по sha1, бэкенды без Lua находят по нему Python аналог скрипта
+SCRIPTS: Dict[str, 'LuaScript'] = {}
+
+
+class LuaScript:
+    """
+    Lua скрипт, выполняемый через EVALSHA
+
+    Если скрипта еще нет в кэше скриптов редиса, выполняется EVAL,
+    который сохраняет скрипт, и следующие вызовы снова идут через EVALSHA.
+    Бэкенды без Lua, например InMemoryBackend, выполняют Python аналог, зарегистрированный python_equivalent
+    """
+
+    def __init__(self, script: str) -> None:
+        self.script = script
+        self.sha = hashlib.sha1(script.encode()).hexdigest()  # nosec B324
+        self.python: Optional[PythonEquivalent] = None
+        SCRIPTS[self.sha] = self
+
+    def python_equivalent(self, func: PythonEquivalent) -> PythonEquivalent:
+        """
+        Регистрирует функцию, повторяющую скрипт. Функция выполняется без переключения event loop,
+        поэтому атомарна, как и скрипт. Ответ преобразуется по правилам ответов Lua:
+        дробные числа отбрасывают дробную часть, None и False - nil
+        """
+        self.python = func
+        return func
+
+    async def __call__(self, redis_connection: Backend, keys: Sequence[str], args: Sequence[Any]) -> Any:
+        try:
+            return await redis_connection.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return await redis_connection.eval(self.script, len(keys), *keys, *args)
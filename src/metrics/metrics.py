@@ -0,0 +1,184 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LABEL_NAMES = ('service_name', 'integration', 'integration_method')
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'request_manager'
+
+COUNTERS = (
+    ('hits', 'Ответы из кэша'),
+    ('misses', 'Запросы к интегратору при отсутствии кэша'),
+    ('stale', 'Ответы устаревшим кэшем с обновлением в фоне'),
+    ('validator_rejections', 'Кэш, отклоненный валидаторами'),
+    ('filter_rejections', 'Данные, не записанные в кэш из-за фильтров'),
+    ('rate_limited', 'Запросы, отклоненные ограничителем'),
+    ('retries', 'Повторные запросы к интегратору'),
+    ('circuit_rejections', 'Запросы, отклоненные открытым выключателем'),
+    ('stale_fallbacks', 'Ответы устаревшим кэшем при ошибке интегратора'),
+    ('pool_rejections', 'Вызовы синхронных функций, отклоненные переполненным пулом'),
+    ('hedges', 'Дублирующие запросы к интегратору'),
+    ('hedge_wins', 'Ответы, полученные от дублирующего запроса'),
+    ('bulkhead_rejections', 'Запросы, не дождавшиеся места в ограничителе одновременных запросов'),
+    ('limit_decreases', 'Снижения адаптивного лимита запросов'),
+    ('warmups', 'Ключи кэша, обновленные прогревом до истечения срока жизни'),
+)
+HISTOGRAMS = (
+    ('redis_latency', 'Время запросов к редису в секундах'),
+    ('upstream_latency', 'Время запросов к интегратору в секундах'),
+    ('pool_wait', 'Время ожидания свободного исполнителя пула синхронных функций в секундах'),
+    ('bulkhead_wait', 'Время ожидания места в ограничителе одновременных запросов в секундах'),
+)
+
+
+class Histogram:
+    """
+    Гистограмма с заранее выделенными корзинами, запись - поиск корзины и два сложения
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        result = []
+        total = 0
+        for upper_bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((upper_bound, total))
+        return result
+
+
+class RequestMetrics:
+    """
+    Метрики одного набора меток. Счетчики - обычные атрибуты, в asyncio блокировки не нужны
+    """
+
+    __slots__ = (
+        'labels',
+        'hits',
+        'misses',
+        'stale',
+        'validator_rejections',
+        'filter_rejections',
+        'rate_limited',
+        'retries',
+        'circuit_rejections',
+        'stale_fallbacks',
+        'pool_rejections',
+        'hedges',
+        'hedge_wins',
+        'bulkhead_rejections',
+        'limit_decreases',
+        'warmups',
+        'redis_latency',
+        'upstream_latency',
+        'pool_wait',
+        'bulkhead_wait',
+    )
+
+    def __init__(self, labels: Tuple[str, str, str], buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.labels = labels
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.validator_rejections = 0
+        self.filter_rejections = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.circuit_rejections = 0
+        self.stale_fallbacks = 0
+        self.pool_rejections = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.bulkhead_rejections = 0
+        self.limit_decreases = 0
+        self.warmups = 0
+        self.redis_latency = Histogram(buckets)
+        self.upstream_latency = Histogram(buckets)
+        self.pool_wait = Histogram(buckets)
+        self.bulkhead_wait = Histogram(buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = dict(zip(LABEL_NAMES, self.labels))
+        for name, _ in COUNTERS:
+            result[name] = getattr(self, name)
+        for name, _ in HISTOGRAMS:
+            histogram = getattr(self, name)
+            result[name] = {'buckets': histogram.cumulative(), 'sum': histogram.sum, 'count': histogram.count}
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        :param buckets: верхние границы корзин гистограмм задержек в секундах
+        """
+        self.buckets = tuple(buckets)
+        self._metrics: Dict[Tuple[str, str, str], RequestMetrics] = {}
+
+    def get(
+        self,
+        service_name: str,
+        integration: Optional[str] = None,
+        integration_method: Optional[str] = None,
+    ) -> RequestMetrics:
+        labels = (service_name, integration or '', integration_method or '')
+        metrics = self._metrics.get(labels)
+        if metrics is None:
+            metrics = self._metrics[labels] = RequestMetrics(labels, self.buckets)
+        return metrics
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [metrics.snapshot() for metrics in self._metrics.values()]
+
+    def to_prometheus(self) -> str:
+        """
+        Метрики в текстовом формате Prometheus
+        """
+        lines = []
+        for name, description in COUNTERS:
+            metric_name = f'{METRIC_PREFIX}_{name}_total'
+            lines += [f'# HELP {metric_name} {description}', f'# TYPE {metric_name} counter']
+            for metrics in self._metrics.values():
+                lines.append(f'{metric_name}{{{_format_labels(metrics.labels)}}} {getattr(metrics, name)}')
+
+        for name, description in HISTOGRAMS:
+            metric_name = f'{METRIC_PREFIX}_{name}_seconds'
+            lines += [f'# HELP {metric_name} {description}', f'# TYPE {metric_name} histogram']
+            for metrics in self._metrics.values():
+                histogram = getattr(metrics, name)
+                labels = _format_labels(metrics.labels)
+                for upper_bound, count in histogram.cumulative():
+                    le = '+Inf' if upper_bound == float('inf') else repr(upper_bound)
+                    lines.append(f'{metric_name}_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f'{metric_name}_sum{{{labels}}} {histogram.sum!r}')
+                lines.append(f'{metric_name}_count{{{labels}}} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Tuple[str, str, str]) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(LABEL_NAMES, labels))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+DEFAULT_REGISTRY = MetricsRegistry()
+
+# метрики вызовов вне RequestManager никуда не выгружаются
+UNBOUND_METRICS = RequestMetrics(('', '', ''))
+
+# метрики вызова, устанавливаются RequestManager и наследуются фоновыми задачами
+request_metrics: ContextVar[RequestMetrics] = ContextVar('request_metrics', default=UNBOUND_METRICS)
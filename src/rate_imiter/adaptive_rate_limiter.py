@@ -0,0 +1,260 @@
+from time import monotonic, time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, Type
+
+from aioredis.exceptions import ConnectionError, TimeoutError
+
+from src.backend.backend import Backend
+from src.lua_script.lua_script import LuaScript
+from src.metrics.metrics import request_metrics
+from src.rate_imiter.lua_rate_limiter import LuaSlidingWindowRateLimiter
+from src.rate_imiter.rate_limiter import DAY
+
+ACTION_READ = 0
+ACTION_DECREASE = -1
+ACTION_INCREASE = 1
+
+ADJUST_SCRIPT = LuaScript(
+    """
+local now = tonumber(ARGV[1])
+local action = tonumber(ARGV[2])
+local interval = tonumber(ARGV[6])
+local factor = tonumber(redis.call('hget', KEYS[1], 'factor') or 1)
+local decreased_at = tonumber(redis.call('hget', KEYS[1], 'decreased_at') or 0)
+local increased_at = tonumber(redis.call('hget', KEYS[1], 'increased_at') or 0)
+if action < 0 and now - decreased_at >= interval then
+    factor = math.max(factor * tonumber(ARGV[3]), tonumber(ARGV[5]))
+    redis.call('hset', KEYS[1], 'factor', factor, 'decreased_at', now)
+elseif action > 0 and factor < 1 and now - math.max(decreased_at, increased_at) >= interval then
+    factor = math.min(factor + tonumber(ARGV[4]), 1)
+    redis.call('hset', KEYS[1], 'factor', factor, 'increased_at', now)
+end
+redis.call('expire', KEYS[1], ARGV[7])
+return tostring(factor)
+"""
+)
+
+
+@ADJUST_SCRIPT.python_equivalent
+def _adjust_factor(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    now, action, interval = float(args[0]), int(args[1]), float(args[5])
+    factor = float(call('hget', keys[0], 'factor') or 1)
+    decreased_at = float(call('hget', keys[0], 'decreased_at') or 0)
+    increased_at = float(call('hget', keys[0], 'increased_at') or 0)
+    if action < 0 and now - decreased_at >= interval:
+        factor = max(factor * float(args[2]), float(args[4]))
+        call('hset', keys[0], mapping={'factor': repr(factor), 'decreased_at': repr(now)})
+    elif action > 0 and factor < 1 and now - max(decreased_at, increased_at) >= interval:
+        factor = min(factor + float(args[3]), 1)
+        call('hset', keys[0], mapping={'factor': repr(factor), 'increased_at': repr(now)})
+    call('expire', keys[0], int(args[6]))
+    return repr(float(factor))
+
+
+class AdaptiveLimit:
+    def __init__(
+        self,
+        name: str = 'default',
+        target_latency: Optional[float] = None,
+        throttling_exceptions: Tuple[Type[BaseException], ...] = (),
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.05,
+        min_factor: float = 0.05,
+        min_calls: int = 10,
+        adjust_interval: float = 1.0,
+        background_share: float = 0.5,
+        redis_connection: Optional[Backend] = None,
+        key_prefix: str = 'adaptive_limit',
+    ) -> None:
+        """
+        Доля от настроенных лимитов, которую сейчас выдерживает интегратор (AIMD)
+
+        Доля начинается с 1. Если интегратор ответил ошибкой из throttling_exceptions или среднее время
+        ответов за adjust_interval секунд больше target_latency, доля умножается на decrease_factor,
+        но не чаще раза в adjust_interval. Если за интервал было не меньше min_calls успешных запросов
+        и задержка в норме, доля увеличивается на increase_step, но не выше 1.
+        Один экземпляр используется всеми стратегиями интеграции
+
+        :param name: название интеграции, часть ключа в редисе
+        :param background_share: доля текущего лимита, доступная фоновым обновлениям,
+            поэтому при снижении лимита фоновые обновления отклоняются раньше запросов пользователей
+        :param redis_connection: если задан, доля общая для всех процессов и хранится в редисе,
+            процесс обращается к редису не чаще раза в adjust_interval секунд и при ошибках троттлинга
+        """
+        if not 0 < decrease_factor < 1:
+            raise ValueError('decrease_factor must be in (0, 1)')
+        if not 0 < min_factor <= 1 or not 0 < background_share <= 1:
+            raise ValueError('min_factor and background_share must be in (0, 1]')
+        if increase_step <= 0:
+            raise ValueError('increase_step must be positive')
+
+        self.name = name
+        self.target_latency = target_latency
+        self.throttling_exceptions = tuple(throttling_exceptions)
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_factor = min_factor
+        self.min_calls = min_calls
+        self.adjust_interval = adjust_interval
+        self.background_share = background_share
+        self.redis_connection = redis_connection
+        self.redis_key = f'{key_prefix}:{name}'
+
+        self.factor = 1.0
+
+        self._calls = 0
+        self._latency_sum = 0.0
+        self._throttled = 0
+        self._adjusted_at = monotonic()
+        self._decreased_at = float('-inf')
+        self._increased_at = float('-inf')
+
+    def scale(self, background: bool = False) -> float:
+        return self.factor * self.background_share if background else self.factor
+
+    def is_throttling(self, exc: Optional[BaseException]) -> bool:
+        return exc is not None and isinstance(exc, self.throttling_exceptions)
+
+    async def observe(self, latency: float, throttled: bool) -> None:
+        if throttled:
+            self._throttled += 1
+        else:
+            self._calls += 1
+            self._latency_sum += latency
+
+        # о троттлинге доля снижается сразу, частоту снижений ограничивает adjust_interval
+        now = monotonic()
+        if not throttled and now < self._adjusted_at + self.adjust_interval:
+            return
+        self._adjusted_at = now
+
+        action = self._action()
+        self._calls = 0
+        self._latency_sum = 0.0
+        self._throttled = 0
+        await self._adjust(action)
+
+    def _action(self) -> int:
+        if self._throttled or (
+            self.target_latency is not None and self._calls and self._latency_sum / self._calls > self.target_latency
+        ):
+            return ACTION_DECREASE
+        if self._calls >= self.min_calls:
+            return ACTION_INCREASE
+        return ACTION_READ
+
+    async def _adjust(self, action: int) -> None:
+        previous = self.factor
+        if self.redis_connection is None:
+            self._adjust_locally(action)
+        else:
+            args = [
+                time(),
+                action,
+                self.decrease_factor,
+                self.increase_step,
+                self.min_factor,
+                self.adjust_interval,
+                DAY,
+            ]
+            try:
+                self.factor = float(await ADJUST_SCRIPT(self.redis_connection, keys=[self.redis_key], args=args))
+            except (ConnectionError, TimeoutError, OSError):
+                # без редиса доля подстраивается по запросам процесса
+                self._adjust_locally(action)
+
+        if self.factor < previous:
+            request_metrics.get().limit_decreases += 1
+
+    def _adjust_locally(self, action: int) -> None:
+        now = monotonic()
+        if action == ACTION_DECREASE and now - self._decreased_at >= self.adjust_interval:
+            self.factor = max(self.factor * self.decrease_factor, self.min_factor)
+            self._decreased_at = now
+        elif (
+            action == ACTION_INCREASE
+            and self.factor < 1
+            and now - max(self._decreased_at, self._increased_at) >= self.adjust_interval
+        ):
+            self.factor = min(self.factor + self.increase_step, 1.0)
+            self._increased_at = now
+
+
+class AdaptiveRateLimiter(LuaSlidingWindowRateLimiter):
+    """
+    Скользящее окно с лимитами, умноженными на долю AdaptiveLimit
+
+    Настроенные rate_for_* - верхняя граница, действующий лимит не меньше 1 запроса в окне.
+    Ограничитель сам измеряет время ответов интегратора и ошибки троттлинга
+    """
+
+    key_suffix = ':adaptive'
+
+    def __init__(
+        self,
+        redis_connection: Backend,
+        adaptive_limit: AdaptiveLimit,
+        cache_key: Optional[str] = None,
+        rate_for_second: Optional[int] = None,
+        rate_for_minute: Optional[int] = None,
+        rate_for_hour: Optional[int] = None,
+        rate_for_day: Optional[int] = None,
+        background: bool = False,
+    ) -> None:
+        """
+        :param adaptive_limit: общая доля лимитов интеграции
+        :param background: запросы фоновых обновлений, им доступна только background_share текущего лимита
+        """
+        self.adaptive_limit = adaptive_limit
+        self.background = background
+        self._scale = 1.0
+        super().__init__(
+            redis_connection=redis_connection,
+            cache_key=cache_key,
+            rate_for_second=rate_for_second,
+            rate_for_minute=rate_for_minute,
+            rate_for_hour=rate_for_hour,
+            rate_for_day=rate_for_day,
+        )
+
+    def _windows(self) -> List[Tuple[int, int]]:
+        return [(window_size, max(1, int(sited_rate * self._scale))) for window_size, sited_rate in super()._windows()]
+
+    def _script_args(self, request_time: float) -> List[Any]:
+        scale = self.adaptive_limit.scale(self.background)
+        if scale != self._scale:
+            self._scale = scale
+            self._windows_args = self._build_windows_args()
+        return super()._script_args(request_time)
+
+    def _raise_limit_exceeded(self, window: int, count: int) -> None:
+        limit = dict(self._windows())[window]
+        self._reject(f'Adaptive limit exceeded, window: {window} limit: {limit} counted calls: {count}')
+
+    async def _observe(self, func: Callable[[], Awaitable]) -> Any:
+        started_at = monotonic()
+        try:
+            result = await func()
+        except self.adaptive_limit.throttling_exceptions:
+            await self.adaptive_limit.observe(monotonic() - started_at, throttled=True)
+            raise
+        await self.adaptive_limit.observe(monotonic() - started_at, throttled=False)
+        return result
+
+    async def run(self, func: Callable[[], Awaitable], cache_key: Optional[str] = None) -> Any:
+        await self._acquire(self._limiter_key(cache_key) if cache_key is not None else self._bound_key(), time())
+        return await self._observe(func)
+
+    def __call__(self, func: Callable) -> Callable:
+        async def wrapped(*args: Any, **kwargs: Any) -> Any:
+            self.request_time = time()
+            await self._acquire(self._bound_key(), self.request_time)
+            return await self._observe(lambda: func(*args, **kwargs))
+
+        return wrapped
+
+    async def __aexit__(self, *exc: Any) -> None:
+        """
+        Запрос уже записан при входе в контекст, время ответа считается от входа
+        """
+        throttled = self.adaptive_limit.is_throttling(exc[1])
+        await self.adaptive_limit.observe(time() - self.request_time, throttled=throttled)
@@ -0,0 +1,258 @@
+import math
+from time import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from src.backend.backend import Backend
+from src.lua_script.lua_script import LuaScript
+from src.rate_imiter.rate_limiter import DAY, HOUR, MINUTE, SECOND, SlidingWindowRateLimiter
+
+SLIDING_WINDOW_SCRIPT = LuaScript(
+    """
+local now = tonumber(ARGV[1])
+local max_window = tonumber(ARGV[2])
+redis.call('zremrangebyscore', KEYS[1], '-inf', now - max_window)
+for i = 4, #ARGV, 2 do
+    local window = tonumber(ARGV[i])
+    local count = redis.call('zcount', KEYS[1], now - window, '+inf')
+    if count >= tonumber(ARGV[i + 1]) then
+        return {window, count}
+    end
+end
+redis.call('zadd', KEYS[1], now, ARGV[3])
+redis.call('expire', KEYS[1], max_window)
+return {0, 0}
+"""
+)
+
+
+@SLIDING_WINDOW_SCRIPT.python_equivalent
+def _sliding_window(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    now, max_window = float(args[0]), float(args[1])
+    call('zremrangebyscore', keys[0], '-inf', now - max_window)
+    for i in range(3, len(args), 2):
+        window = int(args[i])
+        count = call('zcount', keys[0], now - window, '+inf')
+        if count >= float(args[i + 1]):
+            return [window, count]
+    call('zadd', keys[0], {args[2]: now})
+    call('expire', keys[0], int(max_window))
+    return [0, 0]
+
+
+SLIDING_WINDOW_COUNTER_SCRIPT = LuaScript(
+    """
+local now = tonumber(ARGV[1])
+local max_window = tonumber(ARGV[2])
+local buckets = {}
+for i = 3, #ARGV, 2 do
+    local window = tonumber(ARGV[i])
+    local bucket = math.floor(now / window)
+    local current = tonumber(redis.call('hget', KEYS[1], window .. ':' .. bucket) or 0)
+    local previous = tonumber(redis.call('hget', KEYS[1], window .. ':' .. (bucket - 1)) or 0)
+    local count = previous * (1 - (now - bucket * window) / window) + current
+    if count >= tonumber(ARGV[i + 1]) then
+        return {window, math.floor(count)}
+    end
+    buckets[#buckets + 1] = {window, bucket}
+end
+for _, item in ipairs(buckets) do
+    redis.call('hincrby', KEYS[1], item[1] .. ':' .. item[2], 1)
+    redis.call('hdel', KEYS[1], item[1] .. ':' .. (item[2] - 2))
+end
+redis.call('expire', KEYS[1], max_window * 2)
+return {0, 0}
+"""
+)
+
+
+@SLIDING_WINDOW_COUNTER_SCRIPT.python_equivalent
+def _sliding_window_counter(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    now, max_window = float(args[0]), int(args[1])
+    buckets = []
+    for i in range(2, len(args), 2):
+        window = int(args[i])
+        bucket = int(now // window)
+        count = window_count(call, keys[0], now, window, bucket)
+        if count >= float(args[i + 1]):
+            return [window, math.floor(count)]
+        buckets.append((window, bucket))
+    for window, bucket in buckets:
+        call('hincrby', keys[0], f'{window}:{bucket}', 1)
+        call('hdel', keys[0], f'{window}:{bucket - 2}')
+    call('expire', keys[0], max_window * 2)
+    return [0, 0]
+
+
+def window_count(call: Callable[..., Any], key: str, now: float, window: int, bucket: int) -> float:
+    """
+    Оценка числа запросов в скользящем окне по счетчикам текущего и предыдущего интервала
+    """
+    current = float(call('hget', key, f'{window}:{bucket}') or 0)
+    previous = float(call('hget', key, f'{window}:{bucket - 1}') or 0)
+    return previous * (1 - (now - bucket * window) / window) + current
+
+
+GCRA_SCRIPT = LuaScript(
+    """
+local now = tonumber(ARGV[1])
+local max_window = tonumber(ARGV[2])
+local tats = {}
+for i = 3, #ARGV, 2 do
+    local window = tonumber(ARGV[i])
+    local emission_interval = window / tonumber(ARGV[i + 1])
+    local tat = math.max(tonumber(redis.call('hget', KEYS[1], window) or now), now)
+    if tat + emission_interval - window > now then
+        return {window, math.ceil((tat - now) / emission_interval)}
+    end
+    tats[#tats + 1] = {window, tat + emission_interval}
+end
+for _, item in ipairs(tats) do
+    redis.call('hset', KEYS[1], item[1], item[2])
+end
+redis.call('expire', KEYS[1], max_window)
+return {0, 0}
+"""
+)
+
+
+@GCRA_SCRIPT.python_equivalent
+def _gcra(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    now, max_window = float(args[0]), int(args[1])
+    tats = []
+    for i in range(2, len(args), 2):
+        window = int(args[i])
+        emission_interval = window / float(args[i + 1])
+        tat = max(float(call('hget', keys[0], window) or now), now)
+        if tat + emission_interval - window > now:
+            return [window, math.ceil((tat - now) / emission_interval)]
+        tats.append((window, tat + emission_interval))
+    for window, tat in tats:
+        call('hset', keys[0], window, repr(tat))
+    call('expire', keys[0], max_window)
+    return [0, 0]
+
+
+class BaseLuaRateLimiter(SlidingWindowRateLimiter):
+    """
+    Ограничитель, в котором проверка всех лимитов и запись запроса выполняются
+    атомарно одним Lua скриптом за один запрос к редису
+    """
+
+    script: LuaScript
+    key_suffix: str
+
+    def __init__(
+        self,
+        redis_connection: Backend,
+        cache_key: Optional[str] = None,
+        rate_for_second: Optional[int] = None,
+        rate_for_minute: Optional[int] = None,
+        rate_for_hour: Optional[int] = None,
+        rate_for_day: Optional[int] = None,
+    ) -> None:
+        super().__init__(
+            redis_connection=redis_connection,
+            cache_key=cache_key,
+            rate_for_second=rate_for_second,
+            rate_for_minute=rate_for_minute,
+            rate_for_hour=rate_for_hour,
+            rate_for_day=rate_for_day,
+        )
+        self._windows_args = self._build_windows_args()
+
+    def _limiter_key(self, cache_key: str) -> str:
+        return super()._limiter_key(cache_key) + self.key_suffix
+
+    def _windows(self) -> List[Tuple[int, int]]:
+        return [
+            (window_size, sited_rate)
+            for window_size, sited_rate in zip(
+                [SECOND, MINUTE, HOUR, DAY],
+                [self.rate_for_second, self.rate_for_minute, self.rate_for_hour, self.rate_for_day],
+            )
+            if sited_rate
+        ]
+
+    def _build_windows_args(self) -> List[Any]:
+        windows = self._windows()
+        args: List[Any] = [windows[-1][0] if windows else SECOND]
+        for window_size, sited_rate in windows:
+            args += [window_size, sited_rate]
+        return args
+
+    def _script_args(self, request_time: float) -> List[Any]:
+        return [request_time, *self._windows_args]
+
+    async def _acquire(self, cache_key: str, request_time: float) -> None:
+        window, count = await self.script(self.redis_connection, keys=[cache_key], args=self._script_args(request_time))
+        if window:
+            self._raise_limit_exceeded(window, count)
+
+    def _raise_limit_exceeded(self, window: int, count: int) -> None:
+        counts: Dict[int, int] = {SECOND: 0, MINUTE: 0, HOUR: 0, DAY: 0}
+        counts[window] = count
+        self._check_limit(counts[SECOND], counts[MINUTE], counts[HOUR], counts[DAY])
+
+    async def __aenter__(self) -> None:
+        self.request_time = time()
+        await self._acquire(self._bound_key(), self.request_time)
+
+    async def run(self, func: Callable[[], Awaitable], cache_key: Optional[str] = None) -> Any:
+        await self._acquire(self._limiter_key(cache_key) if cache_key is not None else self._bound_key(), time())
+        return await func()
+
+    def __call__(self, func: Callable) -> Callable:
+        async def wrapped(*args: Any, **kwargs: Any) -> Any:
+            self.request_time = time()
+            await self._acquire(self._bound_key(), self.request_time)
+            return await func(*args, **kwargs)
+
+        return wrapped
+
+    async def __aexit__(self, *exc: Any) -> None:
+        """
+        Запрос уже записан при входе в контекст
+        """
+
+
+class LuaSlidingWindowRateLimiter(BaseLuaRateLimiter):
+    """
+    Скользящее окно по журналу запросов
+
+    Запросы хранятся в упорядоченном множестве с оценкой по времени запроса,
+    поэтому ключ отличается от ключа SlidingWindowRateLimiter
+    """
+
+    script = SLIDING_WINDOW_SCRIPT
+    key_suffix = ':lua'
+
+    def _script_args(self, request_time: float) -> List[Any]:
+        args = super()._script_args(request_time)
+        args.insert(2, f'{request_time}:{uuid4().hex}')
+        return args
+
+
+class SlidingWindowCounterRateLimiter(BaseLuaRateLimiter):
+    """
+    Скользящее окно по счетчикам
+
+    Для каждого лимита хранятся только счетчики текущего и предыдущего окна,
+    число запросов оценивается как счетчик текущего окна плюс доля счетчика предыдущего,
+    пропорциональная еще не прошедшей части скользящего окна
+    """
+
+    script = SLIDING_WINDOW_COUNTER_SCRIPT
+    key_suffix = ':counter'
+
+
+class GCRARateLimiter(BaseLuaRateLimiter):
+    """
+    Generic cell rate algorithm
+
+    Для каждого лимита хранится одна метка времени - теоретическое время прибытия следующего запроса.
+    Запросы равномерно распределяются по окну, но допускается всплеск до размера лимита
+    """
+
+    script = GCRA_SCRIPT
+    key_suffix = ':gcra'
@@ -0,0 +1,236 @@
+import asyncio
+import functools
+import math
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.backend.backend import Backend
+from src.lua_script.lua_script import LuaScript
+from src.rate_imiter.lua_rate_limiter import BaseLuaRateLimiter, window_count
+
+RESERVE_SCRIPT = LuaScript(
+    """
+local now = tonumber(ARGV[1])
+local max_window = tonumber(ARGV[2])
+local grant = tonumber(ARGV[3])
+local fields = {}
+for i = 4, #ARGV, 2 do
+    local window = tonumber(ARGV[i])
+    local bucket = math.floor(now / window)
+    local field = window .. ':' .. bucket
+    local current = tonumber(redis.call('hget', KEYS[1], field) or 0)
+    local previous = tonumber(redis.call('hget', KEYS[1], window .. ':' .. (bucket - 1)) or 0)
+    local count = previous * (1 - (now - bucket * window) / window) + current
+    local available = math.floor(tonumber(ARGV[i + 1]) - count)
+    if available <= 0 then
+        return {window, math.floor(count)}
+    end
+    grant = math.min(grant, available)
+    fields[#fields + 1] = {field, window .. ':' .. (bucket - 2)}
+end
+local result = {0, grant}
+for _, item in ipairs(fields) do
+    redis.call('hincrby', KEYS[1], item[1], grant)
+    redis.call('hdel', KEYS[1], item[2])
+    result[#result + 1] = item[1]
+end
+redis.call('expire', KEYS[1], max_window * 2)
+return result
+"""
+)
+
+
+@RESERVE_SCRIPT.python_equivalent
+def _reserve_permits(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    now, max_window, grant = float(args[0]), int(args[1]), int(args[2])
+    fields = []
+    for i in range(3, len(args), 2):
+        window = int(args[i])
+        bucket = int(now // window)
+        count = window_count(call, keys[0], now, window, bucket)
+        available = math.floor(float(args[i + 1]) - count)
+        if available <= 0:
+            return [window, math.floor(count)]
+        grant = min(grant, available)
+        fields.append((f'{window}:{bucket}', f'{window}:{bucket - 2}'))
+    result: List[Any] = [0, grant]
+    for field, expired_field in fields:
+        call('hincrby', keys[0], field, grant)
+        call('hdel', keys[0], expired_field)
+        result.append(field)
+    call('expire', keys[0], max_window * 2)
+    return result
+
+
+RETURN_SCRIPT = LuaScript(
+    """
+for i = 2, #ARGV do
+    local current = tonumber(redis.call('hget', KEYS[1], ARGV[i]) or 0)
+    if current > 0 then
+        redis.call('hincrby', KEYS[1], ARGV[i], -math.min(current, tonumber(ARGV[1])))
+    end
+end
+return 0
+"""
+)
+
+
+@RETURN_SCRIPT.python_equivalent
+def _return_permits(call: Callable[..., Any], keys: List[str], args: List[bytes]) -> Any:
+    for field in args[1:]:
+        current = int(call('hget', keys[0], field) or 0)
+        if current > 0:
+            call('hincrby', keys[0], field, -min(current, int(args[0])))
+    return 0
+
+
+RATE_SMOOTHING = 0.5
+
+
+class QuotaLease:
+    """
+    Блок разрешений, зарезервированный процессом в общем бюджете редиса
+    """
+
+    def __init__(self, redis_connection: Backend, cache_key: str) -> None:
+        self.redis_connection = redis_connection
+        self.cache_key = cache_key
+        self.remaining = 0
+        self.consumed = 0
+        self.expires_at = 0.0
+        self.refilled_at = monotonic()
+        self.rate = 0.0
+        self.fields: List[Any] = []
+        self.refill: Optional[asyncio.Future] = None
+
+    def take(self) -> bool:
+        if self.remaining > 0 and self.expires_at > monotonic():
+            self.remaining -= 1
+            self.consumed += 1
+            return True
+        return False
+
+    def update_rate(self) -> None:
+        now = monotonic()
+        elapsed = now - self.refilled_at
+        if elapsed > 0:
+            self.rate = RATE_SMOOTHING * self.consumed / elapsed + (1 - RATE_SMOOTHING) * self.rate
+        self.consumed = 0
+        self.refilled_at = now
+
+    async def give_back(self) -> None:
+        """
+        Возвращает неиспользованные разрешения в общий бюджет
+        """
+        if self.remaining > 0 and self.fields:
+            await RETURN_SCRIPT(self.redis_connection, keys=[self.cache_key], args=[self.remaining, *self.fields])
+        self.remaining = 0
+        self.fields = []
+
+
+class QuotaLeasePool:
+    """
+    Аренды разрешений процесса, по одной на соединение, ключ ограничителя и набор лимитов.
+    Ограничители с одним ключом, но разными редисами или лимитами не делят разрешения
+    """
+
+    def __init__(self) -> None:
+        self._leases: Dict[Tuple[int, str, Tuple[Tuple[int, int], ...]], QuotaLease] = {}
+
+    def get(self, redis_connection: Backend, cache_key: str, windows: Sequence[Tuple[int, int]]) -> QuotaLease:
+        """
+        :param windows: размеры окон и лимиты ограничителя
+        """
+        lease_key = (id(redis_connection), cache_key, tuple(windows))
+        lease = self._leases.get(lease_key)
+        if lease is None:
+            lease = self._leases[lease_key] = QuotaLease(redis_connection, cache_key)
+        return lease
+
+    async def release_all(self) -> None:
+        """
+        Возвращает все неиспользованные разрешения, вызывается при остановке приложения
+        """
+        for lease in self._leases.values():
+            await lease.give_back()
+        self._leases.clear()
+
+
+DEFAULT_QUOTA_POOL = QuotaLeasePool()
+
+
+class QuotaLeasingRateLimiter(BaseLuaRateLimiter):
+    key_suffix = ':quota'
+
+    def __init__(
+        self,
+        redis_connection: Backend,
+        cache_key: Optional[str] = None,
+        rate_for_second: Optional[int] = None,
+        rate_for_minute: Optional[int] = None,
+        rate_for_hour: Optional[int] = None,
+        rate_for_day: Optional[int] = None,
+        quota_lease_ttl: float = 1.0,
+        quota_error_bound: float = 0.05,
+        quota_pool: Optional[QuotaLeasePool] = None,
+    ) -> None:
+        """
+        Процесс атомарно резервирует в редисе блок разрешений и пропускает запросы по локальному счетчику,
+        пока блок не закончится или не истечет. Неиспользованные разрешения возвращаются в общий бюджет
+        при истечении аренды и при вызове QuotaLeasePool.release_all
+
+        Размер блока подстраивается под частоту запросов процесса, но не превышает
+        quota_error_bound от наименьшего лимита, поэтому каждый процесс может недобрать не больше этой доли
+
+        :param quota_lease_ttl: время жизни аренды в секундах, не больше наименьшего окна
+        :param quota_error_bound: доля наименьшего лимита, которую процесс может зарезервировать за раз
+        :param quota_pool: хранилище аренд процесса
+        """
+        super().__init__(
+            redis_connection=redis_connection,
+            cache_key=cache_key,
+            rate_for_second=rate_for_second,
+            rate_for_minute=rate_for_minute,
+            rate_for_hour=rate_for_hour,
+            rate_for_day=rate_for_day,
+        )
+        if not 0 < quota_error_bound <= 1:
+            raise ValueError('quota_error_bound must be in (0, 1]')
+
+        windows = self._windows()
+        self.windows = tuple(windows)
+        self.quota_lease_ttl = min([quota_lease_ttl] + [window_size for window_size, _ in windows])
+        self.max_lease_size = max(1, int(min([sited_rate for _, sited_rate in windows] or [1]) * quota_error_bound))
+        self.quota_pool = quota_pool if quota_pool is not None else DEFAULT_QUOTA_POOL
+
+    def _lease_size(self, rate: float) -> int:
+        return max(1, min(self.max_lease_size, math.ceil(rate * self.quota_lease_ttl)))
+
+    async def _acquire(self, cache_key: str, request_time: float) -> None:
+        lease = self.quota_pool.get(self.redis_connection, cache_key, self.windows)
+        while not lease.take():
+            if lease.refill is None or lease.refill.get_loop() is not asyncio.get_running_loop():
+                lease.refill = asyncio.ensure_future(self._refill(lease, request_time))
+                lease.refill.add_done_callback(functools.partial(self._on_refilled, lease))
+            await asyncio.shield(lease.refill)
+
+    async def _refill(self, lease: QuotaLease, request_time: float) -> None:
+        await lease.give_back()
+        lease.update_rate()
+
+        args = self._script_args(request_time)
+        args.insert(2, self._lease_size(lease.rate))
+        window, granted, *fields = await RESERVE_SCRIPT(self.redis_connection, keys=[lease.cache_key], args=args)
+        if window:
+            self._raise_limit_exceeded(window, granted)
+
+        lease.remaining = granted
+        lease.fields = fields
+        lease.expires_at = monotonic() + self.quota_lease_ttl
+
+    @staticmethod
+    def _on_refilled(lease: QuotaLease, future: asyncio.Future) -> None:
+        if lease.refill is future:
+            lease.refill = None
+        if not future.cancelled():
+            future.exception()
@@ -1,9 +1,9 @@
 from contextlib import AbstractAsyncContextManager
 from time import time
-from typing import Any, Callable, List, Optional
+from typing import Any, Awaitable, Callable, List, NoReturn, Optional
 
-from aioredis import Redis
-from aioredis.client import Pipeline
+from src.backend.backend import Backend, BackendPipeline
+from src.metrics.metrics import request_metrics
 
 DAY = 86400
 HOUR = 3600
@@ -18,15 +18,19 @@ class RateLimitException(Exception):
 class SlidingWindowRateLimiter(AbstractAsyncContextManager):
     def __init__(
         self,
-        redis_connection: Redis,
-        cache_key: str,
+        redis_connection: Backend,
+        cache_key: Optional[str] = None,
         rate_for_second: Optional[int] = None,
         rate_for_minute: Optional[int] = None,
         rate_for_hour: Optional[int] = None,
         rate_for_day: Optional[int] = None,
     ) -> None:
+        """
+        :param cache_key: ключ для использования в качестве контекстного менеджера или декоратора,
+            при вызове через run ключ передается на каждый вызов
+        """
         self.redis_connection = redis_connection
-        self.cache_key = cache_key + ':rate_limiter'
+        self.cache_key = self._limiter_key(cache_key) if cache_key is not None else None
         self.rate_for_second = rate_for_second
         self.rate_for_minute = rate_for_minute
         self.rate_for_hour = rate_for_hour
@@ -35,6 +39,14 @@ class SlidingWindowRateLimiter(AbstractAsyncContextManager):
 
         self.request_time: float = time()
 
+    def _limiter_key(self, cache_key: str) -> str:
+        return cache_key + ':rate_limiter'
+
+    def _bound_key(self) -> str:
+        if self.cache_key is None:
+            raise ValueError('cache_key is required to use rate limiter as context manager or decorator')
+        return self.cache_key
+
     def _validate_limits(self) -> None:
         limits: List[int] = list(
             filter(None, [self.rate_for_second, self.rate_for_minute, self.rate_for_hour, self.rate_for_day])
@@ -52,26 +64,23 @@ class SlidingWindowRateLimiter(AbstractAsyncContextManager):
         last_day_count: int,
     ) -> None:
         if self.rate_for_second and last_second_count >= self.rate_for_second:
-            raise RateLimitException(
-                f'Limit exceeded, limit per second: {self.rate_for_second} counted calls: {last_second_count}'
-            )
+            self._reject(f'Limit exceeded, limit per second: {self.rate_for_second} counted calls: {last_second_count}')
 
         if self.rate_for_minute and last_minute_count >= self.rate_for_minute:
-            raise RateLimitException(
-                f'Limit exceeded, limit per minute: {self.rate_for_minute} counted calls: {last_minute_count}'
-            )
+            self._reject(f'Limit exceeded, limit per minute: {self.rate_for_minute} counted calls: {last_minute_count}')
 
         if self.rate_for_hour and last_hour_count >= self.rate_for_hour:
-            raise RateLimitException(
-                f'Limit exceeded, limit per hour: {self.rate_for_hour} counted calls: {last_hour_count}'
-            )
+            self._reject(f'Limit exceeded, limit per hour: {self.rate_for_hour} counted calls: {last_hour_count}')
 
         if self.rate_for_day and last_day_count >= self.rate_for_day:
-            raise RateLimitException(
-                f'Limit exceeded, limit per second: {self.rate_for_day} counted calls: {last_day_count}'
-            )
+            self._reject(f'Limit exceeded, limit per second: {self.rate_for_day} counted calls: {last_day_count}')
+
+    @staticmethod
+    def _reject(message: str) -> NoReturn:
+        request_metrics.get().rate_limited += 1
+        raise RateLimitException(message)
 
-    def _build_getter_pipeline(self) -> Pipeline:
+    def _build_getter_pipeline(self, cache_key: str, request_time: float) -> BackendPipeline:
         pipline = self.redis_connection.pipeline()
         window_max_size = HOUR
 
@@ -83,11 +92,11 @@ class SlidingWindowRateLimiter(AbstractAsyncContextManager):
                 window_max_size = window_size
                 break
 
-        pipline.zremrangebylex(self.cache_key, min='-', max=f'[{int(self.request_time)-window_max_size}')
-        pipline.zlexcount(self.cache_key, min=f'[{self.request_time-SECOND}', max=f'[{self.request_time + 1}')
-        pipline.zlexcount(self.cache_key, min=f'[{self.request_time-MINUTE}', max=f'[{self.request_time + 1}')
-        pipline.zlexcount(self.cache_key, min=f'[{self.request_time-HOUR}', max=f'[{self.request_time + 1}')
-        pipline.zlexcount(self.cache_key, min=f'[{self.request_time-DAY}', max=f'[{self.request_time + 1}')
+        pipline.zremrangebylex(cache_key, min='-', max=f'[{int(request_time)-window_max_size}')
+        pipline.zlexcount(cache_key, min=f'[{request_time-SECOND}', max=f'[{request_time + 1}')
+        pipline.zlexcount(cache_key, min=f'[{request_time-MINUTE}', max=f'[{request_time + 1}')
+        pipline.zlexcount(cache_key, min=f'[{request_time-HOUR}', max=f'[{request_time + 1}')
+        pipline.zlexcount(cache_key, min=f'[{request_time-DAY}', max=f'[{request_time + 1}')
 
         return pipline
 
@@ -108,21 +117,35 @@ class SlidingWindowRateLimiter(AbstractAsyncContextManager):
         Запрос не пройдет так как в последнюю секунду уже было сделано 2 запроса
         """
 
-        pipeline = self._build_getter_pipeline()
+        await self._check_counts(self._bound_key(), self.request_time)
+
+    async def _check_counts(self, cache_key: str, request_time: float) -> None:
+        pipeline = self._build_getter_pipeline(cache_key, request_time)
         _, last_second_count, last_minute_count, last_hour_count, last_day_count = await pipeline.execute()
         self._check_limit(last_second_count, last_minute_count, last_hour_count, last_day_count)
 
+    async def run(self, func: Callable[[], Awaitable], cache_key: Optional[str] = None) -> Any:
+        """
+        Выполняет func с ограничением по ключу cache_key или по ключу из конструктора.
+        Ключ и время запроса не хранятся в экземпляре, поэтому один ограничитель
+        можно строить один раз и вызывать конкурентно
+        """
+        limiter_key = self._limiter_key(cache_key) if cache_key is not None else self._bound_key()
+        request_time = time()
+        await self._check_counts(limiter_key, request_time)
+        try:
+            return await func()
+        finally:
+            await self.redis_connection.zadd(limiter_key, {f'{request_time}': 0})
+
     def __call__(self, func: Callable) -> Callable:
         async def wrapped(*args: Any, **kwargs: Any) -> Any:
-            pipeline = self._build_getter_pipeline()
-
-            _, last_second_count, last_minute_count, last_hour_count, last_day_count = await pipeline.execute()
-            self._check_limit(last_second_count, last_minute_count, last_hour_count, last_day_count)
+            await self._check_counts(self._bound_key(), self.request_time)
             try:
                 return await func(*args, **kwargs)
             finally:
                 await self.redis_connection.zadd(
-                    self.cache_key,
+                    self._bound_key(),
                     {f'{self.request_time}': 0},
                 )
 
@@ -134,6 +157,6 @@ class SlidingWindowRateLimiter(AbstractAsyncContextManager):
         временем считается момент закрытия контекста
         """
         await self.redis_connection.zadd(
-            self.cache_key,
+            self._bound_key(),
             {f'{self.request_time}': 0},
         )
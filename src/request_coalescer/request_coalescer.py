@@ -0,0 +1,35 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict
+
+
+class RequestCoalescer:
+    """
+    Объединяет конкурентные запросы с одинаковым ключом в рамках одного event loop
+
+    Первый вызов запускает задачу, остальные ожидают её результат.
+    Отмена одного из ожидающих не отменяет общую задачу, исключение получают все ожидающие
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: str, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._in_flight.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(coro_factory())
+            self._in_flight[key] = future
+            future.add_done_callback(functools.partial(self._forget, key))
+
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled():
+            # помечаем исключение полученным, даже если все ожидающие уже отменены
+            future.exception()
@@ -0,0 +1,117 @@
+import asyncio
+from time import perf_counter
+from typing import Any, Awaitable, Callable, List, Optional
+
+from src.metrics.metrics import request_metrics
+
+
+class RequestHedger:
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        latency_percentile: float = 95.0,
+        window_size: int = 1000,
+        min_samples: int = 100,
+        min_delay: float = 0.001,
+        budget: float = 0.05,
+        max_burst: float = 10.0,
+    ) -> None:
+        """
+        Дублирующие запросы к интегратору: если запрос не завершился за delay секунд,
+        отправляется второй, возвращается первый успешный ответ, второй запрос отменяется
+
+        Если delay не задан, задержка - перцентиль latency_percentile времени последних window_size
+        успешных запросов, до накопления min_samples запросов дублирование не выполняется.
+        Каждый запрос пополняет бюджет на budget, дублирующий запрос тратит из бюджета 1,
+        поэтому дублирующих запросов не больше доли budget от всех
+
+        :param budget: допустимая доля дублирующих запросов, 0.05 - не больше 5%
+        :param max_burst: максимальный бюджет, число дублирующих запросов подряд после спокойного периода
+        """
+        if delay is not None and delay < 0:
+            raise ValueError('delay must not be negative')
+        if not 0 < latency_percentile < 100:
+            raise ValueError('latency_percentile must be in (0, 100)')
+        if min_samples <= 0 or window_size < min_samples:
+            raise ValueError('min_samples must be positive and not greater than window_size')
+
+        self.delay = delay
+        self.latency_percentile = latency_percentile
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = budget
+        self.max_burst = max_burst
+
+        self.hedged = 0
+        self.hedge_wins = 0
+
+        self._tokens = max_burst
+        self._samples: List[float] = []
+        self._next_sample = 0
+        self._estimated_delay: Optional[float] = None
+        self._observed_since_estimate = 0
+
+    @property
+    def current_delay(self) -> Optional[float]:
+        if self.delay is not None:
+            return self.delay
+        return self._estimated_delay
+
+    def observe(self, latency: float) -> None:
+        if len(self._samples) < self.window_size:
+            self._samples.append(latency)
+        else:
+            self._samples[self._next_sample] = latency
+            self._next_sample = (self._next_sample + 1) % self.window_size
+
+        # сортировка окна раз в десятую часть окна, а не на каждый запрос
+        self._observed_since_estimate += 1
+        if len(self._samples) >= self.min_samples and (
+            self._estimated_delay is None or self._observed_since_estimate >= max(self.window_size // 10, 1)
+        ):
+            samples = sorted(self._samples)
+            index = min(int(len(samples) * self.latency_percentile / 100), len(samples) - 1)
+            self._estimated_delay = max(samples[index], self.min_delay)
+            self._observed_since_estimate = 0
+
+    async def run(self, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        self._tokens = min(self._tokens + self.budget, self.max_burst)
+        started_at = perf_counter()
+        primary = asyncio.ensure_future(coro_factory())
+        attempts = [primary]
+        try:
+            delay = self.current_delay
+            if delay is not None:
+                await asyncio.wait(attempts, timeout=delay)
+            if primary.done() or delay is None or self._tokens < 1:
+                result = await primary
+                self.observe(perf_counter() - started_at)
+                return result
+
+            self._tokens -= 1
+            self.hedged += 1
+            request_metrics.get().hedges += 1
+            hedge_started_at = perf_counter()
+            attempts.append(asyncio.ensure_future(coro_factory()))
+
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.cancelled() or attempt.exception() is not None:
+                        continue
+                    if attempt is primary:
+                        self.observe(perf_counter() - started_at)
+                    else:
+                        self.hedge_wins += 1
+                        request_metrics.get().hedge_wins += 1
+                        self.observe(perf_counter() - hedge_started_at)
+                    return attempt.result()
+
+            # оба запроса завершились ошибкой, поднимается ошибка основного
+            return primary.result()
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
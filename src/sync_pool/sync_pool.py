@@ -0,0 +1,112 @@
+import asyncio
+import inspect
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Optional
+
+from src.bounded_semaphore.bounded_semaphore import BoundedSemaphore
+from src.exceptions.exceptions import PoolSaturatedError
+from src.metrics.metrics import request_metrics
+
+
+def is_coroutine_callable(func: Callable) -> bool:
+    """
+    Функции, partial и объекты с асинхронным __call__
+    """
+    return inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, '__call__', None))
+
+
+class SyncCallPool:
+    def __init__(
+        self,
+        max_workers: int = 10,
+        max_queue_size: int = 1000,
+        use_processes: bool = False,
+    ) -> None:
+        """
+        Выполняет блокирующие функции интеграторов в пуле потоков или процессов, не блокируя event loop
+
+        Одновременно в пуле выполняется не больше max_workers вызовов, остальные ожидают в очереди,
+        время ожидания записывается в метрику pool_wait. Пул создается при первом вызове
+
+        :param max_queue_size: при переполнении очереди вызов завершается PoolSaturatedError
+        :param use_processes: ProcessPoolExecutor для разбора тяжелых ответов, функция и аргументы
+            должны сериализоваться pickle, поэтому функция должна быть доступна по своему имени в модуле
+        """
+        if max_workers <= 0:
+            raise ValueError('max_workers must be positive')
+        if max_queue_size < 0:
+            raise ValueError('max_queue_size must not be negative')
+
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.use_processes = use_processes
+        self.rejected = 0
+
+        self._executor: Optional[Executor] = None
+        self._semaphore = BoundedSemaphore(max_workers, max_queue_size)
+
+    @property
+    def running(self) -> int:
+        return self._semaphore.running
+
+    @property
+    def queue_depth(self) -> int:
+        return self._semaphore.queue_depth
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sync_call_pool')
+        return self._executor
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        await self._acquire()
+        try:
+            future = self._get_executor().submit(partial(func, *args, **kwargs))
+        except RuntimeError:
+            # исполнитель остановлен, вызов не запущен
+            self._semaphore.release()
+            raise
+        # отмена ожидания не останавливает уже запущенную функцию, поэтому место освобождается,
+        # только когда функция завершилась, иначе в пуле выполнялось бы больше max_workers вызовов
+        future.add_done_callback(partial(self._on_done, loop))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _on_done(self, loop: asyncio.AbstractEventLoop, future: Future) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release_in, loop)
+        except RuntimeError:
+            # event loop закрыт, его места сброшены при переходе в новый event loop
+            pass
+
+    def _release_in(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._semaphore.loop is loop:
+            self._semaphore.release()
+
+    async def _acquire(self) -> None:
+        metrics = request_metrics.get()
+        if self._semaphore.try_acquire():
+            metrics.pool_wait.observe(0.0)
+            return
+
+        if self._semaphore.queue_full:
+            self.rejected += 1
+            metrics.pool_rejections += 1
+            raise PoolSaturatedError(f'Sync call pool is saturated, queued calls: {self._semaphore.queue_depth}')
+
+        queued_at = perf_counter()
+        await self._semaphore.wait()
+        metrics.pool_wait.observe(perf_counter() - queued_at)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+DEFAULT_SYNC_POOL = SyncCallPool()
@@ -0,0 +1,279 @@
+import asyncio
+
+import aioredis
+import pytest
+from aioredis import Redis
+from aioredis.exceptions import ResponseError
+
+from main import RequestManager
+from src.backend.cluster import RedisClusterBackend, key_slot
+from src.backend.in_memory import InMemoryBackend
+from src.backend.sharded import ShardedBackend
+from src.bulkhead.bulkhead import RedisBulkhead
+from src.cache_invalidator_strategy import BackgroundUpdater, TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.cache_namespace.cache_namespace import CacheNamespace
+from src.lease_lock.lease_lock import CacheLease
+from src.lua_script.lua_script import SCRIPTS
+from src.rate_imiter.adaptive_rate_limiter import AdaptiveLimit
+from src.rate_imiter.lua_rate_limiter import (
+    GCRARateLimiter,
+    LuaSlidingWindowRateLimiter,
+    SlidingWindowCounterRateLimiter,
+)
+from src.rate_imiter.quota_leasing import QuotaLeasePool, QuotaLeasingRateLimiter
+from src.rate_imiter.rate_limiter import RateLimitException, SlidingWindowRateLimiter
+
+
+@pytest.fixture
+async def second_node():
+    pool = aioredis.ConnectionPool.from_url('redis://localhost:6379', decode_responses=True, db=2)
+    connection = Redis(connection_pool=pool)
+
+    yield connection
+
+    await connection.flushdb()
+    await pool.disconnect()
+
+
+class UpstreamThrottled(Exception):
+    pass
+
+
+async def succeed():
+    return 'data'
+
+
+async def admitted_calls(limiter, calls):
+    admitted = 0
+    for _ in range(calls):
+        try:
+            await limiter.run(succeed, 'unique_key')
+        except RateLimitException:
+            continue
+        admitted += 1
+    return admitted
+
+
+async def test_in_memory_strings():
+    backend = InMemoryBackend()
+
+    assert await backend.set('key', 1, px=50)
+    assert await backend.set('key', 2, nx=True) is None
+    assert 0 < await backend.pttl('key') <= 50
+    assert await backend.mget(['key', 'missing']) == ['1', None]
+    assert await backend.incr('counter', 2) == 2
+    assert await backend.pttl('counter') == -1
+
+    await asyncio.sleep(0.06)
+
+    assert await backend.get('key') is None
+    assert await backend.pttl('key') == -2
+    assert await backend.delete('key', 'counter') == 1
+    assert len(backend) == 0
+
+
+async def test_in_memory_pipeline_and_binary_values():
+    backend = InMemoryBackend(decode_responses=False)
+
+    pipeline = backend.pipeline()
+    pipeline.set('key', 'data').get('key').zadd('zset', {'b': 0, 'a': 0}).zlexcount('zset', '[a', '+')
+    assert await pipeline.execute() == [True, b'data', 2, 2]
+
+    assert await backend.zremrangebylex('zset', '-', '(b') == 1
+    assert await backend.zlexcount('zset', '-', '+') == 1
+    with pytest.raises(ResponseError):
+        await backend.eval('return 1', 0)
+
+
+async def test_in_memory_rate_limiter():
+    limiter = SlidingWindowRateLimiter(InMemoryBackend(), rate_for_second=2)
+
+    assert await admitted_calls(limiter, 4) == 2
+
+
+def test_every_script_has_python_equivalent():
+    assert all(script.python is not None for script in SCRIPTS.values())
+
+
+@pytest.mark.parametrize(
+    'limiter_class',
+    [LuaSlidingWindowRateLimiter, SlidingWindowCounterRateLimiter, GCRARateLimiter, QuotaLeasingRateLimiter],
+)
+async def test_in_memory_lua_rate_limiter(limiter_class):
+    backend = InMemoryBackend()
+    limiter = limiter_class(backend, rate_for_second=2)
+    if limiter_class is QuotaLeasingRateLimiter:
+        limiter.quota_pool = QuotaLeasePool()
+
+    assert await admitted_calls(limiter, 4) == 2
+    await asyncio.sleep(1)
+    assert await admitted_calls(limiter, 4) >= 1
+
+
+async def test_in_memory_adaptive_limit():
+    adaptive_limit = AdaptiveLimit(throttling_exceptions=(UpstreamThrottled,), redis_connection=InMemoryBackend())
+
+    await adaptive_limit.observe(0.01, throttled=True)
+    assert adaptive_limit.factor == 0.5
+
+
+async def test_in_memory_bulkhead_and_lease():
+    backend = InMemoryBackend()
+    bulkhead = RedisBulkhead(backend, 'simi', max_concurrent=1, queue_timeout=0)
+    cache_lease = CacheLease(backend)
+
+    assert await bulkhead._try_acquire('holder')
+    assert await bulkhead.holders() == 1
+    assert not await bulkhead._try_acquire('other_holder')
+
+    token = await cache_lease.acquire('key')
+    assert token == 1 and await cache_lease.acquire('key') is None
+    cache_service = BaseCacheControlService(backend, ex=10)
+    assert not await cache_service.set_cache('key', 'data', guard=('key:lease', token + 1))
+    assert await cache_service.set_cache('key', 'data', guard=('key:lease', token))
+    assert 0 < await backend.pttl('key') <= 10000
+    await cache_lease.release('key', token)
+    assert await cache_lease.acquire('key') == 2
+
+
+async def test_in_memory_strategies():
+    backend = InMemoryBackend()
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return 'data'
+
+    ttl_strategy = TTLInvalidator(BaseCacheControlService(backend, ex=60))
+    background_strategy = BackgroundUpdater(BaseCacheControlService(backend, ex=60), backend, soft_ttl=60)
+    for strategy in (ttl_strategy, background_strategy):
+        assert await strategy.get_data(perform_request, cache_key=type(strategy).__name__) == 'data'
+    # BackgroundUpdater пишет кэш в фоне
+    await background_strategy.refresh_scheduler.shutdown()
+    for strategy in (ttl_strategy, background_strategy):
+        assert await strategy.get_data(perform_request, cache_key=type(strategy).__name__) == 'data'
+
+    assert call_count == 2
+
+
+async def test_sharded_distributes_keys(redis_connection, second_node, clean_redis):
+    backend = ShardedBackend({'first': redis_connection, 'second': second_node})
+    keys = [f'lk_simi:patient_id={i}' for i in range(20)]
+
+    pipeline = backend.pipeline()
+    for i, key in enumerate(keys):
+        pipeline.set(key, i)
+    await pipeline.execute()
+
+    assert await redis_connection.dbsize() > 0 and await second_node.dbsize() > 0
+    assert await backend.mget(keys) == [str(i) for i in range(20)]
+    assert await backend.delete(*keys) == 20
+
+
+async def test_sharded_keeps_derived_keys_on_cache_key_node(redis_connection, second_node, clean_redis):
+    backend = ShardedBackend({'first': redis_connection, 'second': second_node})
+    limiter = LuaSlidingWindowRateLimiter(backend, rate_for_second=2)
+
+    assert await admitted_calls(limiter, 4) == 2
+    node = backend.nodes[backend.node_for('unique_key')]
+    assert await node.exists('unique_key:rate_limiter:lua')
+
+
+def test_sharded_ring_moves_few_keys():
+    nodes = {'first': None, 'second': None, 'third': None}
+    keys = [f'lk_simi:patient_id={i}' for i in range(3000)]
+    before = ShardedBackend(nodes)
+    after = ShardedBackend({**nodes, 'fourth': None})
+
+    moved = sum(before.node_for(key) != after.node_for(key) for key in keys)
+
+    assert 0.1 < moved / len(keys) < 0.4
+    assert all(after.node_for(key) == 'fourth' for key in keys if before.node_for(key) != after.node_for(key))
+
+
+def test_key_slot():
+    assert key_slot('123456789') == 12739
+    assert key_slot('{user1000}.following') == key_slot('{user1000}.followers')
+
+
+async def test_cluster_keeps_rate_limiter_keys_in_cache_key_slot(redis_connection, clean_redis):
+    backend = RedisClusterBackend(redis_connection)
+    limiter = LuaSlidingWindowRateLimiter(backend, rate_for_second=2)
+    cache_service = BaseCacheControlService(backend)
+
+    assert await admitted_calls(limiter, 4) == 2
+    await cache_service.set_cache('unique_key', 'data')
+
+    assert await cache_service.get_cache('unique_key') == 'data'
+    assert set(await redis_connection.keys()) == {'{unique_key}', '{unique_key}:rate_limiter:lua'}
+    assert await backend.mget(['unique_key', 'other_key']) == ['data', None]
+
+
+async def test_cluster_rejects_cross_slot_scripts(redis_connection):
+    backend = RedisClusterBackend(redis_connection)
+
+    with pytest.raises(ValueError):
+        await backend.eval('return 1', 2, 'first_key', 'second_key')
+
+
+async def test_request_manager_with_sharded_backend(redis_connection, second_node, clean_redis):
+    backend = ShardedBackend({'first': redis_connection, 'second': second_node})
+
+    @RequestManager(
+        cache_strategy=TTLInvalidator(cache_service=BaseCacheControlService(backend, ex=60)),
+        service_name='lk_simi',
+    )
+    async def perform_request(patient_id):
+        perform_request.call_count += 1
+        return f'data_{patient_id}'
+
+    perform_request.call_count = 0
+    for _ in range(2):
+        assert await asyncio.gather(*(perform_request(i) for i in range(10))) == [f'data_{i}' for i in range(10)]
+
+    assert perform_request.call_count == 10
+
+
+@pytest.mark.parametrize('backend_type', ['cluster', 'sharded'])
+async def test_cache_lease_on_routed_backend(backend_type, redis_connection, second_node, clean_redis):
+    if backend_type == 'cluster':
+        backend = RedisClusterBackend(redis_connection)
+    else:
+        backend = ShardedBackend({'first': redis_connection, 'second': second_node})
+
+    @RequestManager(
+        cache_strategy=TTLInvalidator(
+            cache_service=BaseCacheControlService(backend, ex=60),
+            cache_lease=CacheLease(backend),
+        ),
+        service_name='lk_simi',
+    )
+    async def perform_request(patient_id):
+        return f'data_{patient_id}'
+
+    assert await asyncio.gather(*(perform_request(i) for i in range(20))) == [f'data_{i}' for i in range(20)]
+    assert await backend.get('lk_simi:patient_id=7:lease:fencing') == '1'
+
+
+@pytest.mark.parametrize('backend_type', ['cluster', 'sharded', 'in_memory'])
+async def test_tag_invalidation_on_backend(backend_type, redis_connection, second_node, clean_redis):
+    if backend_type == 'cluster':
+        backend = RedisClusterBackend(redis_connection)
+    elif backend_type == 'sharded':
+        backend = ShardedBackend({'first': redis_connection, 'second': second_node})
+    else:
+        backend = InMemoryBackend()
+    cache_namespace = CacheNamespace(backend)
+    keys = [f'lk_simi:patient_id=1:document={i}' for i in range(20)]
+    for key in keys:
+        await backend.set(key, 'data')
+        await cache_namespace.tag(key, ['patient:1'])
+    await backend.set('lk_simi:patient_id=2', 'data')
+
+    assert await cache_namespace.invalidate_tag('patient:1') == 20
+
+    assert await backend.mget(keys) == [None] * 20
+    assert await backend.get('lk_simi:patient_id=2') == 'data'
+    assert await backend.smembers('cache_namespace:tag:patient:1') == set()
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from aioredis.exceptions import ResponseError
+
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.batching import BatchingCacheService
+from src.cache_manager.cache_manager import BaseCacheControlService, CacheControlService
+from src.exceptions.exceptions import InvalidCacheError
+from src.metrics.metrics import RequestMetrics, request_metrics
+
+
+async def command_calls(redis_connection, command):
+    stats = await redis_connection.info('commandstats')
+    return stats.get(f'cmdstat_{command}', {}).get('calls', 0)
+
+
+async def test_concurrent_reads_share_one_mget(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(BaseCacheControlService(redis_connection))
+    await redis_connection.mset({f'key_{i}': f'data_{i}' for i in range(10)})
+    await redis_connection.config_resetstat()
+
+    results = await asyncio.gather(*[cache_service.get_cache(f'key_{i % 10}') for i in range(50)])
+
+    assert results == [f'data_{i % 10}' for i in range(50)]
+    assert await command_calls(redis_connection, 'mget') == 1
+    assert await command_calls(redis_connection, 'get') == 0
+
+
+async def test_invalid_cache_is_routed_to_its_caller(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(
+        CacheControlService(redis_connection, cache_validators=[lambda data: data != 'invalid']),
+        batch_window=0.001,
+    )
+    await redis_connection.mset({'valid': 'data', 'invalid': 'invalid'})
+
+    valid, invalid = await asyncio.gather(
+        cache_service.get_cache('valid'), cache_service.get_cache('invalid'), return_exceptions=True
+    )
+
+    assert valid == 'data'
+    assert isinstance(invalid, InvalidCacheError)
+
+
+async def test_filtered_write_does_not_break_batch(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(
+        CacheControlService(redis_connection, cache_filters=[lambda data: data != 'filtered'])
+    )
+
+    with pytest.raises(InvalidCacheError):
+        await asyncio.gather(cache_service.set_cache('filtered', 'filtered'), cache_service.set_cache('key', 'data'))
+    await asyncio.sleep(0.01)
+
+    assert await redis_connection.get('key') == 'data'
+    assert await redis_connection.get('filtered') is None
+
+
+async def test_batching_is_transparent_for_strategy(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(BaseCacheControlService(redis_connection, ex=10))
+
+    @RequestManager(service_name='test_service', cache_strategy=TTLInvalidator(cache_service=cache_service))
+    async def perform_request(arg):
+        return arg
+
+    await redis_connection.config_resetstat()
+    expected = [f'data_{i}' for i in range(20)]
+    assert await asyncio.gather(*[perform_request(f'data_{i}') for i in range(20)]) == expected
+    assert await asyncio.gather(*[perform_request(f'data_{i}') for i in range(20)]) == expected
+
+    assert await command_calls(redis_connection, 'mget') == 2
+    assert await command_calls(redis_connection, 'set') == 20
+
+
+async def test_command_error_is_routed_to_its_caller(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(BaseCacheControlService(redis_connection, ex=0))
+    await redis_connection.set('key', 'data')
+
+    cache, result = await asyncio.gather(
+        cache_service.get_cache('key'), cache_service.set_cache('other_key', 'data'), return_exceptions=True
+    )
+
+    assert cache == 'data'
+    assert isinstance(result, ResponseError)
+
+
+async def test_unexpected_error_resolves_whole_batch(redis_connection, clean_redis):
+    def broken_validator(data):
+        raise RuntimeError('broken validator')
+
+    cache_service = BatchingCacheService(CacheControlService(redis_connection, cache_validators=[broken_validator]))
+    await redis_connection.set('key', 'data')
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            cache_service.get_cache('key'), cache_service.set_cache('other_key', 'data'), return_exceptions=True
+        ),
+        timeout=1,
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_requests_keep_issue_order(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(BaseCacheControlService(redis_connection))
+    await redis_connection.set('key', 'old_data')
+    await redis_connection.config_resetstat()
+
+    results = await asyncio.gather(
+        cache_service.get_cache('key'),
+        cache_service.get_cache('other_key'),
+        cache_service.set_cache('key', 'new_data'),
+        cache_service.get_cache('key'),
+    )
+
+    assert results == ['old_data', None, True, 'new_data']
+    assert await command_calls(redis_connection, 'mget') == 2
+
+
+async def test_batch_records_redis_latency(redis_connection, clean_redis):
+    cache_service = BatchingCacheService(BaseCacheControlService(redis_connection))
+    metrics = RequestMetrics(('test', '', ''))
+    metrics_token = request_metrics.set(metrics)
+    try:
+        await asyncio.gather(cache_service.get_cache('key'), cache_service.set_cache('key', 'data'))
+    finally:
+        request_metrics.reset(metrics_token)
+
+    assert metrics.redis_latency.count == 1
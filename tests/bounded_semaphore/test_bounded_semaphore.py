@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from src.bounded_semaphore.bounded_semaphore import BoundedSemaphore
+
+
+async def test_slot_is_handed_to_waiters_in_order():
+    semaphore = BoundedSemaphore(limit=1, max_queue_size=2)
+    order = []
+
+    async def wait(name):
+        await semaphore.wait()
+        order.append(name)
+
+    assert semaphore.try_acquire()
+    assert not semaphore.try_acquire()
+    waiters = [asyncio.ensure_future(wait(name)) for name in ('first', 'second')]
+    await asyncio.sleep(0)
+    assert semaphore.queue_full
+
+    semaphore.release()
+    await asyncio.sleep(0)
+    semaphore.release()
+    await asyncio.gather(*waiters)
+    semaphore.release()
+
+    assert order == ['first', 'second']
+    assert (semaphore.running, semaphore.queue_depth) == (0, 0)
+
+
+async def test_timed_out_waiter_leaves_queue():
+    semaphore = BoundedSemaphore(limit=1, max_queue_size=1)
+    assert semaphore.try_acquire()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await semaphore.wait(timeout=0.01)
+
+    assert semaphore.queue_depth == 0
+    semaphore.release()
+    assert semaphore.running == 0
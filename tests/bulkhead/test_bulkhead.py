@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.bulkhead.bulkhead import LocalBulkhead, RedisBulkhead
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.exceptions.exceptions import BulkheadFullError
+from src.metrics.metrics import MetricsRegistry, request_metrics
+
+
+def build_upstream(latency=0.02):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def perform_request():
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            in_flight -= 1
+        return 'data'
+
+    return perform_request, lambda: max_in_flight
+
+
+async def test_local_bulkhead_limits_concurrency():
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    bulkhead = LocalBulkhead(max_concurrent=2)
+    perform_request, max_in_flight = build_upstream()
+
+    results = await asyncio.gather(*(bulkhead.run(perform_request) for _ in range(6)))
+
+    assert results == ['data'] * 6
+    assert max_in_flight() == 2
+    assert (bulkhead.running, bulkhead.queue_depth) == (0, 0)
+    assert metrics.bulkhead_wait.count == 6
+    assert metrics.bulkhead_wait.sum > 0
+
+
+async def test_local_bulkhead_rejects_when_queue_is_full():
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    bulkhead = LocalBulkhead(max_concurrent=1, max_queue_size=1)
+    perform_request, _ = build_upstream()
+
+    results = await asyncio.gather(*(bulkhead.run(perform_request) for _ in range(3)), return_exceptions=True)
+
+    assert results[:2] == ['data', 'data']
+    assert isinstance(results[2], BulkheadFullError)
+    assert metrics.bulkhead_rejections == 1
+
+
+async def test_local_bulkhead_queue_timeout():
+    bulkhead = LocalBulkhead(max_concurrent=1, queue_timeout=0.01)
+    perform_request, _ = build_upstream(latency=0.1)
+
+    results = await asyncio.gather(bulkhead.run(perform_request), bulkhead.run(perform_request), return_exceptions=True)
+
+    assert results[0] == 'data'
+    assert isinstance(results[1], BulkheadFullError)
+    assert (bulkhead.running, bulkhead.queue_depth) == (0, 0)
+
+
+async def test_redis_bulkhead_is_shared_between_processes(redis_connection, clean_redis):
+    first = RedisBulkhead(redis_connection, 'simi', max_concurrent=1, poll_interval=0.01)
+    second = RedisBulkhead(redis_connection, 'simi', max_concurrent=1, poll_interval=0.01)
+    perform_request, max_in_flight = build_upstream()
+
+    results = await asyncio.gather(first.run(perform_request), second.run(perform_request))
+
+    assert results == ['data', 'data']
+    assert max_in_flight() == 1
+    assert await first.holders() == 0
+
+
+async def test_redis_bulkhead_queue_timeout(redis_connection, clean_redis):
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    bulkhead = RedisBulkhead(redis_connection, 'simi', max_concurrent=1, queue_timeout=0.02, poll_interval=0.01)
+    perform_request, _ = build_upstream(latency=0.1)
+
+    results = await asyncio.gather(bulkhead.run(perform_request), bulkhead.run(perform_request), return_exceptions=True)
+
+    # оба запроса идут в редис одновременно, место может получить любой
+    assert sorted(results, key=lambda result: isinstance(result, BulkheadFullError))[0] == 'data'
+    assert sum(isinstance(result, BulkheadFullError) for result in results) == 1
+    assert metrics.bulkhead_rejections == 1
+    assert bulkhead.queue_depth == 0
+
+
+async def test_redis_bulkhead_lease_expires(redis_connection, clean_redis):
+    bulkhead = RedisBulkhead(redis_connection, 'simi', max_concurrent=1, lease_ttl=0.05, queue_timeout=0)
+    # место, занятое упавшим процессом
+    assert await bulkhead._try_acquire('crashed_holder')
+
+    with pytest.raises(BulkheadFullError):
+        await bulkhead.run(build_upstream()[0])
+
+    await asyncio.sleep(0.06)
+    assert await bulkhead.run(build_upstream()[0]) == 'data'
+
+
+async def test_redis_bulkhead_uses_redis_clock(redis_connection, clean_redis, monkeypatch):
+    bulkhead = RedisBulkhead(redis_connection, 'simi', max_concurrent=1)
+    seconds, microseconds = await redis_connection.time()
+    now_ms = seconds * 1000 + microseconds // 1000
+    await redis_connection.zadd(bulkhead.redis_key, {'expired_holder': now_ms - 1000})
+    # часы процесса отстают от редиса, на аренды это не влияет
+    monkeypatch.setattr('time.time', lambda: 0)
+
+    assert await bulkhead.holders() == 0
+    assert await bulkhead._try_acquire('holder')
+    assert await bulkhead.holders() == 1
+
+
+async def test_strategy_with_bulkhead(redis_connection, clean_redis):
+    perform_request, max_in_flight = build_upstream()
+    strategy = TTLInvalidator(
+        BaseCacheControlService(redis_connection=redis_connection),
+        bulkhead=LocalBulkhead(max_concurrent=1, max_queue_size=0),
+    )
+
+    results = await asyncio.gather(
+        strategy.get_data(perform_request, cache_key='first'),
+        strategy.get_data(perform_request, cache_key='second'),
+        return_exceptions=True,
+    )
+
+    assert sorted(results, key=lambda result: isinstance(result, BulkheadFullError))[0] == 'data'
+    assert sum(isinstance(result, BulkheadFullError) for result in results) == 1
+    assert max_in_flight() == 1
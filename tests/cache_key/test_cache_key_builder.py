@@ -0,0 +1,83 @@
+import pytest
+
+from main import RequestManager, build_cache_key, compile_cache_key_builder
+
+
+async def plain(patient_id, document_type='pdf'):
+    pass
+
+
+async def keyword_only(patient_id, *, page=1, size):
+    pass
+
+
+async def variadic(patient_id, *args, flag=False, **kwargs):
+    pass
+
+
+async def without_arguments():
+    pass
+
+
+class Integration:
+    def __str__(self):
+        return 'integration{}'
+
+    async def method(self, patient_id):
+        pass
+
+
+@pytest.mark.parametrize(
+    'func,args,kwargs',
+    [
+        [plain, (1,), {}],
+        [plain, (1, 'xml'), {}],
+        [keyword_only, (1,), {'page': 2, 'size': 10}],
+        [variadic, (1, 2, 3), {'extra': 'value'}],
+        [without_arguments, (), {}],
+        [Integration().method, ('1',), {}],
+    ],
+)
+def test_compiled_key_matches_build_cache_key(func, args, kwargs):
+    key_builder = compile_cache_key_builder(
+        func, 'service', integration='simi', integration_method='getHtml', service_version='1.0'
+    )
+
+    assert key_builder(*args, **kwargs) == build_cache_key(
+        func, 'service', *args, integration='simi', integration_method='getHtml', service_version='1.0', **kwargs
+    )
+
+
+def test_compiled_key_does_not_depend_on_argument_passing():
+    key_builder = compile_cache_key_builder(keyword_only, 'service')
+
+    assert key_builder(1, size=10, page=2) == key_builder(patient_id=1, page=2, size=10)
+    assert key_builder(1, size=10, page=2) == 'service:patient_id=1:page=2:size=10'
+
+
+def test_compiled_key_rejects_wrong_arguments():
+    key_builder = compile_cache_key_builder(plain, 'service')
+
+    with pytest.raises(TypeError):
+        key_builder(1, 'xml', 'unexpected')
+    with pytest.raises(TypeError):
+        key_builder(unknown=1)
+
+
+def test_long_key_is_hashed_with_readable_prefix():
+    key_builder = compile_cache_key_builder(plain, 'service', integration='simi', digest_threshold=50)
+
+    assert key_builder(1) == 'service:simi:patient_id=1:document_type=pdf'
+
+    long_key = key_builder('x' * 1000)
+    assert long_key.startswith('service:simi:')
+    assert len(long_key) == len('service:simi:') + 32
+    assert long_key != key_builder('y' * 1000)
+
+
+def test_request_manager_compiles_key_builder_on_decoration():
+    manager = RequestManager(service_name='service', cache_strategy=None, cache_key_digest_threshold=1000)
+    manager(plain)
+
+    assert plain in manager._cache_key_builders
+    assert manager.build_cache_key(plain, 1) == 'service:patient_id=1:document_type=pdf'
@@ -0,0 +1,122 @@
+import asyncio
+
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService, TwoTierCacheService
+from src.cache_manager.invalidation_bus import InvalidationBus
+from src.cache_namespace.cache_namespace import CacheNamespace
+
+
+def build_manager(redis_connection, cache_namespace, integration='simi', **kwargs):
+    return RequestManager(
+        service_name='lk_simi',
+        service_version='1.0',
+        integration=integration,
+        cache_strategy=TTLInvalidator(cache_service=BaseCacheControlService(redis_connection, ex=60)),
+        cache_namespace=cache_namespace,
+        **kwargs,
+    )
+
+
+async def test_generation_is_part_of_cache_key(redis_connection, clean_redis):
+    cache_namespace = CacheNamespace(redis_connection)
+
+    @build_manager(redis_connection, cache_namespace)
+    async def perform_request(patient_id):
+        return 'data'
+
+    await perform_request(1)
+
+    assert await redis_connection.keys('lk_simi:*') == ['lk_simi:1.0:simi:g0.0.0:patient_id=1']
+
+
+async def test_bump_invalidates_only_its_level(redis_connection, clean_redis):
+    cache_namespace = CacheNamespace(redis_connection)
+    call_count = {'simi': 0, 'emias': 0}
+
+    @build_manager(redis_connection, cache_namespace, integration='simi')
+    async def perform_simi_request(patient_id):
+        call_count['simi'] += 1
+        return 'data'
+
+    @build_manager(redis_connection, cache_namespace, integration='emias')
+    async def perform_emias_request(patient_id):
+        call_count['emias'] += 1
+        return 'data'
+
+    for _ in range(2):
+        await perform_simi_request(1)
+        await perform_emias_request(1)
+    assert call_count == {'simi': 1, 'emias': 1}
+
+    await cache_namespace.bump('lk_simi', '1.0', 'simi')
+    await perform_simi_request(1)
+    await perform_emias_request(1)
+    assert call_count == {'simi': 2, 'emias': 1}
+
+    await cache_namespace.bump('lk_simi')
+    await perform_simi_request(1)
+    await perform_emias_request(1)
+    assert call_count == {'simi': 3, 'emias': 2}
+
+
+async def test_generation_from_other_process_is_seen_after_local_ttl(redis_connection, clean_redis):
+    cache_namespace = CacheNamespace(redis_connection, local_ttl=0.1)
+    assert await cache_namespace.generations(['lk_simi']) == [0]
+
+    await CacheNamespace(redis_connection).bump('lk_simi')
+    assert await cache_namespace.generations(['lk_simi']) == [0]
+
+    await asyncio.sleep(0.15)
+    assert await cache_namespace.generations(['lk_simi']) == [1]
+
+
+async def test_invalidate_tag_deletes_tagged_keys(redis_connection, clean_redis):
+    cache_namespace = CacheNamespace(redis_connection, tag_ttl=60)
+    call_count = 0
+
+    @build_manager(redis_connection, cache_namespace, cache_tags=lambda patient_id, document: [f'patient:{patient_id}'])
+    async def perform_request(patient_id, document):
+        nonlocal call_count
+        call_count += 1
+        return 'data'
+
+    for document in ('pdf', 'xml', 'pdf'):
+        await perform_request(1, document)
+        await perform_request(2, document)
+    assert call_count == 4
+    assert 0 < await redis_connection.ttl('cache_namespace:tag:patient:1') <= 60
+
+    assert await cache_namespace.invalidate_tag('patient:1') == 2
+    assert not await redis_connection.exists('cache_namespace:tag:patient:1')
+
+    await perform_request(1, 'pdf')
+    await perform_request(2, 'pdf')
+    assert call_count == 5
+
+
+async def test_invalidate_tag_evicts_local_entries(redis_connection, clean_redis):
+    buses = [InvalidationBus(redis_connection) for _ in range(2)]
+    nodes = [
+        TwoTierCacheService(BaseCacheControlService(redis_connection, ex=60), local_ttl=60, invalidation_bus=bus)
+        for bus in buses
+    ]
+    for bus in buses:
+        await bus.wait_subscribed()
+    cache_namespace = CacheNamespace(redis_connection, invalidation_bus=buses[0])
+
+    await nodes[0].set_cache('patient_id=1', 'data')
+    await cache_namespace.tag('patient_id=1', ['patient:1'])
+    for node in nodes:
+        assert await node.get_cache('patient_id=1') == 'data'
+
+    assert await cache_namespace.invalidate_tag('patient:1') == 1
+    assert 'patient_id=1' not in nodes[0].local_cache
+    for _ in range(100):
+        if 'patient_id=1' not in nodes[1].local_cache:
+            break
+        await asyncio.sleep(0.01)
+    assert await nodes[1].get_cache('patient_id=1') is None
+
+    for bus in buses:
+        await bus.stop()
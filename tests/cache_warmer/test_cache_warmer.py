@@ -0,0 +1,96 @@
+import asyncio
+
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.cache_warmer.cache_warmer import CacheWarmer
+from src.hot_keys.hot_keys import HotKeyTracker
+from src.metrics.metrics import MetricsRegistry
+from src.rate_imiter.lua_rate_limiter import LuaSlidingWindowRateLimiter
+
+CACHE_KEY = 'lk_simi:patient_id=1'
+
+
+def build_request(redis_connection, tracker, registry, px):
+    cache_service = BaseCacheControlService(redis_connection=redis_connection, px=px)
+
+    @RequestManager(
+        cache_strategy=TTLInvalidator(cache_service=cache_service),
+        service_name='lk_simi',
+        hot_key_tracker=tracker,
+        metrics_registry=registry,
+    )
+    async def perform_request(patient_id):
+        perform_request.call_count += 1
+        return f'data_{perform_request.call_count}'
+
+    perform_request.call_count = 0
+    return perform_request, cache_service
+
+
+async def test_warms_key_before_expiry(redis_connection, clean_redis):
+    tracker, registry = HotKeyTracker(), MetricsRegistry()
+    perform_request, cache_service = build_request(redis_connection, tracker, registry, px=500)
+    warmer = CacheWarmer(tracker, cache_service, redis_connection, warm_ahead=1.0, interval=0.1)
+    for _ in range(3):
+        assert await perform_request(1) == 'data_1'
+
+    assert await warmer.warm_once() == 1
+    await warmer.refresh_scheduler.shutdown()
+
+    assert perform_request.call_count == 2
+    assert await redis_connection.get(CACHE_KEY) == 'data_2'
+    assert await redis_connection.pttl(CACHE_KEY) > 400
+    assert warmer.warmed == registry.get('lk_simi').warmups == 1
+
+
+async def test_skips_keys_far_from_expiry(redis_connection, clean_redis):
+    tracker = HotKeyTracker()
+    perform_request, cache_service = build_request(redis_connection, tracker, MetricsRegistry(), px=60000)
+    warmer = CacheWarmer(tracker, cache_service, redis_connection, warm_ahead=1.0, interval=0.1)
+    for _ in range(3):
+        await perform_request(1)
+    await perform_request(2)
+
+    assert await warmer.warm_once() == 0
+
+
+async def test_warming_is_rate_limited(redis_connection, clean_redis):
+    tracker = HotKeyTracker()
+    perform_request, cache_service = build_request(redis_connection, tracker, MetricsRegistry(), px=500)
+    warmer = CacheWarmer(
+        tracker,
+        cache_service,
+        redis_connection,
+        warm_ahead=1.0,
+        interval=0.1,
+        use_rate_limiter=True,
+        rate_limiter=LuaSlidingWindowRateLimiter,
+        rate_for_minute=1,
+    )
+    for _ in range(3):
+        await perform_request(1)
+
+    for _ in range(2):
+        await warmer.warm_once()
+        while warmer.refresh_scheduler.in_flight:
+            await asyncio.sleep(0.01)
+
+    assert perform_request.call_count == 2
+    assert (warmer.warmed, warmer.skipped) == (1, 1)
+
+
+async def test_background_task(redis_connection, clean_redis):
+    tracker = HotKeyTracker()
+    perform_request, cache_service = build_request(redis_connection, tracker, MetricsRegistry(), px=300)
+    warmer = CacheWarmer(tracker, cache_service, redis_connection, warm_ahead=0.5, interval=0.05)
+    for _ in range(3):
+        await perform_request(1)
+
+    warmer.start()
+    await asyncio.sleep(0.5)
+    await warmer.stop()
+
+    # ключ не истекал, пользователь все время получал кэш
+    assert await redis_connection.exists(CACHE_KEY)
+    assert warmer.warmed >= 1
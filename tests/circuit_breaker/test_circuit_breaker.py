@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+from tenacity import stop_after_attempt
+
+from src.cache_invalidator_strategy import BackgroundUpdater, TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.cache_manager.envelope import CacheEnvelope
+from src.cache_manager.local_cache import LocalCache
+from src.circuit_breaker.circuit_breaker import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker
+from src.exceptions.exceptions import CircuitOpenError
+from src.metrics.metrics import MetricsRegistry, request_metrics
+from src.rate_imiter.rate_limiter import RateLimitException
+
+
+class UpstreamError(Exception):
+    pass
+
+
+async def fail():
+    raise UpstreamError
+
+
+async def succeed():
+    return 'data'
+
+
+async def trip(breaker: CircuitBreaker, calls: int) -> None:
+    for _ in range(calls):
+        with pytest.raises(UpstreamError):
+            await breaker.call(fail)
+
+
+async def test_opens_on_failure_rate_and_fails_fast():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, window_size=4, minimum_calls=4)
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+
+    await breaker.call(succeed)
+    await breaker.call(succeed)
+    await trip(breaker, 1)
+    assert breaker.state == CIRCUIT_CLOSED
+
+    await trip(breaker, 1)
+    assert breaker.state == CIRCUIT_OPEN and breaker.is_open
+
+    called = False
+
+    async def perform_request():
+        nonlocal called
+        called = True
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(perform_request)
+    assert not called
+    assert breaker.rejected == metrics.circuit_rejections == 1
+
+
+async def test_opens_on_slow_calls():
+    breaker = CircuitBreaker(slow_call_duration=0.01, slow_call_rate_threshold=1.0, window_size=2, minimum_calls=2)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+
+    await breaker.call(slow)
+    assert breaker.state == CIRCUIT_CLOSED
+    await breaker.call(slow)
+    assert breaker.state == CIRCUIT_OPEN
+
+
+async def test_excluded_exceptions_are_not_counted():
+    breaker = CircuitBreaker(window_size=1, minimum_calls=1)
+
+    async def rate_limited():
+        raise RateLimitException
+
+    with pytest.raises(RateLimitException):
+        await breaker.call(rate_limited)
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+async def test_half_open_probes():
+    breaker = CircuitBreaker(window_size=1, minimum_calls=1, open_timeout=0.05, half_open_probes=1)
+    await trip(breaker, 1)
+    await asyncio.sleep(0.06)
+
+    probe_started = asyncio.Event()
+    release_probe = asyncio.Event()
+
+    async def probe():
+        probe_started.set()
+        await release_probe.wait()
+        return 'data'
+
+    probe_task = asyncio.ensure_future(breaker.call(probe))
+    await probe_started.wait()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+
+    # пока выполняется пробный вызов, остальные отклоняются
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+
+    release_probe.set()
+    assert await probe_task == 'data'
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+async def test_failed_probe_reopens():
+    breaker = CircuitBreaker(window_size=1, minimum_calls=1, open_timeout=0.05)
+    await trip(breaker, 1)
+    await asyncio.sleep(0.06)
+
+    await trip(breaker, 1)
+
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.opened == 2
+
+
+async def test_open_state_is_shared_through_redis(redis_connection, clean_redis):
+    first = CircuitBreaker('simi', window_size=1, minimum_calls=1, redis_connection=redis_connection)
+    second = CircuitBreaker('simi', window_size=1, minimum_calls=1, redis_connection=redis_connection, sync_interval=0)
+
+    assert await second.call(succeed) == 'data'
+    await trip(first, 1)
+
+    with pytest.raises(CircuitOpenError):
+        await second.call(succeed)
+    assert 0 < await redis_connection.pttl('circuit_breaker:simi') <= 30000
+
+
+async def test_executor_fails_fast_without_retries(redis_connection, clean_redis):
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        raise UpstreamError
+
+    breaker = CircuitBreaker(window_size=1, minimum_calls=1)
+    strategy = TTLInvalidator(
+        BaseCacheControlService(redis_connection=redis_connection),
+        use_retry=True,
+        circuit_breaker=breaker,
+        stop=stop_after_attempt(3),
+        reraise=True,
+    )
+
+    with pytest.raises(UpstreamError):
+        await strategy.get_data(perform_request, cache_key='key')
+    assert call_count == 3
+
+    with pytest.raises(CircuitOpenError):
+        await strategy.get_data(perform_request, cache_key='key')
+    assert call_count == 3
+
+
+async def test_ttl_strategy_serves_last_known_value(redis_connection, clean_redis):
+    upstream_available = True
+
+    async def perform_request():
+        if not upstream_available:
+            raise UpstreamError
+        return 'data'
+
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    strategy = TTLInvalidator(
+        BaseCacheControlService(redis_connection=redis_connection),
+        circuit_breaker=CircuitBreaker(window_size=1, minimum_calls=1),
+        stale_cache=LocalCache(),
+    )
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data'
+    await redis_connection.delete('key')
+    upstream_available = False
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data'
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data'
+    assert metrics.stale_fallbacks == 2
+
+    with pytest.raises(CircuitOpenError):
+        await strategy.get_data(perform_request, cache_key='other_key')
+
+
+async def test_background_updater_serves_expired_value(redis_connection, clean_redis):
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        raise UpstreamError
+
+    strategy = BackgroundUpdater(
+        BaseCacheControlService(redis_connection=redis_connection),
+        redis_connection,
+        soft_ttl=0.3,
+        hard_ttl=0.6,
+        circuit_breaker=CircuitBreaker(window_size=1, minimum_calls=1),
+        serve_stale_on_failure=True,
+    )
+    await redis_connection.set('key', CacheEnvelope('expired_data', soft_ttl=0.3, hard_ttl=0.6, written_at=0).dumps())
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'expired_data'
+    assert await strategy.get_data(perform_request, cache_key='key') == 'expired_data'
+    assert call_count == 1
+
+
+async def test_background_updater_skips_refresh_while_open(redis_connection, clean_redis):
+    breaker = CircuitBreaker(window_size=1, minimum_calls=1)
+    await trip(breaker, 1)
+    strategy = BackgroundUpdater(
+        BaseCacheControlService(redis_connection=redis_connection),
+        redis_connection,
+        circuit_breaker=breaker,
+    )
+    await redis_connection.set('key', 'legacy_data')
+
+    assert await strategy.get_data(succeed, cache_key='key') == 'legacy_data'
+
+    assert strategy.refresh_scheduler.in_flight == 0
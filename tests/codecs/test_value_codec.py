@@ -0,0 +1,96 @@
+import pytest
+
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.cache_manager.codecs import (
+    JsonCodec,
+    LzmaCompressor,
+    PickleCodec,
+    RawCodec,
+    StrCodec,
+    ValueCodec,
+    ZlibCompressor,
+)
+from src.cache_manager.envelope import CacheEnvelope
+from src.exceptions.exceptions import InvalidCacheError
+
+DOCUMENT = {'patient_id': 1, 'html': '<html>' + 'документ ' * 500 + '</html>'}
+
+
+@pytest.mark.parametrize(
+    'codec,value',
+    [
+        [JsonCodec(), DOCUMENT],
+        [PickleCodec(), {'ids': (1, 2), 'data': b'\x00\xff'}],
+        [RawCodec(), b'\x00\xf5binary'],
+        [StrCodec(), '<xml>документ</xml>'],
+    ],
+)
+@pytest.mark.parametrize('compressor', [None, ZlibCompressor(), LzmaCompressor()])
+def test_round_trip(codec, value, compressor):
+    value_codec = ValueCodec(codec, compressor=compressor, compress_threshold=0)
+
+    assert value_codec.decode(value_codec.encode(value)) == value
+
+
+def test_only_values_above_threshold_are_compressed():
+    value_codec = ValueCodec(compressor=ZlibCompressor(), compress_threshold=100)
+
+    assert value_codec.encode('short')[:1] == b'\xf5'
+    assert value_codec.encode(DOCUMENT)[:1] == b'\xf6'
+    assert value_codec.compression_ratio > 1
+    assert value_codec.encoded == 2
+    assert value_codec.avg_encode_time > 0
+
+
+def test_values_written_with_other_compressor_are_decoded():
+    written = ValueCodec(compressor=LzmaCompressor(), compress_threshold=0).encode(DOCUMENT)
+
+    assert ValueCodec(compressor=ZlibCompressor()).decode(written) == DOCUMENT
+    assert ValueCodec().decode(written) == DOCUMENT
+
+
+def test_corrupted_value_raises_invalid_cache_error():
+    with pytest.raises(InvalidCacheError):
+        ValueCodec().decode(b'\xf6not zlib')
+
+
+@pytest.mark.parametrize('codec', [JsonCodec(), PickleCodec()])
+async def test_unserializable_value_raises_invalid_cache_error(codec, binary_redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(binary_redis_connection, value_codec=ValueCodec(codec))
+
+    with pytest.raises(InvalidCacheError):
+        await cache_service.set_cache('key', {'callback': lambda: None})
+    assert await binary_redis_connection.get('key') is None
+
+
+async def test_cache_service_stores_compressed_values(binary_redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(
+        binary_redis_connection, value_codec=ValueCodec(compressor=ZlibCompressor(), compress_threshold=256)
+    )
+
+    await cache_service.set_cache('key', DOCUMENT)
+
+    assert await cache_service.get_cache('key') == DOCUMENT
+    assert await binary_redis_connection.strlen('key') < len(DOCUMENT['html'])
+    assert cache_service.value_codec.decoded == 1
+
+
+async def test_cache_service_reads_legacy_values(binary_redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(binary_redis_connection, value_codec=ValueCodec())
+    await binary_redis_connection.set('key', '<xml>документ</xml>')
+
+    assert await cache_service.get_cache('key') == '<xml>документ</xml>'
+    assert await cache_service.get_cache('missing_key') is None
+
+
+async def test_cache_service_encodes_envelope_value(binary_redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(
+        binary_redis_connection, value_codec=ValueCodec(compressor=ZlibCompressor(), compress_threshold=0)
+    )
+
+    await cache_service.set_cache('key', CacheEnvelope(DOCUMENT, soft_ttl=10))
+    cache = await cache_service.get_cache('key')
+
+    assert isinstance(cache, CacheEnvelope)
+    assert cache.value == DOCUMENT
+    assert cache.soft_ttl == 10
@@ -16,3 +16,12 @@ async def redis_connection():
 async def clean_redis(redis_connection):
     yield
     await redis_connection.flushdb()
+
+
+@pytest.fixture
+async def binary_redis_connection():
+    pool = aioredis.ConnectionPool.from_url("redis://localhost:6379", decode_responses=False, db=1)
+
+    yield Redis(connection_pool=pool)
+
+    await pool.disconnect()
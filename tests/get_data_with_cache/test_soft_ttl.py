@@ -0,0 +1,83 @@
+import asyncio
+
+from src.cache_invalidator_strategy.backround_update import BackgroundUpdater
+from src.cache_manager.cache_manager import CacheControlService
+from src.cache_manager.envelope import CacheEnvelope
+
+
+def test_envelope_round_trip():
+    envelope = CacheEnvelope('integrator:data', soft_ttl=1.5, hard_ttl=10, written_at=100.0)
+
+    restored = CacheEnvelope.loads(envelope.dumps())
+
+    assert restored.value == 'integrator:data'
+    assert (restored.soft_ttl, restored.hard_ttl, restored.written_at) == (1.5, 10, 100.0)
+    assert restored.is_stale(now=101.5)
+    assert not restored.is_expired(now=109.9)
+    assert restored.is_expired(now=110)
+
+
+def test_raw_values_are_returned_as_is():
+    assert CacheEnvelope.loads('legacy_data') == 'legacy_data'
+    assert CacheEnvelope.loads(b'legacy_data') == b'legacy_data'
+    assert CacheEnvelope.loads(None) is None
+    assert CacheEnvelope.loads(CacheEnvelope(b'data', soft_ttl=1).dumps()).value == b'data'
+
+
+def build_strategy(redis_connection):
+    return BackgroundUpdater(
+        cache_service=CacheControlService(redis_connection, cache_validators=[lambda data: data != 'invalid']),
+        redis_connection=redis_connection,
+        soft_ttl=0.3,
+        hard_ttl=0.6,
+    )
+
+
+async def test_refresh_only_after_soft_ttl(redis_connection, clean_redis):
+    strategy = build_strategy(redis_connection)
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return f'data_{call_count}'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data_1'
+    await asyncio.sleep(0.1)
+
+    for _ in range(5):
+        assert await strategy.get_data(perform_request, cache_key='key') == 'data_1'
+    await asyncio.sleep(0.1)
+    assert call_count == 1
+
+    await asyncio.sleep(0.2)
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data_1'
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data_1'
+    await asyncio.sleep(0.1)
+
+    assert call_count == 2
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data_2'
+
+
+async def test_value_past_hard_ttl_is_a_miss(redis_connection, clean_redis):
+    strategy = build_strategy(redis_connection)
+    await redis_connection.set('key', CacheEnvelope('expired_data', soft_ttl=0.3, hard_ttl=0.6, written_at=0).dumps())
+
+    async def perform_request():
+        return 'fresh_data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'fresh_data'
+
+
+async def test_legacy_value_is_served_and_revalidated(redis_connection, clean_redis):
+    strategy = build_strategy(redis_connection)
+    await redis_connection.set('key', 'legacy_data')
+
+    async def perform_request():
+        return 'fresh_data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'legacy_data'
+    await asyncio.sleep(0.1)
+
+    assert isinstance(CacheEnvelope.loads(await redis_connection.get('key')), CacheEnvelope)
+    assert await strategy.get_data(perform_request, cache_key='key') == 'fresh_data'
@@ -0,0 +1,73 @@
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.hot_keys.hot_keys import CountMinSketch, HotKeyTracker
+from src.metrics.metrics import MetricsRegistry
+
+
+def noop():
+    return None
+
+
+def test_sketch_never_underestimates():
+    sketch = CountMinSketch(width=64, depth=4)
+    for i in range(200):
+        for _ in range(i % 7 + 1):
+            sketch.add(f'key_{i}')
+
+    assert all(sketch.estimate(f'key_{i}') >= i % 7 + 1 for i in range(200))
+
+
+def test_sketch_halve():
+    sketch = CountMinSketch()
+    for _ in range(5):
+        sketch.add('key')
+
+    sketch.halve()
+
+    assert sketch.estimate('key') == 2
+
+
+def test_tracker_keeps_most_frequent_keys():
+    tracker = HotKeyTracker(top_k=3)
+    for i in range(1000):
+        tracker.record(f'cold_{i}', noop)
+        tracker.record(f'hot_{i % 3}', noop)
+
+    assert len(tracker) == 3
+    assert {cache_key for cache_key, _ in tracker.hot_keys()} == {'hot_0', 'hot_1', 'hot_2'}
+    assert tracker.get_call('cold_999') is None
+    assert tracker.get_call('hot_0')[0] is noop
+
+
+def test_tracker_decay():
+    tracker = HotKeyTracker(top_k=2, decay_interval=10)
+    for _ in range(9):
+        tracker.record('old', noop)
+
+    tracker.record('new', noop)
+
+    assert dict(tracker.hot_keys()) == {'old': 4, 'new': 1}
+
+
+async def test_request_manager_records_calls(redis_connection, clean_redis):
+    tracker = HotKeyTracker()
+    registry = MetricsRegistry()
+
+    @RequestManager(
+        cache_strategy=TTLInvalidator(cache_service=BaseCacheControlService(redis_connection=redis_connection)),
+        service_name='lk_simi',
+        hot_key_tracker=tracker,
+        metrics_registry=registry,
+    )
+    async def perform_request(patient_id):
+        return f'data_{patient_id}'
+
+    await perform_request(1)
+    await perform_request(1)
+    await perform_request(2)
+
+    assert tracker.hot_keys() == [('lk_simi:patient_id=1', 2), ('lk_simi:patient_id=2', 1)]
+    call, metrics = tracker.get_call('lk_simi:patient_id=1')
+    assert await call() == 'data_1'
+    assert metrics is registry.get('lk_simi')
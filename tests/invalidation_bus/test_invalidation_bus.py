@@ -0,0 +1,119 @@
+import asyncio
+
+import aioredis
+import pytest
+
+from src.cache_manager.cache_manager import BaseCacheControlService, TwoTierCacheService
+from src.cache_manager.invalidation_bus import InvalidationBus
+
+
+@pytest.fixture
+async def nodes(redis_connection, clean_redis):
+    buses = [InvalidationBus(redis_connection, reconnect_interval=0.05) for _ in range(2)]
+    services = [
+        TwoTierCacheService(BaseCacheControlService(redis_connection, ex=60), local_ttl=60, invalidation_bus=bus)
+        for bus in buses
+    ]
+    for bus in buses:
+        await bus.wait_subscribed()
+
+    yield services
+
+    for bus in buses:
+        await bus.stop()
+
+
+async def wait_for(predicate, timeout=1.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('condition was not met')
+
+
+async def test_set_on_other_node_evicts_local_entry(nodes):
+    first_node, second_node = nodes
+    await first_node.set_cache('key', 'old_data')
+    assert await second_node.get_cache('key') == 'old_data'
+
+    await first_node.set_cache('key', 'new_data')
+    await wait_for(lambda: 'key' not in second_node.local_cache)
+
+    assert await second_node.get_cache('key') == 'new_data'
+    assert first_node.local_cache.get('key') == 'new_data'
+
+
+async def test_keys_are_published_in_one_message(nodes):
+    first_node, second_node = nodes
+    for key in ('first', 'second', 'third'):
+        second_node.local_cache.set(key, 'data')
+
+    for key in ('first', 'second', 'third'):
+        first_node.invalidation_bus.publish(key)
+    await wait_for(lambda: len(second_node.local_cache) == 0)
+
+    assert first_node.invalidation_bus.published == 1
+    assert second_node.invalidation_bus.received == 1
+
+
+async def test_delete_on_other_node_evicts_local_entry(nodes):
+    first_node, second_node = nodes
+    await first_node.set_cache('key', 'data')
+    assert await second_node.get_cache('key') == 'data'
+
+    await first_node.delete_cache('key')
+    await wait_for(lambda: 'key' not in second_node.local_cache)
+
+    assert await second_node.get_cache('key') is None
+
+
+async def test_local_cache_is_cleared_on_reconnect(nodes, redis_connection):
+    first_node, second_node = nodes
+    second_node.local_cache.set('key', 'data')
+
+    await redis_connection.execute_command('CLIENT', 'KILL', 'TYPE', 'pubsub')
+    await wait_for(lambda: second_node.invalidation_bus.reconnects > 0)
+    assert 'key' not in second_node.local_cache
+
+    await second_node.invalidation_bus.wait_subscribed()
+    second_node.local_cache.set('key', 'data')
+    await first_node.set_cache('key', 'new_data')
+    await wait_for(lambda: 'key' not in second_node.local_cache)
+
+
+async def test_write_without_local_cache_evicts_local_entry(nodes, redis_connection):
+    _, second_node = nodes
+    bus = InvalidationBus(redis_connection)
+    writer = BaseCacheControlService(redis_connection, ex=60, invalidation_bus=bus)
+    await second_node.set_cache('key', 'old_data')
+
+    await writer.set_cache('key', 'new_data')
+    await wait_for(lambda: 'key' not in second_node.local_cache)
+
+    assert await second_node.get_cache('key') == 'new_data'
+    await bus.stop()
+
+
+def test_bus_created_outside_event_loop():
+    bus = InvalidationBus(aioredis.Redis.from_url('redis://localhost:6379', db=1))
+
+    async def subscribe():
+        await asyncio.wait_for(bus.wait_subscribed(), timeout=1)
+        await bus.stop()
+
+    asyncio.run(subscribe())
+
+
+@pytest.mark.parametrize('payload', ['not json', '{"node_id": 1}', '[1, 2, 3]', '["node", [[1]]]'])
+async def test_malformed_message_clears_local_cache_and_keeps_listening(nodes, redis_connection, payload):
+    first_node, second_node = nodes
+    second_node.local_cache.set('key', 'data')
+
+    await redis_connection.publish(second_node.invalidation_bus.channel, payload)
+    await wait_for(lambda: second_node.invalidation_bus.malformed == 1)
+    assert 'key' not in second_node.local_cache
+
+    await first_node.set_cache('key', 'old_data')
+    assert await second_node.get_cache('key') == 'old_data'
+    await first_node.set_cache('key', 'new_data')
+    await wait_for(lambda: 'key' not in second_node.local_cache)
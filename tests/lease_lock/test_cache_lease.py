@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from main import RequestManager
+from src.cache_invalidator_strategy import BackgroundUpdater, TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.exceptions.exceptions import LeaseWaitTimeoutError
+from src.lease_lock.lease_lock import LEASE_FALLBACK_RAISE, CacheLease
+
+
+async def test_lease_allows_single_owner(redis_connection, clean_redis):
+    cache_lease = CacheLease(redis_connection, lease_ttl=1)
+
+    first_token = await cache_lease.acquire('key')
+    assert first_token is not None
+    assert await cache_lease.acquire('key') is None
+
+    await cache_lease.release('key', first_token)
+    second_token = await cache_lease.acquire('key')
+    assert second_token is not None and second_token > first_token
+    assert not await cache_lease.is_owner('key', first_token)
+
+
+async def test_only_lease_owner_calls_upstream(redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(redis_connection, ex=10)
+    call_count = 0
+
+    async def perform_request(arg):
+        nonlocal call_count
+        call_count += 1
+        await asyncio.sleep(0.1)
+        return arg
+
+    # отдельные менеджеры эмулируют разные процессы
+    managers = [
+        RequestManager(
+            service_name='test_service',
+            cache_strategy=TTLInvalidator(
+                cache_service=cache_service,
+                cache_lease=CacheLease(redis_connection, wait_timeout=1, poll_interval=0.01),
+            ),
+        )(perform_request)
+        for _ in range(5)
+    ]
+
+    results = await asyncio.gather(*[manager('integrator_data') for manager in managers])
+
+    assert results == ['integrator_data'] * 5
+    assert call_count == 1
+
+
+async def test_waiter_raises_when_cache_is_not_filled_in_time(redis_connection, clean_redis):
+    cache_lease = CacheLease(redis_connection, wait_timeout=0.05, poll_interval=0.01, fallback=LEASE_FALLBACK_RAISE)
+    token = await cache_lease.acquire('key')
+
+    async def perform_request():
+        return 'data'
+
+    async def read():
+        return None
+
+    with pytest.raises(LeaseWaitTimeoutError):
+        await cache_lease.fill('key', fetch=perform_request, store=read, read=read)
+
+    await cache_lease.release('key', token)
+
+
+async def test_background_refresh_is_skipped_without_lease(redis_connection, clean_redis):
+    cache_lease = CacheLease(redis_connection)
+    strategy = BackgroundUpdater(
+        cache_service=BaseCacheControlService(redis_connection),
+        redis_connection=redis_connection,
+        cache_lease=cache_lease,
+    )
+    await redis_connection.set('key', 'stale_data')
+    token = await cache_lease.acquire('key')
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return 'fresh_data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'stale_data'
+    await asyncio.sleep(0.5)
+
+    assert call_count == 0
+    await cache_lease.release('key', token)
+
+
+async def test_owner_that_lost_lease_does_not_overwrite_cache(redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(redis_connection, ex=10)
+    cache_lease = CacheLease(redis_connection, lease_ttl=1)
+
+    async def perform_request():
+        # аренда истекла во время запроса, кэш заполнил новый владелец
+        await redis_connection.delete('key:lease')
+        new_token = await cache_lease.acquire('key')
+        await cache_service.set_cache('key', 'fresh_data', guard=('key:lease', new_token))
+        return 'old_data'
+
+    async def store(result, guard=None):
+        await cache_service.set_cache('key', result, guard=guard)
+
+    async def read():
+        return await cache_service.get_cache('key')
+
+    assert await cache_lease.fill('key', fetch=perform_request, store=store, read=read) == 'old_data'
+
+    assert await redis_connection.get('key') == 'fresh_data'
+    assert 0 < await redis_connection.ttl('key') <= 10
@@ -0,0 +1,90 @@
+from collections import Counter
+
+import pytest
+
+from benchmarks.load_test import Scenario, compare, run_scenario
+from benchmarks.workload import FakeUpstream, UpstreamError, ZipfKeys, percentile
+
+
+def test_zipf_keys_are_reproducible_and_skewed():
+    first = ZipfKeys(100, exponent=1.2, seed=1)
+    second = ZipfKeys(100, exponent=1.2, seed=1)
+
+    sequence = [first() for _ in range(5000)]
+    counts = Counter(sequence)
+
+    assert sequence == [second() for _ in range(5000)]
+    assert all(0 <= key < 100 for key in sequence)
+    assert counts[0] > counts[1] > counts[10]
+
+
+def test_zipf_zero_exponent_is_uniform():
+    keys = ZipfKeys(4, exponent=0, seed=1)
+    counts = Counter(keys() for _ in range(8000))
+
+    assert all(1700 < count < 2300 for count in counts.values())
+
+
+async def test_fake_upstream_errors():
+    upstream = FakeUpstream(latency=0, error_rate=1.0, seed=1)
+
+    with pytest.raises(UpstreamError):
+        await upstream(1)
+
+    assert upstream.calls == upstream.errors == 1
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 1001)]
+
+    assert percentile(values, 50) == 500
+    assert percentile(values, 99) == 990
+    assert percentile(values, 99.9) == 999
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_reports_regressions():
+    baseline = [{'scenario': 'ttl/none', 'throughput': 1000, 'latency_p99': 0.010, 'redis_ops_per_request': 1.0}]
+    results = [{'scenario': 'ttl/none', 'throughput': 850, 'latency_p99': 0.0105, 'redis_ops_per_request': 2.0}]
+
+    regressions = compare(results, baseline, tolerance=0.1)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith('ttl/none: throughput')
+    assert regressions[1].startswith('ttl/none: redis_ops_per_request')
+    assert compare(results, [], tolerance=0.1) == []
+
+
+def test_rate_limiter_requires_background_strategy():
+    with pytest.raises(ValueError):
+        Scenario(strategy='ttl', rate_limiter='gcra')
+
+
+@pytest.mark.parametrize(
+    'strategy,rate_limiter',
+    [['ttl', 'none'], ['xfetch', 'none'], ['background', 'none'], ['background', 'gcra']],
+)
+async def test_run_scenario(redis_connection, clean_redis, strategy, rate_limiter):
+    scenario = Scenario(
+        strategy=strategy,
+        rate_limiter=rate_limiter,
+        requests=200,
+        concurrency=10,
+        keys=20,
+        latency=0.001,
+        soft_ttl=60,
+        use_coalescing=True,
+    )
+
+    result = await run_scenario(redis_connection, scenario)
+
+    assert result['scenario'] == f'{strategy}/{rate_limiter}'
+    assert result['requests'] == 200
+    assert result['errors'] == 0
+    # ключ может запрашиваться повторно, пока фоновая задача не записала кэш
+    assert 0 < result['upstream_calls'] < 50
+    assert result['upstream_amplification'] == result['upstream_calls'] / 200
+    # ожидающие объединенного запроса стратегию не вызывают
+    assert 0 < result['hits'] + result['misses'] + result['stale'] <= 200
+    assert result['redis_ops_per_request'] > 0
+    assert result['latency_p50'] <= result['latency_p99'] <= result['latency_p999']
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from tenacity import stop_after_attempt
+
+from main import RequestManager
+from src.cache_invalidator_strategy import BackgroundUpdater, TTLInvalidator
+from src.cache_invalidator_strategy.base import HelpUtilsMixin
+from src.cache_manager.cache_manager import BaseCacheControlService, CacheControlService
+from src.exceptions.exceptions import InvalidCacheError
+from src.metrics.metrics import Histogram, MetricsRegistry, request_metrics
+from src.rate_imiter.rate_limiter import RateLimitException, SlidingWindowRateLimiter
+
+
+def test_histogram_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (float('inf'), 4)]
+    assert histogram.sum == pytest.approx(5.65)
+    assert histogram.count == 4
+
+
+def test_prometheus_format():
+    registry = MetricsRegistry(buckets=(0.1,))
+    metrics = registry.get('lk_simi', integration='si"mi')
+    metrics.hits += 2
+    metrics.redis_latency.observe(0.05)
+
+    exported = registry.to_prometheus()
+
+    assert '# TYPE request_manager_hits_total counter' in exported
+    assert (
+        'request_manager_hits_total{service_name="lk_simi",integration="si\\"mi",integration_method=""} 2' in exported
+    )
+    assert (
+        'request_manager_redis_latency_seconds_bucket{service_name="lk_simi",integration="si\\"mi",'
+        'integration_method="",le="+Inf"} 1'
+    ) in exported
+    assert exported.endswith('\n')
+
+
+async def test_request_manager_records_cache_metrics(redis_connection, clean_redis):
+    registry = MetricsRegistry()
+
+    @RequestManager(
+        service_name='lk_simi',
+        integration='simi',
+        integration_method='getHtml',
+        cache_strategy=TTLInvalidator(
+            cache_service=CacheControlService(redis_connection, cache_validators=[lambda data: data != 'invalid']),
+        ),
+        metrics_registry=registry,
+    )
+    async def perform_request(data):
+        return data
+
+    await perform_request('data')
+    await perform_request('data')
+    await redis_connection.set('lk_simi:simi:getHtml:data=invalid', 'invalid')
+    with pytest.raises(InvalidCacheError):
+        await perform_request('invalid')
+
+    [snapshot] = registry.snapshot()
+    assert (snapshot['service_name'], snapshot['integration'], snapshot['integration_method']) == (
+        'lk_simi',
+        'simi',
+        'getHtml',
+    )
+    assert (snapshot['hits'], snapshot['misses'], snapshot['validator_rejections']) == (1, 1, 1)
+    assert snapshot['upstream_latency']['count'] == 1
+    assert snapshot['redis_latency']['count'] == 4
+
+
+async def test_stale_serves_are_counted(redis_connection, clean_redis):
+    registry = MetricsRegistry()
+
+    @RequestManager(
+        service_name='lk_simi',
+        cache_strategy=BackgroundUpdater(
+            cache_service=BaseCacheControlService(redis_connection), redis_connection=redis_connection
+        ),
+        metrics_registry=registry,
+    )
+    async def perform_request():
+        return 'data'
+
+    await perform_request()
+    await asyncio.sleep(0.05)
+    await perform_request()
+
+    metrics = registry.get('lk_simi')
+    assert (metrics.misses, metrics.stale, metrics.hits) == (1, 1, 0)
+
+
+async def test_rate_limit_rejections_and_retries_are_counted(redis_connection, clean_redis):
+    metrics = MetricsRegistry().get('lk_simi')
+    token = request_metrics.set(metrics)
+    try:
+        rate_limiter = SlidingWindowRateLimiter(redis_connection, cache_key='key', rate_for_second=1)
+        async with rate_limiter:
+            pass
+        with pytest.raises(RateLimitException):
+            async with rate_limiter:
+                pass
+
+        executor = HelpUtilsMixin().build_executor(
+            use_retry=True, use_rate_limiter=False, stop=stop_after_attempt(3), reraise=True
+        )
+
+        async def perform_request():
+            raise ConnectionError
+
+        with pytest.raises(ConnectionError):
+            await executor(perform_request)
+    finally:
+        request_metrics.reset(token)
+
+    assert metrics.rate_limited == 1
+    assert metrics.retries == 2
+    assert metrics.upstream_latency.count == 3
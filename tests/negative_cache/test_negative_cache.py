@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from src.cache_invalidator_strategy import BackgroundUpdater, TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService, CacheControlService
+from src.cache_manager.codecs import ValueCodec
+from src.cache_manager.envelope import MISSING, EmptyResult
+
+
+@pytest.mark.parametrize('value', [None, '', b'', [], (), {}, 0, 0.0, False])
+def test_empty_result_round_trip(value):
+    restored = EmptyResult.loads(EmptyResult(value).dumps())
+
+    assert isinstance(restored, EmptyResult)
+    assert restored.value == value
+    assert type(restored.value) is type(value)
+
+
+def test_missing_is_not_empty_result():
+    assert not MISSING
+    assert not EmptyResult.supports(MISSING)
+    assert not EmptyResult.supports('data')
+    assert EmptyResult.loads('data') == 'data'
+
+
+async def test_empty_result_is_cached_with_negative_ttl(redis_connection, clean_redis):
+    strategy = TTLInvalidator(
+        cache_service=CacheControlService(redis_connection, cache_filters=[bool], ex=60),
+        negative_cache_ttl=0.2,
+    )
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return []
+
+    assert await strategy.get_data(perform_request, cache_key='key') == []
+    assert await strategy.get_data(perform_request, cache_key='key') == []
+    assert call_count == 1
+    assert 0 < await redis_connection.pttl('key') <= 200
+
+    await asyncio.sleep(0.25)
+    assert await strategy.get_data(perform_request, cache_key='key') == []
+    assert call_count == 2
+
+
+async def test_empty_result_is_not_cached_by_default(redis_connection, clean_redis):
+    strategy = TTLInvalidator(cache_service=BaseCacheControlService(redis_connection, ex=60))
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return ''
+
+    assert await strategy.get_data(perform_request, cache_key='key') == ''
+    assert await strategy.get_data(perform_request, cache_key='key') == ''
+    assert call_count == 2
+
+
+async def test_background_updater_serves_empty_result_without_refresh(binary_redis_connection, clean_redis):
+    strategy = BackgroundUpdater(
+        cache_service=BaseCacheControlService(binary_redis_connection, value_codec=ValueCodec(), ex=60),
+        redis_connection=binary_redis_connection,
+        negative_cache_ttl=10,
+    )
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return None
+
+    assert await strategy.get_data(perform_request, cache_key='key') is None
+    await asyncio.sleep(0.05)
+    for _ in range(3):
+        assert await strategy.get_data(perform_request, cache_key='key') is None
+    await asyncio.sleep(0.05)
+
+    assert call_count == 1
+
+
+async def test_background_refresh_keeps_value_on_empty_result(redis_connection, clean_redis):
+    strategy = BackgroundUpdater(
+        cache_service=BaseCacheControlService(redis_connection, ex=60),
+        redis_connection=redis_connection,
+    )
+    results = ['doc', '']
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return results[call_count - 1]
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'doc'
+    await asyncio.sleep(0.05)
+    # без soft_ttl значение обновляется при каждом обращении, пустой ответ не перезаписывает кэш
+    assert await strategy.get_data(perform_request, cache_key='key') == 'doc'
+    await asyncio.sleep(0.05)
+
+    assert call_count == 2
+    assert await redis_connection.get('key') == 'doc'
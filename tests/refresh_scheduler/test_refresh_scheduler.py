@@ -0,0 +1,85 @@
+import asyncio
+
+from src.cache_invalidator_strategy import BackgroundUpdater
+from src.cache_invalidator_strategy.refresh_scheduler import OVERFLOW_DROP_OLDEST, RefreshScheduler
+from src.cache_manager.cache_manager import BaseCacheControlService
+
+
+def make_refresh(done: list, key: str, delay: float = 0.05):
+    async def refresh():
+        await asyncio.sleep(delay)
+        done.append(key)
+
+    return refresh
+
+
+async def test_refreshes_for_same_key_are_deduplicated():
+    scheduler = RefreshScheduler()
+    done = []
+
+    assert scheduler.schedule('key', make_refresh(done, 'key'))
+    assert not scheduler.schedule('key', make_refresh(done, 'key'))
+    await scheduler.shutdown()
+
+    assert done == ['key']
+    assert scheduler.deduplicated == 1
+
+
+async def test_concurrency_and_queue_are_bounded():
+    scheduler = RefreshScheduler(max_concurrency=1, max_queue_size=1)
+    done = []
+
+    assert scheduler.schedule('first', make_refresh(done, 'first'))
+    assert scheduler.schedule('second', make_refresh(done, 'second'))
+    assert not scheduler.schedule('third', make_refresh(done, 'third'))
+
+    assert scheduler.in_flight == 1
+    assert scheduler.queue_depth == 1
+    assert scheduler.dropped == 1
+
+    await scheduler.shutdown()
+    assert done == ['first', 'second']
+
+
+async def test_drop_oldest_policy_keeps_newest_refresh():
+    scheduler = RefreshScheduler(max_concurrency=1, max_queue_size=1, overflow_policy=OVERFLOW_DROP_OLDEST)
+    done = []
+
+    scheduler.schedule('first', make_refresh(done, 'first'))
+    scheduler.schedule('second', make_refresh(done, 'second'))
+    assert scheduler.schedule('third', make_refresh(done, 'third'))
+
+    await scheduler.shutdown()
+    assert done == ['first', 'third']
+    assert scheduler.dropped == 1
+
+
+async def test_shutdown_cancels_refreshes_after_timeout():
+    scheduler = RefreshScheduler(max_concurrency=1)
+    done = []
+
+    scheduler.schedule('slow', make_refresh(done, 'slow', delay=10))
+    scheduler.schedule('pending', make_refresh(done, 'pending'))
+    await scheduler.shutdown(timeout=0.05)
+
+    assert done == []
+    assert scheduler.in_flight == 0
+    assert not scheduler.schedule('late', make_refresh(done, 'late'))
+
+
+async def test_cache_fill_on_miss_bypasses_full_scheduler(redis_connection, clean_redis):
+    scheduler = RefreshScheduler(max_concurrency=1, max_queue_size=0)
+    strategy = BackgroundUpdater(
+        cache_service=BaseCacheControlService(redis_connection, ex=60),
+        redis_connection=redis_connection,
+        refresh_scheduler=scheduler,
+    )
+    done = []
+    scheduler.schedule('key', make_refresh(done, 'key'))
+
+    async def perform_request():
+        return 'data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data'
+    assert await redis_connection.get('key') == 'data'
+    await scheduler.shutdown()
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.request_coalescer.request_coalescer import RequestCoalescer
+
+
+async def test_concurrent_calls_share_one_upstream_call(redis_connection, clean_redis):
+    @RequestManager(
+        service_name='test_service',
+        cache_strategy=TTLInvalidator(cache_service=BaseCacheControlService(redis_connection, ex=10)),
+        use_coalescing=True,
+    )
+    async def perform_request(arg):
+        perform_request.call_count += 1
+        await asyncio.sleep(0.1)
+        return arg
+
+    TEST_DATA = 'integrator_data'
+    perform_request.call_count = 0
+
+    results = await asyncio.gather(*[perform_request(TEST_DATA) for _ in range(50)])
+
+    assert results == [TEST_DATA] * 50
+    assert perform_request.call_count == 1
+
+
+async def test_exception_propagates_to_every_caller():
+    coalescer = RequestCoalescer()
+    call_count = 0
+
+    async def failing_request():
+        nonlocal call_count
+        call_count += 1
+        await asyncio.sleep(0.05)
+        raise ValueError('upstream error')
+
+    results = await asyncio.gather(*[coalescer.run('key', failing_request) for _ in range(5)], return_exceptions=True)
+
+    assert call_count == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert coalescer.in_flight == 0
+
+
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    coalescer = RequestCoalescer()
+
+    async def slow_request():
+        await asyncio.sleep(0.1)
+        return 'data'
+
+    first = asyncio.ensure_future(coalescer.run('key', slow_request))
+    second = asyncio.ensure_future(coalescer.run('key', slow_request))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    assert await second == 'data'
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+from functools import partial
+from time import perf_counter
+
+import pytest
+
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_invalidator_strategy.base import HelpUtilsMixin
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.exceptions.exceptions import PoolSaturatedError
+from src.metrics.metrics import MetricsRegistry, request_metrics
+from src.rate_imiter.lua_rate_limiter import LuaSlidingWindowRateLimiter
+from src.request_hedger.request_hedger import RequestHedger
+from src.sync_pool.sync_pool import SyncCallPool
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def build_upstream(latencies, errors=()):
+    """
+    Интегратор, i-й запрос к которому длится latencies[i] секунд
+    """
+    calls = []
+
+    async def perform_request():
+        number = len(calls)
+        calls.append(number)
+        try:
+            await asyncio.sleep(latencies[number])
+        except asyncio.CancelledError:
+            calls[number] = 'cancelled'
+            raise
+        if number in errors:
+            raise UpstreamError(number)
+        return f'response:{number}'
+
+    return perform_request, calls
+
+
+async def test_slow_request_is_hedged():
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    hedger = RequestHedger(delay=0.02)
+    perform_request, calls = build_upstream([1.0, 0.01])
+
+    started_at = perf_counter()
+    assert await hedger.run(perform_request) == 'response:1'
+
+    assert perf_counter() - started_at < 0.5
+    await asyncio.sleep(0)
+    assert calls == ['cancelled', 1]
+    assert (hedger.hedged, hedger.hedge_wins) == (1, 1)
+    assert (metrics.hedges, metrics.hedge_wins) == (1, 1)
+
+
+async def test_fast_request_is_not_hedged():
+    hedger = RequestHedger(delay=0.05)
+    perform_request, calls = build_upstream([0.0])
+
+    assert await hedger.run(perform_request) == 'response:0'
+    assert calls == [0]
+    assert hedger.hedged == 0
+
+
+async def test_hedge_budget():
+    hedger = RequestHedger(delay=0.01, budget=0.0, max_burst=1)
+    perform_request, calls = build_upstream([0.05, 0.05, 0.05])
+
+    assert await hedger.run(perform_request) == 'response:0'
+    assert await hedger.run(perform_request) == 'response:2'
+
+    assert hedger.hedged == 1
+    assert len(calls) == 3
+
+
+async def test_failed_hedge_waits_for_primary():
+    hedger = RequestHedger(delay=0.01)
+    perform_request, _ = build_upstream([0.05, 0.0], errors={1})
+
+    assert await hedger.run(perform_request) == 'response:0'
+    assert hedger.hedge_wins == 0
+
+
+async def test_both_failed_raises_primary_error():
+    hedger = RequestHedger(delay=0.01)
+    perform_request, _ = build_upstream([0.05, 0.0], errors={0, 1})
+
+    with pytest.raises(UpstreamError) as exc_info:
+        await hedger.run(perform_request)
+    assert exc_info.value.args == (0,)
+
+
+def test_delay_is_learned_from_latencies():
+    hedger = RequestHedger(latency_percentile=90, window_size=100, min_samples=10)
+
+    for latency in range(1, 10):
+        hedger.observe(latency / 100)
+    assert hedger.current_delay is None
+
+    hedger.observe(0.1)
+    assert hedger.current_delay == pytest.approx(0.1)
+
+    for _ in range(100):
+        hedger.observe(0.01)
+    assert hedger.current_delay == pytest.approx(0.01)
+
+
+async def test_hedge_counts_against_rate_limiter(redis_connection, clean_redis):
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    hedger = RequestHedger(delay=0.01)
+    executor = HelpUtilsMixin().build_executor(
+        use_retry=False,
+        use_rate_limiter=True,
+        # ограничитель записывает запрос атомарно при проверке, поэтому видит еще не завершенный запрос
+        rate_limiter=LuaSlidingWindowRateLimiter,
+        redis_connection=redis_connection,
+        rate_for_second=1,
+        request_hedger=hedger,
+    )
+    perform_request, calls = build_upstream([0.05, 0.0])
+
+    assert await executor(partial(perform_request), 'key') == 'response:0'
+
+    assert hedger.hedged == 1
+    assert metrics.rate_limited == 1
+    assert calls == [0]
+
+
+async def test_ttl_strategy_with_hedging(redis_connection, clean_redis):
+    perform_request, calls = build_upstream([1.0, 0.0])
+    strategy = TTLInvalidator(
+        BaseCacheControlService(redis_connection=redis_connection),
+        request_hedger=RequestHedger(delay=0.01),
+    )
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'response:1'
+    assert await strategy.get_data(perform_request, cache_key='key') == 'response:1'
+    assert len(calls) == 2
+
+
+async def test_hedged_sync_function_does_not_leak_workers(redis_connection, clean_redis):
+    pool = SyncCallPool(max_workers=2, max_queue_size=0)
+    release = threading.Event()
+    calls = []
+
+    @RequestManager(
+        service_name='test_service',
+        cache_strategy=TTLInvalidator(
+            BaseCacheControlService(redis_connection=redis_connection), request_hedger=RequestHedger(delay=0.01)
+        ),
+        sync_pool=pool,
+    )
+    def perform_request(arg):
+        calls.append(arg)
+        if len(calls) == 1:
+            release.wait(1)
+        return f'response:{len(calls)}'
+
+    assert await perform_request('first') == 'response:2'
+    # отмененный первый запрос еще занимает поток, поэтому место в пуле не освобождено
+    assert pool.running == 1
+    blocked = asyncio.ensure_future(pool.run(release.wait, 1))
+    await asyncio.sleep(0.01)
+    with pytest.raises(PoolSaturatedError):
+        await pool.run(lambda: None)
+
+    release.set()
+    await blocked
+    for _ in range(100):
+        if pool.running == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert pool.running == 0
+    pool.shutdown()
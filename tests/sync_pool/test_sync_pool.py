@@ -0,0 +1,173 @@
+import asyncio
+import os
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from main import RequestManager
+from src.cache_invalidator_strategy import TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.exceptions.exceptions import PoolSaturatedError
+from src.metrics.metrics import MetricsRegistry, request_metrics
+from src.sync_pool.sync_pool import SyncCallPool, is_coroutine_callable
+
+
+def parse_document(document_id):
+    return f'{document_id}:{os.getpid()}'
+
+
+def build_manager(redis_connection, sync_pool, **kwargs):
+    return RequestManager(
+        service_name='test',
+        cache_strategy=TTLInvalidator(BaseCacheControlService(redis_connection=redis_connection)),
+        sync_pool=sync_pool,
+        **kwargs,
+    )
+
+
+def test_is_coroutine_callable():
+    async def perform_request(data):
+        pass
+
+    class Client:
+        async def __call__(self):
+            pass
+
+    assert is_coroutine_callable(perform_request)
+    assert is_coroutine_callable(partial(perform_request, 'data'))
+    assert is_coroutine_callable(Client())
+    assert not is_coroutine_callable(parse_document)
+
+
+async def test_sync_function_runs_in_thread_and_is_cached(redis_connection, clean_redis):
+    call_threads = []
+
+    @build_manager(redis_connection, SyncCallPool(max_workers=2))
+    def perform_request(data):
+        call_threads.append(threading.get_ident())
+        time.sleep(0.05)
+        return f'integrator:{data}'
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticker_task = asyncio.ensure_future(ticker())
+    assert await perform_request('data') == 'integrator:data'
+    ticker_task.cancel()
+
+    assert await perform_request('data') == 'integrator:data'
+    assert call_threads != [threading.get_ident()] and len(call_threads) == 1
+    # event loop не блокировался на время вызова
+    assert ticks > 3
+
+
+async def test_plain_wrapper_returning_coroutine_is_awaited(redis_connection, clean_redis):
+    call_count = 0
+
+    async def perform_request(data):
+        nonlocal call_count
+        call_count += 1
+        return f'{data}-{call_count}'
+
+    @build_manager(redis_connection, SyncCallPool(max_workers=1))
+    def wrapper(data):
+        return perform_request(data)
+
+    assert await wrapper('data') == 'data-1'
+    assert await wrapper('data') == 'data-1'
+    assert call_count == 1
+
+
+async def test_sync_function_with_coalescing(redis_connection, clean_redis):
+    call_count = 0
+
+    @build_manager(redis_connection, SyncCallPool(max_workers=4), use_coalescing=True)
+    def perform_request(data):
+        nonlocal call_count
+        call_count += 1
+        time.sleep(0.05)
+        return f'integrator:{data}'
+
+    results = await asyncio.gather(*(perform_request('data') for _ in range(5)))
+
+    assert results == ['integrator:data'] * 5
+    assert call_count == 1
+
+
+async def test_pool_bounds_and_metrics():
+    pool = SyncCallPool(max_workers=1, max_queue_size=1)
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    release = threading.Event()
+
+    first = asyncio.ensure_future(pool.run(release.wait, 1))
+    second = asyncio.ensure_future(pool.run(lambda: 'second'))
+    await asyncio.sleep(0.01)
+    assert (pool.running, pool.queue_depth) == (1, 1)
+
+    with pytest.raises(PoolSaturatedError):
+        await pool.run(lambda: 'third')
+    assert metrics.pool_rejections == pool.rejected == 1
+
+    release.set()
+    assert await first is True
+    assert await second == 'second'
+    assert (pool.running, pool.queue_depth) == (0, 0)
+    assert metrics.pool_wait.count == 2
+    pool.shutdown()
+
+
+async def test_cancelled_waiter_frees_queue():
+    pool = SyncCallPool(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    first = asyncio.ensure_future(pool.run(release.wait, 1))
+    second = asyncio.ensure_future(pool.run(lambda: 'second'))
+    await asyncio.sleep(0.01)
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+
+    assert pool.queue_depth == 0
+    release.set()
+    await first
+    assert await pool.run(lambda: 'third') == 'third'
+    pool.shutdown()
+
+
+async def test_cancelled_call_keeps_worker_until_it_finishes():
+    pool = SyncCallPool(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    first = asyncio.ensure_future(pool.run(release.wait, 1))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+
+    # функция еще выполняется в потоке, следующий вызов ждет ее завершения
+    second = asyncio.ensure_future(pool.run(lambda: 'second'))
+    await asyncio.sleep(0.01)
+    assert (pool.running, pool.queue_depth) == (1, 1)
+
+    release.set()
+    assert await second == 'second'
+    assert (pool.running, pool.queue_depth) == (0, 0)
+    pool.shutdown()
+
+
+async def test_process_pool(redis_connection, clean_redis):
+    pool = SyncCallPool(max_workers=1, use_processes=True)
+    # функция должна оставаться доступной по имени для pickle, поэтому декорируется вызовом
+    get_document = build_manager(redis_connection, pool)(parse_document)
+
+    document_id, pid = (await get_document('document')).split(':')
+
+    assert document_id == 'document'
+    assert int(pid) != os.getpid()
+    pool.shutdown()
@@ -0,0 +1,132 @@
+import pytest
+
+from src.cache_invalidator_strategy import BackgroundUpdater
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.metrics.metrics import MetricsRegistry, request_metrics
+from src.rate_imiter.adaptive_rate_limiter import AdaptiveLimit, AdaptiveRateLimiter
+from src.rate_imiter.rate_limiter import RateLimitException
+
+
+class ThrottledError(Exception):
+    pass
+
+
+async def succeed():
+    return 'data'
+
+
+async def throttle():
+    raise ThrottledError
+
+
+async def admitted_calls(limiter, calls, cache_key='unique_key'):
+    admitted = 0
+    for _ in range(calls):
+        try:
+            await limiter.run(succeed, cache_key)
+        except RateLimitException:
+            continue
+        admitted += 1
+    return admitted
+
+
+async def test_throttling_decreases_limit_multiplicatively():
+    metrics = MetricsRegistry().get('test')
+    request_metrics.set(metrics)
+    adaptive_limit = AdaptiveLimit(throttling_exceptions=(ThrottledError,), adjust_interval=0, min_factor=0.2)
+
+    for expected_factor in (0.5, 0.25, 0.2, 0.2):
+        await adaptive_limit.observe(0.01, throttled=True)
+        assert adaptive_limit.factor == expected_factor
+
+    assert metrics.limit_decreases == 3
+
+
+async def test_decreases_at_most_once_per_interval():
+    adaptive_limit = AdaptiveLimit(adjust_interval=60)
+
+    for _ in range(5):
+        await adaptive_limit.observe(0.01, throttled=True)
+
+    assert adaptive_limit.factor == 0.5
+
+
+async def test_healthy_upstream_increases_limit_additively():
+    adaptive_limit = AdaptiveLimit(adjust_interval=0, increase_step=0.1, min_calls=1)
+    adaptive_limit.factor = 0.5
+
+    for _ in range(3):
+        await adaptive_limit.observe(0.01, throttled=False)
+
+    assert adaptive_limit.factor == pytest.approx(0.8)
+
+    for _ in range(5):
+        await adaptive_limit.observe(0.01, throttled=False)
+    assert adaptive_limit.factor == 1
+
+
+async def test_slow_upstream_decreases_limit():
+    adaptive_limit = AdaptiveLimit(target_latency=0.1, adjust_interval=0, min_calls=1)
+
+    await adaptive_limit.observe(0.01, throttled=False)
+    assert adaptive_limit.factor == 1
+
+    await adaptive_limit.observe(0.5, throttled=False)
+    assert adaptive_limit.factor == 0.5
+
+
+async def test_limiter_applies_effective_limit(redis_connection, clean_redis):
+    adaptive_limit = AdaptiveLimit(throttling_exceptions=(ThrottledError,), adjust_interval=0)
+    limiter = AdaptiveRateLimiter(redis_connection, adaptive_limit, rate_for_minute=10)
+
+    with pytest.raises(ThrottledError):
+        await limiter.run(throttle, 'unique_key')
+    assert adaptive_limit.factor == 0.5
+
+    assert await admitted_calls(limiter, 10) == 4
+
+
+async def test_limit_is_shared_between_processes(redis_connection, clean_redis):
+    first = AdaptiveLimit('simi', adjust_interval=0, redis_connection=redis_connection)
+    second = AdaptiveLimit('simi', adjust_interval=0, redis_connection=redis_connection)
+
+    await first.observe(0.01, throttled=True)
+    await second.observe(0.01, throttled=False)
+
+    assert first.factor == second.factor == 0.5
+    assert float(await redis_connection.hget('adaptive_limit:simi', 'factor')) == 0.5
+
+
+async def test_background_calls_back_off_first(redis_connection, clean_redis):
+    adaptive_limit = AdaptiveLimit(background_share=0.5)
+    background_limiter = AdaptiveRateLimiter(redis_connection, adaptive_limit, rate_for_minute=4, background=True)
+    limiter = AdaptiveRateLimiter(redis_connection, adaptive_limit, rate_for_minute=4)
+
+    assert await admitted_calls(background_limiter, 4) == 2
+    assert await admitted_calls(limiter, 4) == 2
+
+
+async def test_background_updater_refresh_is_limited_first(redis_connection, clean_redis):
+    call_count = 0
+
+    async def perform_request():
+        nonlocal call_count
+        call_count += 1
+        return 'data'
+
+    strategy = BackgroundUpdater(
+        BaseCacheControlService(redis_connection=redis_connection),
+        redis_connection,
+        use_rate_limiter=True,
+        rate_limiter=AdaptiveRateLimiter,
+        adaptive_limit=AdaptiveLimit(background_share=0.5),
+        rate_for_minute=2,
+    )
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data'
+    await strategy._update_cache(perform_request, 'key')
+    assert call_count == 1
+
+    # запрос пользователя по тому же ключу еще укладывается в лимит
+    assert await strategy.executor(perform_request, 'key') == 'data'
+    assert call_count == 2
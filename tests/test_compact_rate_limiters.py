@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from src.cache_invalidator_strategy.backround_update import BackgroundUpdater
+from src.cache_manager.cache_manager import BaseCacheControlService
+from src.rate_imiter.lua_rate_limiter import GCRARateLimiter, SlidingWindowCounterRateLimiter
+from src.rate_imiter.rate_limiter import RateLimitException
+
+RATE_LIMITERS = [SlidingWindowCounterRateLimiter, GCRARateLimiter]
+
+
+@pytest.mark.parametrize('rate_limiter', RATE_LIMITERS)
+async def test_general_flow(rate_limiter, redis_connection, clean_redis):
+    with pytest.raises(RateLimitException) as exc:
+        for _ in range(10):
+            async with rate_limiter(
+                redis_connection=redis_connection, cache_key='unique_key', rate_for_minute=60, rate_for_second=2
+            ):
+                pass
+    assert exc.value.args[0] == 'Limit exceeded, limit per second: 2 counted calls: 2'
+
+
+@pytest.mark.parametrize('rate_limiter', RATE_LIMITERS)
+async def test_limit_is_exact_under_concurrency(rate_limiter, redis_connection, clean_redis):
+    async def acquire():
+        async with rate_limiter(redis_connection=redis_connection, cache_key='unique_key', rate_for_minute=5):
+            pass
+
+    results = await asyncio.gather(*[acquire() for _ in range(20)], return_exceptions=True)
+
+    assert len([result for result in results if result is None]) == 5
+
+
+@pytest.mark.parametrize('rate_limiter', RATE_LIMITERS)
+async def test_memory_does_not_grow_with_requests(rate_limiter, redis_connection, clean_redis):
+    for _ in range(50):
+        async with rate_limiter(
+            redis_connection=redis_connection, cache_key='unique_key', rate_for_second=1000, rate_for_day=100000
+        ):
+            pass
+
+    _, keys = await redis_connection.scan(match='unique_key*')
+    assert len(keys) == 1
+    assert await redis_connection.hlen(keys[0]) <= 4
+
+
+async def test_background_updater_selects_rate_limiter(redis_connection, clean_redis):
+    strategy = BackgroundUpdater(
+        cache_service=BaseCacheControlService(redis_connection),
+        redis_connection=redis_connection,
+        use_rate_limiter=True,
+        rate_limiter=GCRARateLimiter,
+        rate_for_second=1,
+    )
+
+    async def perform_request():
+        return 'data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'data'
+    assert await redis_connection.exists('key:rate_limiter:gcra')
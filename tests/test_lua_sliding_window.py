@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from tenacity import stop_after_attempt
+
+from src.cache_invalidator_strategy.base import HelpUtilsMixin
+from src.rate_imiter.lua_rate_limiter import LuaSlidingWindowRateLimiter
+from src.rate_imiter.rate_limiter import RateLimitException
+
+
+async def test_general_flow_lua_sliding_window(redis_connection, clean_redis):
+    with pytest.raises(RateLimitException) as exc:
+        for _ in range(10):
+            async with LuaSlidingWindowRateLimiter(
+                redis_connection=redis_connection, cache_key='unique_key', rate_for_minute=60, rate_for_second=1
+            ):
+                pass
+    assert exc.value.args[0] == 'Limit exceeded, limit per second: 1 counted calls: 1'
+
+
+async def test_limit_is_exact_under_concurrency(redis_connection, clean_redis):
+    async def acquire():
+        async with LuaSlidingWindowRateLimiter(
+            redis_connection=redis_connection, cache_key='unique_key', rate_for_second=5
+        ):
+            pass
+
+    results = await asyncio.gather(*[acquire() for _ in range(20)], return_exceptions=True)
+
+    assert len([result for result in results if result is None]) == 5
+    assert all(isinstance(result, RateLimitException) for result in results if result is not None)
+
+
+async def test_script_is_reloaded_after_flush(redis_connection, clean_redis):
+    await redis_connection.script_flush()
+
+    async with LuaSlidingWindowRateLimiter(
+        redis_connection=redis_connection, cache_key='unique_key', rate_for_second=2
+    ):
+        pass
+    async with LuaSlidingWindowRateLimiter(
+        redis_connection=redis_connection, cache_key='unique_key', rate_for_second=2
+    ):
+        pass
+
+    assert await redis_connection.zcard('unique_key:rate_limiter:lua') == 2
+
+
+async def test_executor_uses_selected_rate_limiter(redis_connection, clean_redis):
+    executor = HelpUtilsMixin().build_executor(
+        use_retry=False,
+        use_rate_limiter=True,
+        rate_limiter=LuaSlidingWindowRateLimiter,
+        redis_connection=redis_connection,
+        cache_key='unique_key',
+        rate_for_second=1,
+    )
+
+    async def perform_request():
+        return 'data'
+
+    assert await executor(perform_request) == 'data'
+    with pytest.raises(RateLimitException):
+        await executor(perform_request)
+
+
+async def test_executor_takes_rate_limiter_key_per_call(redis_connection, clean_redis):
+    executor = HelpUtilsMixin().build_executor(
+        use_retry=False,
+        use_rate_limiter=True,
+        rate_limiter=LuaSlidingWindowRateLimiter,
+        redis_connection=redis_connection,
+        rate_for_second=1,
+    )
+
+    async def perform_request():
+        return 'data'
+
+    assert await asyncio.gather(executor(perform_request, 'first'), executor(perform_request, 'second')) == [
+        'data',
+        'data',
+    ]
+    with pytest.raises(RateLimitException):
+        await executor(perform_request, 'first')
+
+
+async def test_executor_passes_retry_arguments_without_rate_limiter():
+    executor = HelpUtilsMixin().build_executor(
+        use_retry=True,
+        use_rate_limiter=False,
+        stop=stop_after_attempt(3),
+        reraise=True,
+    )
+    calls = []
+
+    async def perform_request():
+        calls.append(1)
+        raise ConnectionError
+
+    with pytest.raises(ConnectionError):
+        await executor(perform_request, 'key')
+    assert len(calls) == 3
@@ -0,0 +1,78 @@
+import asyncio
+
+from src.rate_imiter.quota_leasing import QuotaLeasePool, QuotaLeasingRateLimiter
+from src.rate_imiter.rate_limiter import RateLimitException
+
+
+class CountingRateLimiter(QuotaLeasingRateLimiter):
+    refill_count = 0
+
+    async def _refill(self, lease, request_time):
+        CountingRateLimiter.refill_count += 1
+        await super()._refill(lease, request_time)
+
+
+async def admit(quota_pool, redis_connection, **limits):
+    try:
+        async with CountingRateLimiter(redis_connection, 'unique_key', quota_pool=quota_pool, **limits):
+            return True
+    except RateLimitException:
+        return False
+
+
+async def test_most_calls_are_admitted_locally(redis_connection, clean_redis):
+    CountingRateLimiter.refill_count = 0
+    quota_pool = QuotaLeasePool()
+
+    for _ in range(10):
+        results = await asyncio.gather(*[admit(quota_pool, redis_connection, rate_for_second=1000) for _ in range(20)])
+        assert all(results)
+        await asyncio.sleep(0.01)
+
+    assert CountingRateLimiter.refill_count < 50
+
+
+async def test_global_limit_holds_across_processes(redis_connection, clean_redis):
+    quota_pools = [QuotaLeasePool(), QuotaLeasePool()]
+
+    results = await asyncio.gather(
+        *[admit(quota_pool, redis_connection, rate_for_minute=10) for quota_pool in quota_pools for _ in range(20)]
+    )
+
+    assert 0 < sum(results) <= 10
+
+
+async def test_unused_permits_are_returned(redis_connection, clean_redis):
+    quota_pool = QuotaLeasePool()
+    limiter = QuotaLeasingRateLimiter(redis_connection, 'unique_key', rate_for_minute=1000, quota_pool=quota_pool)
+    lease = quota_pool.get(redis_connection, limiter.cache_key, limiter.windows)
+    lease.rate = 100
+
+    async with limiter:
+        pass
+
+    reserved = sum(int(value) for value in (await redis_connection.hgetall(limiter.cache_key)).values())
+    assert reserved == lease.remaining + 1 > 1
+
+    await quota_pool.release_all()
+    reserved = sum(int(value) for value in (await redis_connection.hgetall(limiter.cache_key)).values())
+    assert reserved == 1
+
+
+def test_leases_are_not_shared_between_connections_and_limits(redis_connection, binary_redis_connection):
+    quota_pool = QuotaLeasePool()
+    per_second = QuotaLeasingRateLimiter(redis_connection, 'unique_key', rate_for_second=10, quota_pool=quota_pool)
+    per_minute = QuotaLeasingRateLimiter(redis_connection, 'unique_key', rate_for_minute=10, quota_pool=quota_pool)
+
+    lease = quota_pool.get(redis_connection, 'unique_key', per_second.windows)
+    assert quota_pool.get(redis_connection, 'unique_key', per_second.windows) is lease
+    assert quota_pool.get(redis_connection, 'unique_key', per_minute.windows) is not lease
+    assert quota_pool.get(binary_redis_connection, 'unique_key', per_second.windows) is not lease
+
+
+def test_lease_size_is_bounded_by_error():
+    limiter = QuotaLeasingRateLimiter(None, 'unique_key', rate_for_second=500, quota_error_bound=0.02)
+
+    assert limiter._lease_size(rate=0) == 1
+    assert limiter._lease_size(rate=5) == 5
+    assert limiter._lease_size(rate=10000) == 10
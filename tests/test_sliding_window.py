@@ -54,3 +54,17 @@ def test_check_validate_limit(
             rate_for_hour=hour_rate,
             rate_for_day=day_rate,
         )
+
+
+async def test_run_counts_requests_per_call_key(redis_connection, clean_redis):
+    rate_limiter = SlidingWindowRateLimiter(redis_connection=redis_connection, rate_for_second=1)
+
+    async def perform_request():
+        return 'data'
+
+    assert await rate_limiter.run(perform_request, 'first') == 'data'
+    assert await rate_limiter.run(perform_request, 'second') == 'data'
+    with pytest.raises(RateLimitException):
+        await rate_limiter.run(perform_request, 'first')
+    with pytest.raises(ValueError):
+        await rate_limiter.run(perform_request)
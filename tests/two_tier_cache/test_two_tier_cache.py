@@ -0,0 +1,109 @@
+import asyncio
+
+from main import RequestManager
+from src.cache_invalidator_strategy import BackgroundUpdater, TTLInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService, TwoTierCacheService
+from src.cache_manager.local_cache import LocalCache
+
+
+def test_local_cache_evicts_least_recently_used():
+    local_cache = LocalCache(max_entries=2)
+    local_cache.set('first', 'data')
+    local_cache.set('second', 'data')
+    local_cache.get('first')
+    local_cache.set('third', 'data')
+
+    assert 'first' in local_cache
+    assert 'second' not in local_cache
+    assert len(local_cache) == 2
+
+
+def test_local_cache_respects_byte_limit():
+    local_cache = LocalCache(max_bytes=200)
+    local_cache.set('first', 'a' * 100)
+    local_cache.set('second', 'b' * 100)
+
+    assert 'first' not in local_cache
+    assert local_cache.current_bytes <= 200
+
+    local_cache.set('huge', 'c' * 1000)
+    assert 'huge' not in local_cache
+
+
+def test_local_cache_counts_nested_values():
+    local_cache = LocalCache(max_bytes=10_000)
+    document = {'patient_id': 1, 'pages': [str(page) * 1000 for page in range(100)]}
+    local_cache.set('first', document)
+    local_cache.set('second', {'nested': [document]})
+
+    assert 'first' not in local_cache and 'second' not in local_cache
+    assert local_cache.current_bytes == 0
+
+    local_cache.set('small', {'pages': [str(page) * 1000 for page in range(3)]})
+    local_cache.set('explicit', document, size=100)
+    assert 'small' in local_cache and 'explicit' in local_cache
+    assert 3000 < local_cache.current_bytes <= 10_000
+
+
+async def test_local_cache_entry_expires():
+    local_cache = LocalCache(ttl=0.05)
+    local_cache.set('key', 'data')
+    assert local_cache.get('key') == 'data'
+
+    await asyncio.sleep(0.1)
+    assert local_cache.get('key') is None
+    assert local_cache.hit_rate == 0.5
+
+
+def test_local_ttl_is_not_longer_than_redis_ttl():
+    cache_service = TwoTierCacheService(BaseCacheControlService(redis_connection=None, px=200), local_ttl=10)
+
+    assert cache_service.local_cache.ttl == 0.2
+
+
+async def test_ttl_strategy_reads_hot_key_from_local_cache(redis_connection, clean_redis):
+    cache_service = TwoTierCacheService(BaseCacheControlService(redis_connection, ex=10), local_ttl=5)
+
+    @RequestManager(service_name='test_service', cache_strategy=TTLInvalidator(cache_service=cache_service))
+    async def perform_request(arg):
+        return arg
+
+    assert await perform_request('integrator_data') == 'integrator_data'
+    await redis_connection.flushdb()
+
+    assert await perform_request('integrator_data') == 'integrator_data'
+    assert cache_service.local_cache.hits == 1
+
+
+async def test_background_updater_refreshes_local_cache(redis_connection, clean_redis):
+    cache_service = TwoTierCacheService(BaseCacheControlService(redis_connection, ex=10), local_ttl=5)
+    strategy = BackgroundUpdater(cache_service=cache_service, redis_connection=redis_connection)
+    await cache_service.set_cache('key', 'stale_data')
+
+    async def perform_request():
+        return 'fresh_data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'stale_data'
+    await asyncio.sleep(0.5)
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'fresh_data'
+    assert cache_service.hit_rate == 1.0
+
+
+async def test_local_entry_does_not_outlive_redis_key(redis_connection, clean_redis):
+    cache_service = TwoTierCacheService(BaseCacheControlService(redis_connection), local_ttl=10)
+    await redis_connection.set('key', 'data', px=100)
+
+    assert await cache_service.get_cache('key') == 'data'
+    await asyncio.sleep(0.15)
+
+    assert await cache_service.get_cache('key') is None
+
+
+async def test_rejected_set_is_not_stored_locally(redis_connection, clean_redis):
+    cache_service = TwoTierCacheService(BaseCacheControlService(redis_connection, nx=True), local_ttl=10)
+    await redis_connection.set('key', 'data')
+
+    assert not await cache_service.set_cache('key', 'new_data')
+    assert 'key' not in cache_service.local_cache
+    assert await cache_service.get_cache('key') == 'data'
@@ -0,0 +1,61 @@
+from main import RequestManager
+from src.cache_invalidator_strategy import XFetchInvalidator
+from src.cache_manager.cache_manager import BaseCacheControlService
+
+
+def test_recompute_probability_grows_near_expiry():
+    strategy = XFetchInvalidator(cache_service=BaseCacheControlService(redis_connection=None))
+
+    far_from_expiry = sum(strategy._should_recompute(ttl=60, delta='0.1') for _ in range(1000))
+    close_to_expiry = sum(strategy._should_recompute(ttl=0.05, delta='0.1') for _ in range(1000))
+
+    assert far_from_expiry == 0
+    assert close_to_expiry > 500
+    assert not strategy._should_recompute(ttl=None, delta='0.1')
+    assert not strategy._should_recompute(ttl=0.01, delta=None)
+
+
+async def test_get_data_with_xfetch(redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(redis_connection, ex=60)
+
+    @RequestManager(service_name='test_service', cache_strategy=XFetchInvalidator(cache_service=cache_service))
+    async def perform_request(arg):
+        perform_request.call_count += 1
+        return arg
+
+    TEST_DATA = 'integrator_data'
+    perform_request.call_count = 0
+
+    assert await perform_request(TEST_DATA) == TEST_DATA
+    assert await perform_request(TEST_DATA) == TEST_DATA
+    assert perform_request.call_count == 1
+
+    cache, ttl, delta = await cache_service.get_cache_with_meta(
+        'test_service:arg=integrator_data', 'test_service:arg=integrator_data:xfetch_delta'
+    )
+    assert cache == TEST_DATA
+    assert 0 < ttl <= 60
+    assert float(delta) >= 0
+
+
+async def test_expiring_key_is_recomputed_early(redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(redis_connection, px=100)
+    strategy = XFetchInvalidator(cache_service=cache_service, beta=1000)
+    await cache_service.set_cache_with_meta('key', 'stale_data', 'key:xfetch_delta', 1)
+
+    async def perform_request():
+        return 'fresh_data'
+
+    assert await strategy.get_data(perform_request, cache_key='key') == 'fresh_data'
+
+
+async def test_falsy_cached_value_is_a_hit(redis_connection, clean_redis):
+    cache_service = BaseCacheControlService(redis_connection, ex=60)
+    strategy = XFetchInvalidator(cache_service=cache_service)
+    await cache_service.set_cache_with_meta('key', '', 'key:xfetch_delta', 0.001, ttl=30)
+
+    async def perform_request():
+        raise AssertionError('cache must be used')
+
+    assert await strategy.get_data(perform_request, cache_key='key') == ''
+    assert 0 < await redis_connection.ttl('key:xfetch_delta') <= 30